@@ -0,0 +1,109 @@
+"""
+The children module contains the :class:`Children` class, the container a
+:class:`CobwebNode <concept_formation.cobweb.CobwebNode>` keeps its children
+in.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from __future__ import division
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+
+class Children(Sequence):
+    """
+    An ordered collection of a node's children that supports appending and
+    removing a child in constant time.
+
+    The children are kept in a dict keyed by the id of each child, so
+    removing a child does not need to search or shift the other children.
+    Dicts keep their insertion order (from Python 3.7, the oldest version the
+    package supports), so iteration follows the order that the children were
+    appended in (just as a list that children are appended to and removed
+    from would), and ties between children are broken in the same way as
+    before.
+
+    The container is also a read-only sequence that compares equal to a list
+    of the same children. Indexing builds a list of the children, which is
+    reused until the children change, so it should be avoided in loops that
+    also add or remove children.
+
+    :param children: the initial children
+    :type children: [CobwebNode, CobwebNode, ...]
+    """
+    __slots__ = ('_nodes', '_list')
+
+    def __init__(self, children=()):
+        self._nodes = {id(child): child for child in children}
+        self._list = None
+
+    def append(self, child):
+        """
+        Adds a child after the existing children.
+
+        :param child: the new child
+        :type child: CobwebNode
+        """
+        self._nodes[id(child)] = child
+        self._list = None
+
+    def remove(self, child):
+        """
+        Removes a child.
+
+        :param child: one of the children
+        :type child: CobwebNode
+        :raises ValueError: if the node is not one of the children
+        """
+        if self._nodes.pop(id(child), None) is None:
+            raise ValueError("Children.remove(x): x not in children")
+        self._list = None
+
+    def _as_list(self):
+        if self._list is None:
+            self._list = list(self._nodes.values())
+        return self._list
+
+    def __getitem__(self, index):
+        return self._as_list()[index]
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        return iter(self._nodes.values())
+
+    def __reversed__(self):
+        return reversed(self._as_list())
+
+    def __contains__(self, child):
+        return id(child) in self._nodes
+
+    def __eq__(self, other):
+        if isinstance(other, (Children, list, tuple)):
+            return self._as_list() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return self._as_list() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self._as_list()
+
+    def __reduce__(self):
+        return (self.__class__, (self._as_list(),))
+
+    def __repr__(self):
+        return repr(self._as_list())
@@ -0,0 +1,266 @@
+"""
+The children table module contains the :class:`ChildrenTable` class, which
+lets a :class:`CobwebNode <concept_formation.cobweb.CobwebNode>` with many
+children score inserting an instance into all of its children at once using
+NumPy. NumPy is an optional dependency; this module can be imported without
+it, but tables can only be built when it is installed.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from __future__ import division
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ChildrenTable(object):
+    """
+    A dense copy of the nominal counts of a node's children. Each row
+    corresponds to a child. The ``values`` matrix has a column for every
+    visible attribute value (holding the child's count of that value) and the
+    ``attrs`` matrix has a column for every visible attribute (holding 1.0 if
+    the child has seen the attribute). The child's count, sum of squared
+    counts, and number of visible attributes are kept in vectors.
+
+    Every change to a node's counts increases its ``version``, and each row
+    records the version of the child it was copied from. When a child's
+    counts are incremented or decremented it updates its row in its parent's
+    table (see: :meth:`ChildrenTable.update_row`). Any other change is picked
+    up lazily by :meth:`ChildrenTable.sync`: rows of removed children are
+    dropped, new children get new rows, and rows whose version no longer
+    matches the child are refreshed. Whether a row is current does not depend
+    on the child's count, which can stay the same while its values change
+    (e.g., after decay or when leaves are moved between children).
+
+    :param node: the node whose children the table describes
+    :type node: CobwebNode
+    """
+
+    def __init__(self, node):
+        if np is None:
+            raise ImportError("ChildrenTable requires NumPy.")
+        self.node = node
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuilds the table from scratch using the node's current children.
+        """
+        self.children = []
+        self.rows = {}
+        self.attr_cols = {}
+        self.value_cols = {}
+        self.num_values = 0
+
+        row_capacity = max(8, 2 * len(self.node.children))
+        self.versions = np.zeros(row_capacity, dtype=np.int64)
+        self.count = np.zeros(row_capacity)
+        self.sq_counts_total = np.zeros(row_capacity)
+        self.visible_attrs = np.zeros(row_capacity)
+        self.attrs = np.zeros((row_capacity, 8))
+        self.values = np.zeros((row_capacity, 8))
+
+        for child in self.node.children:
+            self.add_row(child)
+
+    def add_row(self, child):
+        """
+        Adds a row for a child that was appended to the node.
+
+        :param child: the new child
+        :type child: CobwebNode
+        """
+        row = len(self.children)
+        if row >= len(self.count):
+            self.versions = self._grow(self.versions, 0)
+            self.count = self._grow(self.count, 0)
+            self.sq_counts_total = self._grow(self.sq_counts_total, 0)
+            self.visible_attrs = self._grow(self.visible_attrs, 0)
+            self.attrs = self._grow(self.attrs, 0)
+            self.values = self._grow(self.values, 0)
+
+        self.children.append(child)
+        self.rows[id(child)] = row
+        self.set_row(row, child)
+
+    def set_row(self, row, child):
+        """
+        Copies all of a child's counts into a row of the table.
+
+        :param row: the row to update
+        :type row: int
+        :param child: the child the row describes
+        :type child: CobwebNode
+        """
+        self.versions[row] = child.version
+        self.count[row] = child.count
+        self.sq_counts_total[row] = child.sq_counts_total
+        self.visible_attrs[row] = child.visible_attrs
+        self.attrs[row] = 0.0
+        self.values[row] = 0.0
+
+        for attr in child.av_counts:
+            for val in child.av_counts[attr]:
+                self.set_value(row, child, attr, val)
+
+    def update_row(self, child, instance):
+        """
+        Updates a child's row after the instance was added to or removed from
+        its counts. Only the entries for the attributes in the instance
+        change, so the row is only updated if it was current before the
+        change; otherwise it is left for :meth:`ChildrenTable.sync` to copy
+        again.
+
+        :param child: a child whose counts were just changed
+        :type child: CobwebNode
+        :param instance: the instance that was added to or removed from the
+            child
+        :type instance: :ref:`Instance<instance-rep>`
+        """
+        row = self.rows.get(id(child))
+        if row is None or self.versions[row] != child.version - 1:
+            return
+
+        self.versions[row] = child.version
+        self.count[row] = child.count
+        self.sq_counts_total[row] = child.sq_counts_total
+        self.visible_attrs[row] = child.visible_attrs
+
+        for attr in instance:
+            self.set_value(row, child, attr, instance[attr])
+
+    def set_value(self, row, child, attr, val):
+        """
+        Copies a child's count of a single attribute value into the table,
+        adding columns for the attribute and value if needed. A value (or
+        attribute) that the child no longer has is recorded as a zero. Hidden
+        attributes are skipped because they do not affect category utility.
+        """
+        if attr[0] == "_":
+            return
+
+        counts = child.av_counts.get(attr)
+        if attr not in self.attr_cols:
+            if counts is None:
+                return
+            if len(self.attr_cols) == self.attrs.shape[1]:
+                self.attrs = self._grow(self.attrs, 1)
+            self.attr_cols[attr] = len(self.attr_cols)
+            self.value_cols[attr] = {}
+        self.attrs[row, self.attr_cols[attr]] = 0.0 if counts is None else 1.0
+
+        count = 0 if counts is None else counts.get(val, 0)
+        cols = self.value_cols[attr]
+        if val not in cols:
+            if not count:
+                return
+            if self.num_values == self.values.shape[1]:
+                self.values = self._grow(self.values, 1)
+            cols[val] = self.num_values
+            self.num_values += 1
+        self.values[row, cols[val]] = count
+
+    def _grow(self, array, axis):
+        """
+        Doubles the size of an array along an axis (adding at least 8
+        entries), padding with zeros.
+        """
+        shape = list(array.shape)
+        shape[axis] = max(8, shape[axis])
+        return np.concatenate((array, np.zeros(shape, dtype=array.dtype)),
+                              axis=axis)
+
+    def sync(self):
+        """
+        Brings the table up to date with the node's children: rows are added
+        and dropped to match the children, and rows copied from an older
+        version of their child are copied again.
+        """
+        children = self.node.children
+
+        if children != self.children:
+            rows = self.rows
+            kept = [rows[id(c)] for c in children if id(c) in rows]
+            self.versions = self.versions[kept]
+            self.count = self.count[kept]
+            self.sq_counts_total = self.sq_counts_total[kept]
+            self.visible_attrs = self.visible_attrs[kept]
+            self.attrs = self.attrs[kept]
+            self.values = self.values[kept]
+
+            self.children = [c for c in children if id(c) in rows]
+            self.rows = {id(c): row for row, c in enumerate(self.children)}
+            for child in children:
+                if id(child) not in self.rows:
+                    self.add_row(child)
+
+            if self.children != children:
+                self.rebuild()
+                return
+
+        versions = np.fromiter((c.version for c in children), np.int64,
+                               len(children))
+        for row in np.nonzero(versions != self.versions[:len(children)])[0]:
+            self.set_row(row, self.children[row])
+
+    def relative_cu_for_insert(self, instance, weight=1):
+        """
+        Computes :meth:`CobwebNode.relative_cu_for_insert
+        <concept_formation.cobweb.CobwebNode.relative_cu_for_insert>` for every
+        child at once. The table must be in sync with the node's children.
+
+        Rather than adding :math:`2cw + w^2` for each attribute value in the
+        instance (where :math:`w` is the instance's weight), the sum of squared
+        counts is increased by :math:`2w` times the sum of the gathered value
+        columns plus :math:`w^2` times the number of visible attributes in the
+        instance. When the counts and the weight are whole numbers this yields
+        exactly the same values as the one child at a time computation. With
+        fractional weights or decayed counts the two can differ by floating
+        point rounding, so children whose scores are within rounding of each
+        other may be ranked differently than they would be without the table.
+
+        :param instance: The instance currently being categorized
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
+        :return: the relative category utility of inserting the instance into
+            each child, in the order of the node's children
+        :rtype: numpy.ndarray
+        """
+        n = len(self.children)
+        attr_idx = []
+        value_idx = []
+        num_attrs = 0
+        new_attrs = 0
+
+        for attr in instance:
+            if attr[0] == "_":
+                continue
+            num_attrs += 1
+            if attr not in self.attr_cols:
+                new_attrs += 1
+                continue
+            attr_idx.append(self.attr_cols[attr])
+            col = self.value_cols[attr].get(instance[attr])
+            if col is not None:
+                value_idx.append(col)
+
+        count = self.count[:n]
+        sq_counts_total = (self.sq_counts_total[:n] +
+                           num_attrs * weight * weight)
+        if value_idx:
+            sq_counts_total += (2 * weight *
+                                self.values[:n, value_idx].sum(axis=1))
+        visible_attrs = (self.visible_attrs[:n] + new_attrs + len(attr_idx) -
+                         self.attrs[:n, attr_idx].sum(axis=1))
+
+        new_count = count + weight
+        return (new_count *
+                (sq_counts_total / (new_count * new_count) / visible_attrs) -
+                count *
+                (self.sq_counts_total[:n] / (count * count) /
+                 self.visible_attrs[:n]))
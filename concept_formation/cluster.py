@@ -179,6 +179,7 @@ def CU(cluster, leaves):
     for c in set(cluster):
         temp_child = cluster[0].__class__()
         temp_child.tree = c.tree
+        temp_child.parent = temp_root
         for leaf in leaves:
             if c.is_parent(leaf):
                 temp_child.update_counts_from_node(leaf)
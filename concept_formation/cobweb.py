@@ -7,37 +7,304 @@ from __future__ import print_function
 from __future__ import unicode_literals
 from __future__ import absolute_import
 from __future__ import division
+from collections import Counter
 from random import shuffle
 from random import random
 from math import log
+from math import sqrt
+from functools import partial
+import copy
+import multiprocessing
+import threading
 
 from concept_formation.utils import weighted_choice
 from concept_formation.utils import most_likely_choice
+from concept_formation.utils import isNumber
+from concept_formation.utils import ReadWriteLock
+from concept_formation.utils import read_locked
+from concept_formation.utils import write_locked
+from concept_formation.children import Children
+from concept_formation.children_table import ChildrenTable
+from concept_formation.children_table import np
+from concept_formation.operation_policy import ALL_OPERATIONS
+from concept_formation.serialization import save_tree
+from concept_formation.serialization import load_tree
+
+# The tree used by the worker processes of CobwebTree._parallel_map, and a
+# lock that is held while it is set for forking new workers.
+_parallel_tree = None
+_parallel_lock = threading.Lock()
+
+# Guards the creation and syncing of children tables, which happens while the
+# tree is only being read (see: CobwebNode.get_children_table).
+_children_table_lock = threading.Lock()
+
+
+def _init_parallel_worker(tree=None):
+    """
+    Sets up a worker process started by :meth:`CobwebTree._parallel_map`. The
+    tree only needs to be passed when workers are not forked. A worker has its
+    own copy of the tree, so the copy's lock is dropped.
+    """
+    global _parallel_tree
+    if tree is not None:
+        _parallel_tree = tree
+    _parallel_tree.lock = None
+
+
+def _run_parallel(fn, arg):
+    """
+    Applies a function to a worker process's tree and an argument.
+    """
+    return fn(_parallel_tree, arg)
+
+
+def _parallel_categorize(tree, instance):
+    """
+    Categorizes an instance and returns the id of the resulting concept.
+    """
+    return tree.categorize(instance).concept_id
+
+
+def _parallel_infer_missing(tree, args):
+    """
+    Calls infer_missing with a tuple of its arguments.
+    """
+    instance, choice_fn, allow_none = args
+    return tree.infer_missing(instance, choice_fn, allow_none)
 
 
 class CobwebTree(object):
     """
     The CobwebTree contains the knoweldge base of a partiucluar instance of the
     cobweb algorithm and can be used to fit and categorize instances.
+
+    The tree keeps a vocabulary of the attributes and nominal values it has
+    seen (see: :meth:`CobwebTree.intern_instance`), so that the probability
+    tables of all of its nodes share one key object per attribute and value.
+
+    If ``prune_operations`` is set to True, merges and splits whose category
+    utility provably cannot beat the best operation found so far are not
+    evaluated (see: :meth:`CobwebNode.get_best_operation`). This never changes
+    the chosen operation, but the bounds are only worth computing when they
+    prune often, so it is off by default. The tree counts how often each
+    operation is chosen, evaluated, and pruned in ``operation_stats``, a
+    Counter keyed by pairs such as ``('merge', 'pruned')``.
+
+    :param min_vectorized_children: If set, nodes with at least this many
+        children score inserts into all of their children at once using a
+        NumPy :class:`ChildrenTable
+        <concept_formation.children_table.ChildrenTable>` (see:
+        :meth:`CobwebNode.two_best_children`). This requires NumPy and is
+        disabled by default.
+    :type min_vectorized_children: int or None
+    :param thread_safe: If True, the tree gets a :class:`ReadWriteLock
+        <concept_formation.utils.ReadWriteLock>` so that it can be fit in one
+        thread while being used for categorization and inference in others.
+        Methods that modify the tree (e.g., :meth:`CobwebTree.ifit`) hold the
+        lock for writing, so readers never see a partially applied insert,
+        merge, or split, and methods that only read it (e.g.,
+        :meth:`CobwebTree.categorize`) hold it for reading, so they do not
+        block each other. Note that :meth:`CobwebTree.fit` takes the lock once
+        per instance.
+    :type thread_safe: bool
+    :param index_duplicates: If True, the tree keeps an index from the
+        fingerprint of each instance it has fit (see:
+        :meth:`CobwebTree.fingerprint`) to the leaf that holds it, and an
+        exact duplicate of an earlier instance is added straight to that leaf
+        and its ancestors instead of being sorted down the tree (see:
+        :meth:`CobwebTree.cobweb`). This skips the merges and splits that the
+        descent might have made along the way, so the resulting tree can
+        differ from one fit without the index.
+    :type index_duplicates: bool
+    :param decay: If set, the counts of the tree are multiplied by this factor
+        for every instance that is fit, so that older instances gradually
+        count for less than newer ones and the tree can follow a stream whose
+        distribution drifts. Counts are decayed lazily: each node records when
+        it was last decayed, and the accumulated decay is applied when an
+        instance next passes through its parent (see:
+        :meth:`CobwebTree.decay_children`).
+    :type decay: a float between 0.0 (exclusive) and 1.0, or None
+    :param min_count: When the tree decays, concepts whose decayed count drops
+        below this count are pruned from the tree. This bounds the size of the
+        tree to roughly the concepts seen in the last :math:`\\log(min\\_count)
+        / \\log(decay)` instances.
+    :type min_count: float
+    :param max_nodes: If set, the number of nodes in the tree is kept within
+        this budget. When an instance makes the tree grow past it, the tree is
+        compacted to 90% of the budget by folding the least useful concepts
+        into their parents (see: :meth:`CobwebTree.compact`).
+    :type max_nodes: int or None
+    :param operation_policy: If set, the policy decides at which nodes merges
+        and splits are evaluated while fitting (see:
+        :mod:`concept_formation.operation_policy`). By default they are
+        evaluated at every node.
+    :type operation_policy: :class:`OperationPolicy
+        <concept_formation.operation_policy.OperationPolicy>` or None
+    :param max_children: If set, no node of the tree has more than this many
+        children, which bounds the work of sorting an instance through each
+        node (see: :meth:`CobwebNode.two_best_children`). Splits that would
+        promote too many children are not evaluated, and when a new child
+        pushes a node over the limit, the new child is grouped with the
+        sibling that it is most similar to, as a child of that sibling or
+        under a new concept (see: :meth:`CobwebTree._limit_children`).
+    :type max_children: int or None
     """
 
-    def __init__(self):
+    def __init__(self, min_vectorized_children=None, thread_safe=False,
+                 index_duplicates=False, decay=None, min_count=0.1,
+                 max_nodes=None, operation_policy=None, max_children=None):
         """
         The tree constructor.
         """
-        self.root = CobwebNode()
-        self.root.tree = self
+        if min_vectorized_children is not None and np is None:
+            raise ImportError("min_vectorized_children requires NumPy.")
+        self.root = self._new_root()
+        self.vocabulary = {}
+        self.min_vectorized_children = min_vectorized_children
+        self.lock = ReadWriteLock() if thread_safe else None
+        self.leaf_index = {} if index_duplicates else None
+        self._set_decay(decay, min_count)
+        self._set_max_nodes(max_nodes)
+        self._set_max_children(max_children)
+        self.prune_operations = False
+        self.operation_stats = Counter()
+        self.operation_policy = operation_policy
+
+    def _new_root(self):
+        """
+        Returns a new empty root for the tree, an instance of the tree's node
+        class.
+
+        :return: an empty root
+        :rtype: CobwebNode
+        """
+        root = CobwebNode()
+        root.tree = self
+        return root
+
+    def _set_decay(self, decay, min_count):
+        """
+        Checks and sets the decay parameters (see: :class:`CobwebTree`).
+        """
+        if decay is not None and not 0 < decay <= 1:
+            raise ValueError("decay must be in the range (0, 1].")
+        self.decay = decay
+        self.min_count = min_count
+        self.time = 0
+
+    def _set_max_nodes(self, max_nodes):
+        """
+        Checks and sets the node budget (see: :class:`CobwebTree`).
+        """
+        if max_nodes is not None and max_nodes < 1:
+            raise ValueError("max_nodes must be at least 1.")
+        self.max_nodes = max_nodes
+        self.num_nodes = 1
+
+    def _set_max_children(self, max_children):
+        """
+        Checks and sets the limit on the children of each node (see:
+        :class:`CobwebTree`).
+        """
+        if max_children is not None and max_children < 2:
+            raise ValueError("max_children must be at least 2.")
+        self.max_children = max_children
+
+    def __getstate__(self):
+        """
+        Locks cannot be pickled or copied, so only whether the tree has one is
+        saved.
+
+        The state starts with a list of all the nodes in the tree, ordered so
+        that every node comes after its children. Pickling and copying store
+        the nodes in that order, so each node's children have already been
+        stored when it is reached; this takes time linear in the size of the
+        tree and does not recurse, however deep the tree is (see:
+        :meth:`CobwebNode.__getstate__`).
+        """
+        state = {'_nodes': self.root._walk(postorder=True)}
+        state.update(self._tree_state())
+        return state
+
+    def _tree_state(self):
+        """
+        Returns the tree's own fields, without the list of its nodes that
+        :meth:`CobwebTree.__getstate__` adds, with the lock replaced by
+        whether the tree has one (see also:
+        :func:`concept_formation.serialization.save_tree`).
+        """
+        state = dict(self.__dict__)
+        if 'lock' in state:
+            state['lock'] = state['lock'] is not None
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled or copied tree, giving it a new lock if it had one.
+        """
+        state = dict(state)
+        state.pop('_nodes', None)
+        self.__dict__.update(state)
+        if 'num_nodes' not in state and 'root' in state:
+            self.num_nodes = self.root.num_concepts()
+        if 'lock' in state:
+            self.lock = ReadWriteLock() if state['lock'] else None
 
+    @write_locked
     def clear(self):
         """
         Clears the concepts of the tree.
         """
-        self.root = CobwebNode()
-        self.root.tree = self
+        self.root = self._new_root()
+        self.vocabulary = {}
+        if self.leaf_index is not None:
+            self.leaf_index = {}
+        self.time = 0
+        self.num_nodes = 1
+        if self.operation_policy is not None:
+            self.operation_policy.reset()
 
     def __str__(self):
         return str(self.root)
 
+    @read_locked
+    def save(self, path):
+        """
+        Saves the tree to a file in a compact binary format, which can be
+        loaded with :meth:`CobwebTree.load`.
+
+        Unlike :meth:`CobwebNode.output_json`, the file keeps everything needed
+        to continue using the tree: the tree's parameters (e.g., its scaling
+        parameters and ``attr_scales`` for Cobweb/3 or its
+        ``gensym_counter`` for Trestle), its vocabulary, and every node's
+        counts. See :mod:`concept_formation.serialization` for the format.
+        The index of a tree that indexes duplicates is not saved; the loaded
+        tree starts with an empty index that fills as instances are fit.
+
+        :param path: the file to write
+        :type path: str
+        """
+        save_tree(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a tree saved with :meth:`CobwebTree.save`. The loaded tree is of
+        the class that was saved, which must be this class or a subclass of
+        it.
+
+        :param path: the file to read
+        :type path: str
+        :return: the loaded tree
+        :rtype: CobwebTree
+        """
+        tree = load_tree(path)
+        if not isinstance(tree, cls):
+            raise ValueError("%s is a saved %s, not a %s." %
+                             (path, type(tree).__name__, cls.__name__))
+        return tree
+
     def _sanity_check_instance(self, instance):
         for attr in instance:
             try:
@@ -63,7 +330,86 @@ class CobwebTree(object):
                 raise ValueError("Attributes with value None should"
                                  " be manually removed.")
 
-    def ifit(self, instance):
+    def intern_instance(self, instance, extend=True):
+        """
+        Returns a copy of the instance in which every attribute and nominal
+        value has been replaced by the tree's canonical copy of it.
+
+        The first time an attribute or value is fit it is added to the tree's
+        vocabulary, and every later equal key is swapped for that object. As a
+        result, the probability tables of all of the nodes share a single key
+        object per attribute and value, rather than each holding whichever
+        equal copy arrived with the instance that created its entry, and table
+        lookups succeed on identity instead of comparing (potentially long)
+        relation tuples element by element. Numeric values are not interned.
+
+        Because the interned keys are the original keys, the tables can still
+        be read and updated with any equal attribute or value.
+
+        Only methods that add instances to the tree (e.g.,
+        :meth:`CobwebTree.ifit`) extend the vocabulary. Methods that only
+        read the tree (e.g., :meth:`CobwebTree.categorize`) look the keys up
+        without adding the ones the tree has not seen, so queries do not
+        change the tree. The vocabulary only grows while instances are fit:
+        keys are not dropped when the instances that used them are removed
+        or decay away (see: :meth:`CobwebTree.prune_vocabulary`).
+
+        :param instance: an instance to intern
+        :type instance: :ref:`Instance<instance-rep>`
+        :param extend: whether keys that are not in the vocabulary yet are
+            added to it
+        :type extend: bool
+        :return: an equal instance that uses the tree's canonical keys
+        :rtype: :ref:`Instance<instance-rep>`
+        """
+        vocabulary = self.vocabulary
+        interned = {}
+        if extend:
+            for attr in instance:
+                val = instance[attr]
+                attr = vocabulary.setdefault(attr, attr)
+                if not isNumber(val):
+                    val = vocabulary.setdefault(val, val)
+                interned[attr] = val
+        else:
+            for attr in instance:
+                val = instance[attr]
+                attr = vocabulary.get(attr, attr)
+                if not isNumber(val):
+                    val = vocabulary.get(val, val)
+                interned[attr] = val
+        return interned
+
+    @write_locked
+    def prune_vocabulary(self):
+        """
+        Drops the attributes and values that no concept in the tree uses any
+        more from the tree's vocabulary (see:
+        :meth:`CobwebTree.intern_instance`), e.g., after instances have been
+        removed (see: :meth:`CobwebTree.remove`) or have decayed away (see:
+        :meth:`CobwebTree.decay_children`).
+
+        The counts of the root include those of every other concept, so the
+        keys in use are exactly the keys of the root's table.
+        """
+        used = {}
+        for attr in self.root.av_counts:
+            used[attr] = attr
+            for val in self.root.av_counts[attr]:
+                used[val] = val
+        self.vocabulary = {key: self.vocabulary[key] for key in used
+                           if key in self.vocabulary}
+
+    def _sanity_check_weight(self, weight):
+        """
+        Checks that the weight of an instance is a positive number.
+        """
+        if not isNumber(weight) or weight <= 0:
+            raise ValueError("The weight of an instance must be a positive "
+                             "number, not %s." % repr(weight))
+
+    @write_locked
+    def ifit(self, instance, weight=1):
         """
         Incrementally fit a new instance into the tree and return its resulting
         concept.
@@ -73,15 +419,24 @@ class CobwebTree(object):
         knowledge** for a non-modifying version of labeling use the
         :meth:`CobwebTree.categorize` function.
 
+        A weight of k adds k copies of the instance in a single pass down the
+        tree: every count is incremented by k and the category utility of each
+        operation is computed for adding all k copies. This gives the same
+        counts as fitting the instance k times in a row whenever those copies
+        would all have been sorted to the same leaf.
+
         :param instance: An instance to be categorized into the tree.
         :type instance:  :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
         :return: A concept describing the instance
         :rtype: CobwebNode
 
         .. seealso:: :meth:`CobwebTree.cobweb`
         """
         self._sanity_check_instance(instance)
-        return self.cobweb(instance)
+        self._sanity_check_weight(weight)
+        return self.cobweb(instance, weight)
 
     def fit(self, instances, iterations=1, randomize_first=True):
         """
@@ -94,9 +449,14 @@ class CobwebTree(object):
         can be done in the original order of the list if desired, this is
         useful for initializing the tree with specific prior experience.
 
-        :param instances: a collection of instances
+        Any element of the collection can also be an ``(instance, count)``
+        pair, which is fit once with a weight of count (see:
+        :meth:`CobwebTree.ifit`), so repeated instances can be aggregated
+        before fitting.
+
+        :param instances: a collection of instances or (instance, count) pairs
         :type instances:  [:ref:`Instance<instance-rep>`,
-            :ref:`Instance<instance-rep>`, ...]
+            (:ref:`Instance<instance-rep>`, int), ...]
         :param iterations: number of times the list of instances should be fit.
         :type iterations: int
         :param randomize_first: whether or not the first iteration of fitting
@@ -109,10 +469,897 @@ class CobwebTree(object):
             if x == 0 and randomize_first:
                 shuffle(instances)
             for i in instances:
-                self.ifit(i)
+                if isinstance(i, tuple):
+                    self.ifit(i[0], weight=i[1])
+                else:
+                    self.ifit(i)
             shuffle(instances)
 
-    def cobweb(self, instance):
+    @write_locked
+    def fit_bulk(self, instances, randomize_first=True):
+        """
+        Builds the tree from a collection of instances all at once, top down,
+        instead of fitting them one at a time.
+
+        The instances are first sorted into the children of the root with
+        only the best and new operations (see:
+        :meth:`CobwebNode.get_best_operation`), and then the pairs of children
+        whose merge most increases the root's category utility are merged
+        until no merge increases it. Each child is then partitioned the same
+        way using only its own instances, until the instances of a child are
+        all exact matches of each other, at which point it is a leaf.
+        Identical instances are partitioned together, as a single instance
+        with their combined weight. Fitting instances one at a time instead
+        evaluates merges and splits at every node that each instance passes
+        through.
+
+        The result is an ordinary tree, so instances can be added to it later
+        with :meth:`CobwebTree.ifit`, which can then reorganize it with merges
+        and splits. The tree must be empty. If the tree limits the children of
+        each node (see: :class:`CobwebTree`), nodes with too many children
+        have them grouped afterwards (see: :meth:`CobwebTree._limit_children`).
+
+        :param instances: a collection of instances or (instance, count) pairs
+            (see: :meth:`CobwebTree.fit`)
+        :type instances:  [:ref:`Instance<instance-rep>`,
+            (:ref:`Instance<instance-rep>`, int), ...]
+        :param randomize_first: whether the instances should be partitioned in
+            a random order or in the list's original order.
+        :type randomize_first: bool
+        """
+        if self.root.count > 0 or self.root.children:
+            raise ValueError("fit_bulk can only build an empty tree.")
+
+        pairs = [i if isinstance(i, tuple) else (i, 1) for i in instances]
+        if randomize_first:
+            shuffle(pairs)
+        pairs = self._bulk_preprocess(pairs)
+        if not pairs:
+            return
+
+        # Identical instances always end up in the same leaf, so they are
+        # partitioned together.
+        weights = {}
+        for instance, weight in pairs:
+            key = frozenset(instance.items())
+            if key in weights:
+                weights[key][1] += weight
+            else:
+                weights[key] = [instance, weight]
+        pairs = [(instance, weight) for instance, weight in weights.values()]
+
+        self.root.timestamp = self.time
+        for instance, weight in pairs:
+            self.root.increment_counts(instance, weight)
+
+        stack = [(self.root, pairs)]
+        while stack:
+            node, pairs = stack.pop()
+            stack.extend(self._bulk_partition(node, pairs))
+
+        self._limit_tree_children()
+        self.num_nodes = self.root.num_concepts()
+        if self.max_nodes is not None and self.num_nodes > self.max_nodes:
+            self.compact(self.max_nodes - self.max_nodes // 10)
+
+    def _bulk_preprocess(self, pairs):
+        """
+        Checks and interns the instances given to :meth:`CobwebTree.fit_bulk`
+        (see: :meth:`CobwebTree.intern_instance`).
+
+        :param pairs: the (instance, weight) pairs to fit
+        :type pairs: [(:ref:`Instance<instance-rep>`, int), ...]
+        :return: the pairs with interned instances
+        :rtype: [(:ref:`Instance<instance-rep>`, int), ...]
+        """
+        interned = []
+        for instance, weight in pairs:
+            self._sanity_check_instance(instance)
+            self._sanity_check_weight(weight)
+            interned.append((self.intern_instance(instance), weight))
+        return interned
+
+    def _bulk_partition(self, node, pairs):
+        """
+        Gives a node of a tree being built by :meth:`CobwebTree.fit_bulk` its
+        children, given the instances that were sorted into it (and that its
+        counts already include).
+
+        The instances are sorted into the children of a temporary node with
+        the best and new operations, the children are merged while that
+        increases the category utility (see:
+        :meth:`CobwebNode._best_bulk_merge`), and the children are then moved
+        to the node. If the instances all end up in one child, the node
+        instead gets a leaf for each distinct instance. The children returned
+        are the ones the instances were sorted into, which are grandchildren
+        of the node if they were merged.
+
+        :param node: the node to partition
+        :type node: CobwebNode
+        :param pairs: the (instance, weight) pairs in the node
+        :type pairs: [(:ref:`Instance<instance-rep>`, int), ...]
+        :return: the node's children that need to be partitioned, with their
+            instances
+        :rtype: [(CobwebNode, [(:ref:`Instance<instance-rep>`, int), ...]),
+            ...]
+        """
+        fingerprints = {}
+        for instance, weight in pairs:
+            fingerprints.setdefault(self.fingerprint(instance), instance)
+        if len(fingerprints) == 1:
+            if self.leaf_index is not None:
+                for fingerprint in fingerprints:
+                    self.leaf_index[fingerprint] = node
+            return []
+
+        temp = node.__class__()
+        temp.tree = self
+        temp.timestamp = self.time
+        assignments = []
+        for instance, weight in pairs:
+            if not temp.children:
+                temp.increment_counts(instance, weight)
+                child = temp.create_new_child(instance, weight)
+            else:
+                best1_cu, best1, best2 = temp.two_best_children(instance,
+                                                                weight)
+                _, best_action = temp.get_best_operation(
+                    instance, best1, best2, best1_cu, ["best", "new"], weight)
+                temp.increment_counts(instance, weight)
+                if best_action == 'best':
+                    best1.increment_counts(instance, weight)
+                    child = best1
+                else:
+                    child = temp.create_new_child(instance, weight)
+            assignments.append(child)
+
+        while len(temp.children) > 2:
+            merge = temp._best_bulk_merge()
+            if merge is None:
+                break
+            temp.merge(*merge)
+
+        groups = {}
+        for child, pair in zip(assignments, pairs):
+            groups.setdefault(id(child), []).append(pair)
+
+        if len(temp.children) == 1:
+            groups = {}
+            children = {}
+            for instance, weight in pairs:
+                fingerprint = self.fingerprint(instance)
+                if fingerprint not in children:
+                    children[fingerprint] = node.create_new_child(instance,
+                                                                  weight)
+                else:
+                    children[fingerprint].increment_counts(instance, weight)
+                groups.setdefault(id(children[fingerprint]), []).append(
+                    (instance, weight))
+            return [(child, groups[id(child)]) for child in node.children]
+
+        for child in temp.children:
+            child.parent = node
+            node.children.append(child)
+        return [(child, groups[id(child)])
+                for child in dict.fromkeys(assignments)]
+
+    @write_locked
+    def merge_tree(self, other):
+        """
+        Folds the concepts of another tree into this one, so that trees fit
+        on separate shards of a dataset (e.g., in separate processes) can be
+        combined into one tree (see also: :func:`combine_trees`).
+
+        The other tree is copied, and the children of its root are routed into
+        this tree the way that :meth:`CobwebTree.cobweb` routes an instance,
+        except that a whole subtree is placed at a time (see:
+        :meth:`CobwebTree._place_subtree`). At each node the subtree's counts
+        are added to the node (see: :meth:`CobwebNode.update_counts_from_node`)
+        and the subtree is added to the child that it fits best, added as a
+        new child, or added to a merge of the two children it fits best,
+        whichever gives the highest category utility. A subtree that reaches a
+        leaf is added to it if both are exact matches of the same instance
+        and otherwise becomes its sibling under a new node, as in
+        :meth:`CobwebNode.fringe_split`. Finally, the children of the root
+        are merged while that increases its category utility, as in
+        :meth:`CobwebTree.fit_bulk`.
+
+        If this tree limits the children of each node (see:
+        :class:`CobwebTree`), nodes with too many children have them grouped
+        afterwards (see: :meth:`CobwebTree._limit_children`).
+
+        The keys of the copied concepts' tables are swapped for this tree's
+        canonical copies (see: :meth:`CobwebTree.intern_instance`), so the
+        tables keep sharing a single key object per attribute and value.
+
+        The other tree is not changed. Both trees must be of the same class
+        and must not decay their counts.
+
+        :param other: the tree to merge into this one
+        :type other: CobwebTree
+        """
+        if type(other) is not type(self):
+            raise ValueError("Can only merge a tree of the same class.")
+        if self.decay is not None or other.decay is not None:
+            raise ValueError("Trees that decay their counts cannot be "
+                             "merged.")
+        if other.root.count == 0:
+            return
+
+        self._merge_tree_state(other)
+        subtree = other.root.__class__(other.root)
+        for node in subtree._walk():
+            node.tree = self
+            node.timestamp = self.time
+            node.intern_counts(self.vocabulary)
+
+        if self.root.count == 0 and not self.root.children:
+            self.root = subtree
+        else:
+            # The other root covers the same data as this root, so its
+            # children are always placed on their own.
+            if subtree.children and self.root.children:
+                self.root.update_counts_from_node(subtree)
+                stack = [('place', self.root, child)
+                         for child in subtree.children]
+            else:
+                stack = [('merge', self.root, subtree)]
+            while stack:
+                action, node, subtree = stack.pop()
+                if action == 'merge':
+                    stack.extend(self._merge_subtree(node, subtree))
+                else:
+                    stack.extend(self._place_subtree(node, subtree))
+
+            while len(self.root.children) > 2:
+                merge = self.root._best_bulk_merge()
+                if merge is None:
+                    break
+                self.root.merge(*merge)
+
+        self._limit_tree_children()
+        self.num_nodes = self.root.num_concepts()
+        if self.max_nodes is not None and self.num_nodes > self.max_nodes:
+            self.compact(self.max_nodes - self.max_nodes // 10)
+
+    def _merge_tree_state(self, other):
+        """
+        Combines the tree level state of another tree into this one when it is
+        merged (see: :meth:`CobwebTree.merge_tree`), i.e., the vocabulary.
+
+        :param other: the tree being merged into this one
+        :type other: CobwebTree
+        """
+        for key in other.vocabulary:
+            self.vocabulary.setdefault(key, key)
+
+    def _merge_subtree(self, node, subtree):
+        """
+        Adds the counts of a subtree being merged (see:
+        :meth:`CobwebTree.merge_tree`) to a node that it was routed to.
+
+        If the node is a leaf, the subtree is either added to it (if both are
+        exact matches of the same instance) or becomes the leaf's sibling
+        under a new node with the leaf's counts. Otherwise the subtree still
+        needs to be placed among the node's children (see:
+        :meth:`CobwebTree._place_subtree`).
+
+        :param node: a node of this tree
+        :type node: CobwebNode
+        :param subtree: the root of a copied subtree of the other tree
+        :type subtree: CobwebNode
+        :return: the subtrees that still need to be placed
+        :rtype: [('place', CobwebNode, CobwebNode), ...]
+        """
+        if not node.children:
+            instance = None
+            if not subtree.children:
+                instance = subtree._exact_instance()
+            if instance is not None and node.is_exact_match(instance):
+                node.update_counts_from_node(subtree)
+                return []
+
+            new = node.shallow_copy()
+            node.parent = new
+            new.children.append(node)
+            if new.parent:
+                siblings = new.parent.children
+                siblings.remove(node)
+                siblings.append(new)
+            else:
+                self.root = new
+            new.update_counts_from_node(subtree)
+            subtree.parent = new
+            new.children.append(subtree)
+            return []
+
+        node.update_counts_from_node(subtree)
+        return [('place', node, subtree)]
+
+    def _place_subtree(self, node, subtree):
+        """
+        Places a subtree being merged (see: :meth:`CobwebTree.merge_tree`)
+        among the children of a node whose counts already include it.
+
+        This entertains the best, new, and merge operations of
+        :meth:`CobwebNode.get_best_operation`, with the subtree in place of an
+        instance: adding it to the child it fits best, adding it as a new
+        child, or merging the two children it fits best and adding it to the
+        merged node. The one that gives the node's children the highest
+        category utility is performed. In the case of ties an operation is
+        chosen at random.
+
+        The subtree is never split. Splitting lets its children be placed on
+        their own, but it tends to break subtrees all the way down to leaves
+        that are then added as new children high up in the tree, which makes
+        wide nodes that are slow to merge into and to categorize.
+
+        :param node: a node of this tree
+        :type node: CobwebNode
+        :param subtree: the root of a copied subtree of the other tree
+        :type subtree: CobwebNode
+        :return: the subtree, if it still needs to be merged into a child
+        :rtype: [('merge', CobwebNode, CobwebNode)]
+        """
+        children_cg = node.children_correct_guesses()
+        parent_cg = node.expected_correct_guesses()
+
+        def cu(child_correct_guesses, num_children):
+            return ((child_correct_guesses / node.count - parent_cg) /
+                    num_children)
+
+        # The children are ranked by how much adding the subtree to them
+        # increases their count weighted expected correct guesses.
+        ranked = []
+        for child in node.children:
+            child_cg = child.count * child.expected_correct_guesses()
+            merged_cg = ((child.count + subtree.count) *
+                         child.expected_correct_guesses_for_merge(subtree))
+            ranked.append((merged_cg - child_cg, child.count, random(),
+                           child, child_cg))
+        ranked.sort(key=lambda x: x[:3], reverse=True)
+
+        operations = [(cu(children_cg + ranked[0][0], len(node.children)),
+                       random(), 'best'),
+                      (cu(children_cg + subtree.count *
+                          subtree.expected_correct_guesses(),
+                          len(node.children) + 1), random(), 'new')]
+        if len(ranked) > 2:
+            best1, best2 = ranked[0][3], ranked[1][3]
+            merged = node.__class__()
+            merged.tree = self
+            merged.copy_counts_from(best1)
+            merged.update_counts_from_node(best2)
+            operations.append((cu(children_cg - ranked[0][4] - ranked[1][4] +
+                                  (merged.count + subtree.count) *
+                                  merged.expected_correct_guesses_for_merge(
+                                      subtree),
+                                  len(node.children) - 1),
+                               random(), 'merge'))
+
+        action = max(operations)[2]
+        if action == 'best':
+            return [('merge', ranked[0][3], subtree)]
+        elif action == 'merge':
+            return [('merge', node.merge(ranked[0][3], ranked[1][3]),
+                     subtree)]
+        subtree.parent = node
+        node.children.append(subtree)
+        return []
+
+    @write_locked
+    def remove(self, instance, weight=1):
+        """
+        Removes an instance that was previously fit into the tree, undoing its
+        :meth:`CobwebTree.ifit`.
+
+        The instance is removed from a leaf that holds it (see:
+        :meth:`CobwebTree.find_leaf`) using :meth:`CobwebTree.unfit`. Together
+        with :meth:`CobwebTree.ifit` this can keep a tree over a sliding window
+        of a stream, so that its size stays bounded.
+
+        :param instance: an instance that was fit into the tree
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to remove
+        :type weight: a positive number
+        :return: the leaf the instance was removed from
+        :rtype: CobwebNode
+        :raises ValueError: if no leaf holds the instance, or if the tree
+            decays its counts (see: :meth:`CobwebTree.unfit`)
+        """
+        self._check_removable()
+        self._sanity_check_instance(instance)
+        self._sanity_check_weight(weight)
+        instance = self.intern_instance(instance, extend=False)
+        leaf = self.find_leaf(instance, weight)
+        if leaf is None:
+            raise ValueError("The instance is not in the tree.")
+        self.unfit(leaf, instance, weight)
+        return leaf
+
+    @read_locked
+    def find_leaf(self, instance, weight=1):
+        """
+        Returns a leaf that holds the instance (at least weight times), or
+        None if there is no such leaf.
+
+        Leaves only hold instances that are exact matches for each other (see:
+        :meth:`CobwebNode.is_exact_match`), and every ancestor of the leaf
+        holds the instance too, so only the subtrees of nodes that hold the
+        instance are searched (see: :meth:`CobwebNode.has_instance`). If the
+        tree indexes duplicates, the indexed leaf is tried first.
+
+        :param instance: an instance
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance the leaf must hold
+        :type weight: a positive number
+        :return: a leaf that holds the instance
+        :rtype: CobwebNode
+        """
+        if self.leaf_index is not None:
+            leaf = self.leaf_index.get(self.fingerprint(instance))
+            if (leaf is not None and not leaf.children and
+                    leaf.has_instance(instance, weight) and
+                    leaf.is_exact_match(instance)):
+                node = leaf
+                while node.parent is not None:
+                    node = node.parent
+                if node is self.root:
+                    return leaf
+
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if not node.has_instance(instance, weight):
+                continue
+            if not node.children:
+                if node.is_exact_match(instance):
+                    return node
+                continue
+            nodes.extend(reversed(node.children))
+        return None
+
+    @write_locked
+    def unfit(self, leaf, instance, weight=1):
+        """
+        Removes an instance from a leaf of the tree that holds it, e.g., the
+        leaf that :meth:`CobwebTree.ifit` returned for it.
+
+        The instance's counts are subtracted from the leaf and each of its
+        ancestors (see: :meth:`CobwebNode.decrement_counts`). A leaf that no
+        longer holds any instances is removed from the tree, and a node that
+        is left with a single child is replaced by that child, so the tree
+        keeps the shape that fitting only the remaining instances could have
+        produced.
+
+        Instances cannot be removed from a tree that decays its counts (see:
+        :class:`CobwebTree`): by the time an instance is removed, the weight
+        that it still carries depends on how long ago it was fit, which the
+        tree does not record.
+
+        :param leaf: a leaf of the tree that holds the instance
+        :type leaf: CobwebNode
+        :param instance: the instance to remove
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to remove
+        :type weight: a positive number
+        :raises ValueError: if the leaf is not a leaf of this tree or does not
+            hold the instance, or if the tree decays its counts
+        """
+        self._check_removable()
+        self._sanity_check_weight(weight)
+        instance = self.intern_instance(instance, extend=False)
+
+        path = []
+        node = leaf
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        if path[-1] is not self.root:
+            raise ValueError("The leaf is not in the tree.")
+
+        if leaf.children or not leaf.has_instance(instance, weight):
+            raise ValueError("The leaf does not hold the instance.")
+
+        for node in path:
+            node.decrement_counts(instance, weight)
+
+        # Remove the empty leaf (a root without instances is kept as the
+        # empty tree).
+        node = leaf
+        if node.count <= 0 and node.parent is not None:
+            parent = node.parent
+            parent.children.remove(node)
+            node.parent = None
+            node = parent
+            self.num_nodes -= 1
+
+        if len(node.children) == 1:
+            self._collapse(node)
+
+    def _check_removable(self):
+        """
+        Raises a ValueError if instances cannot be removed from the tree
+        because it decays its counts (see: :meth:`CobwebTree.unfit`).
+        """
+        if self.decay is not None:
+            raise ValueError("Instances cannot be removed from a tree that "
+                             "decays its counts.")
+
+    def _collapse(self, node):
+        """
+        Replaces a node that has a single child by that child and returns the
+        child.
+
+        :param node: a node of the tree with one child
+        :type node: CobwebNode
+        :return: the child that took the node's place
+        :rtype: CobwebNode
+        """
+        child = node.children[0]
+        node.children.remove(child)
+        child.parent = node.parent
+        if node.parent is None:
+            self.root = child
+        else:
+            node.parent.children.remove(node)
+            node.parent.children.append(child)
+        node.parent = None
+        self.num_nodes -= 1
+        return child
+
+    def decay_children(self, node, prune=True):
+        """
+        Applies the decay (see: :class:`CobwebTree`) that has accumulated
+        since a node and its children were last decayed, so that their counts
+        are current, and then prunes the children whose count fell below the
+        tree's ``min_count``.
+
+        The counts of a pruned child are subtracted from the node and its
+        ancestors (which must already be current; :meth:`CobwebTree.cobweb`
+        decays the nodes from the root down). If every child is pruned, the
+        node instead keeps its counts and becomes a leaf, and if only one
+        child is left, the child takes the node's place (as in
+        :meth:`CobwebTree.unfit`), after which its own children are decayed
+        and pruned in the same way.
+
+        :param node: a node of the tree whose parent is current
+        :type node: CobwebNode
+        :param prune: whether to prune children with small counts
+        :type prune: bool
+        :return: the node, or the descendant that took its place
+        :rtype: CobwebNode
+        """
+        while True:
+            self._decay_node(node)
+            for child in node.children:
+                self._decay_node(child)
+
+            if not prune or not node.children:
+                return node
+            pruned = [child for child in node.children
+                      if child.count < self.min_count]
+            if not pruned:
+                return node
+
+            if len(pruned) == len(node.children):
+                self._fold(node)
+                return node
+
+            for child in pruned:
+                ancestor = node
+                while ancestor is not None:
+                    ancestor.remove_counts_from_node(child)
+                    ancestor = ancestor.parent
+                node.children.remove(child)
+                child.parent = None
+                self.num_nodes -= child.num_concepts()
+
+            if len(node.children) != 1:
+                return node
+            node = self._collapse(node)
+
+    def _fold(self, node):
+        """
+        Removes all of a node's descendants, so that the node becomes a leaf.
+        The node's counts already include theirs, so they are kept.
+        """
+        for child in list(node.children):
+            node.children.remove(child)
+            child.parent = None
+            self.num_nodes -= child.num_concepts()
+        node.children_table = None
+
+    def _limit_children(self, node, child=None):
+        """
+        Groups the children of a node under other concepts until it has at
+        most the tree's ``max_children`` children (see: :class:`CobwebTree`).
+
+        Each step finds the two children whose merge gives the node the
+        highest category utility (see: :meth:`CobwebNode._best_bulk_merge`),
+        even if it is lower than the node's current category utility. If
+        either of them has children, the other one is moved under it, as one
+        more of its children; otherwise both are leaves and they are merged
+        under a new concept (see: :meth:`CobwebNode.merge`). Either way the
+        node's category utility is the same. Moving a child under a sibling
+        rather than always merging keeps repeated grouping from building long
+        chains of merged concepts, but it can take the sibling past the
+        limit, in which case the sibling's children are grouped in turn.
+
+        When a single child took the node past the limit, only the pairs that
+        include that child are considered, so each step takes time linear in
+        the limit instead of quadratic.
+
+        :param node: a node of the tree
+        :type node: CobwebNode
+        :param child: the child that took the node past the limit, if known
+        :type child: CobwebNode
+        """
+        nodes = [(node, child)]
+        while nodes:
+            node, child = nodes.pop()
+            while len(node.children) > self.max_children:
+                child1, child2 = node._best_bulk_merge(required=True,
+                                                       child=child)
+                child = None
+                if not child1.children and not child2.children:
+                    node.merge(child1, child2)
+                    self.num_nodes += 1
+                    continue
+
+                if (not child1.children or
+                        (child2.children and child2.count > child1.count)):
+                    child1, child2 = child2, child1
+                node.children.remove(child2)
+                child1.update_counts_from_node(child2)
+                child2.parent = child1
+                child1.children.append(child2)
+                if len(child1.children) > self.max_children:
+                    nodes.append((child1, child2))
+
+    def _limit_tree_children(self):
+        """
+        Applies :meth:`CobwebTree._limit_children` to every node of the tree
+        that has too many children, after an operation that can add children
+        without checking the limit (e.g., :meth:`CobwebTree.fit_bulk`).
+        """
+        if self.max_children is None:
+            return
+        for node in self.root._walk():
+            if len(node.children) > self.max_children:
+                self._limit_children(node)
+
+    @write_locked
+    def compact(self, max_nodes):
+        """
+        Folds concepts into their parents until the tree has at most max_nodes
+        nodes.
+
+        Only the parents of leaves (nodes whose children are all leaves) are
+        folded: the parent drops its children and becomes a leaf. A parent's
+        counts are the sum of its children's counts, so the counts of every
+        remaining node, and so prediction from them, are unchanged; only the
+        distinctions between the folded children are forgotten. The parents
+        whose children contribute the least are folded first, measured by the
+        :meth:`category utility <CobwebNode.category_utility>` of their
+        children weighted by the parent's count. Folding a parent can make its
+        own parent a parent of leaves, which is considered in the next pass
+        over the tree if more nodes still need to be removed.
+
+        :param max_nodes: the number of nodes to keep
+        :type max_nodes: int
+        """
+        while True:
+            nodes = self.root._walk()
+            self.num_nodes = len(nodes)
+            if self.num_nodes <= max_nodes:
+                return
+
+            candidates = [node for node in nodes if node.children and
+                          all(not child.children for child in node.children)]
+            candidates.sort(key=lambda node: (node.count *
+                                              node.category_utility()))
+            for node in candidates:
+                if self.num_nodes <= max_nodes:
+                    return
+                self._fold(node)
+
+    def structure_stats(self):
+        """
+        Returns statistics about the shape of the tree, which determines how
+        long it takes to sort an instance down it (e.g., in
+        :meth:`CobwebTree.ifit` or :meth:`CobwebTree.categorize`): the number
+        of nodes and leaves, the maximum and mean depth of the leaves (the
+        root has depth 0), and the maximum and mean number of children of the
+        nodes that have children.
+
+        :return: the statistics, keyed by 'nodes', 'leaves', 'max_depth',
+            'mean_depth', 'max_children', and 'mean_children'
+        :rtype: dict
+        """
+        nodes = 0
+        leaves = 0
+        depths = 0
+        max_depth = 0
+        parents = 0
+        max_children = 0
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            nodes += 1
+            if node.children:
+                parents += 1
+                max_children = max(max_children, len(node.children))
+                stack.extend((child, depth + 1) for child in node.children)
+            else:
+                leaves += 1
+                depths += depth
+                max_depth = max(max_depth, depth)
+        return {'nodes': nodes,
+                'leaves': leaves,
+                'max_depth': max_depth,
+                'mean_depth': depths / leaves,
+                'max_children': max_children,
+                'mean_children': (nodes - 1) / parents if parents else 0.0}
+
+    @write_locked
+    def reorganize(self):
+        """
+        Restructures the tree in a single pass from the root down, to undo
+        the lopsided structure (e.g., deep chains of concepts or nodes with
+        very many children) that fitting a stream of ordered instances can
+        leave behind.
+
+        At each node the children are first split (see:
+        :meth:`CobwebNode.cu_for_split`) and merged (see:
+        :meth:`CobwebNode._best_bulk_merge`) while that increases the node's
+        :meth:`category utility <CobwebNode.category_utility>`, with the best
+        split tried before the best merge. Then each leaf among the node's
+        grandchildren is moved to another child of the node if that child
+        fits it better (see: :meth:`CobwebTree._redistribute_leaves`). Every
+        change increases the category utility of the node that it is made
+        at, and none of them change the counts of the node or its ancestors,
+        so the pass ends. The node's children, including any that the pass
+        created, are then reorganized in the same way.
+
+        If the tree decays its counts, all of the counts are first brought up
+        to the tree's current time (without pruning any concepts). If the
+        tree limits the children of each node, splits that would exceed the
+        limit are skipped, and nodes that leaf moves take past it have their
+        children grouped afterwards (see: :meth:`CobwebTree._limit_children`).
+        If the tree has a ``max_nodes`` budget, it is compacted afterwards if
+        it has grown past it (see: :meth:`CobwebTree.compact`).
+
+        :return: the :meth:`CobwebTree.structure_stats` of the tree before and
+            after the pass, and the number of splits, merges, and leaf moves
+            that it made, keyed by 'before', 'after', 'splits', 'merges', and
+            'moves'
+        :rtype: dict
+        """
+        result = {'before': self.structure_stats(), 'splits': 0,
+                  'merges': 0, 'moves': 0}
+        if self.decay is not None:
+            for node in self.root._walk():
+                self._decay_node(node)
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if not node.children:
+                continue
+
+            while True:
+                # A small margin keeps rounding errors from splitting a
+                # node that was just merged, and then merging it again.
+                cu = node.category_utility() + 1e-9
+                children_cg = node.children_correct_guesses()
+                split = None
+                for child in node.children:
+                    if child.children and (
+                            self.max_children is None or
+                            len(node.children) - 1 + len(child.children) <=
+                            self.max_children):
+                        split_cu = node.cu_for_split(child, children_cg)
+                        if split_cu > cu:
+                            cu = split_cu
+                            split = child
+                if split is not None:
+                    node.split(split)
+                    result['splits'] += 1
+                    continue
+
+                if len(node.children) <= 2:
+                    break
+                merge = node._best_bulk_merge()
+                if merge is None:
+                    break
+                node.merge(*merge)
+                result['merges'] += 1
+
+            result['moves'] += self._redistribute_leaves(node)
+            stack.extend(node.children)
+
+        self._limit_tree_children()
+        self.num_nodes = self.root.num_concepts()
+        if self.max_nodes is not None and self.num_nodes > self.max_nodes:
+            self.compact(self.max_nodes - self.max_nodes // 10)
+        result['after'] = self.structure_stats()
+        return result
+
+    def _redistribute_leaves(self, node):
+        """
+        Moves each leaf among a node's grandchildren to another child of the
+        node when that increases the node's category utility (see:
+        :meth:`CobwebTree.reorganize`).
+
+        Moving a leaf from one child to another changes the count weighted
+        expected correct guesses of only those two children, so each move is
+        scored without building the changed children. A child that is left
+        with a single child is replaced by it (as in
+        :meth:`CobwebTree.unfit`), and the moved leaf is placed within its new
+        parent as a subtree is in :meth:`CobwebTree.merge_tree`.
+
+        :param node: a node of the tree
+        :type node: CobwebNode
+        :return: the number of leaves that were moved
+        :rtype: int
+        """
+        moves = 0
+        leaves = [leaf for child in node.children for leaf in child.children
+                  if not leaf.children]
+        for leaf in leaves:
+            parent = leaf.parent
+            if parent is None or parent.parent is not node:
+                continue
+
+            rest = node.__class__()
+            rest.tree = self
+            rest.copy_counts_from(parent)
+            rest.remove_counts_from_node(leaf)
+            best_gain = (parent.count * parent.expected_correct_guesses() -
+                         rest.count * rest.expected_correct_guesses())
+
+            best = None
+            for child in node.children:
+                if child is parent:
+                    continue
+                gain = ((child.count + leaf.count) *
+                        child.expected_correct_guesses_for_merge(leaf) -
+                        child.count * child.expected_correct_guesses())
+                # A small margin keeps rounding errors from moving leaves
+                # between equally good children.
+                if gain > best_gain + 1e-9 * node.count:
+                    best_gain = gain
+                    best = child
+            if best is None:
+                continue
+
+            parent.children.remove(leaf)
+            parent.remove_counts_from_node(leaf)
+            leaf.parent = None
+            if len(parent.children) == 1:
+                self._collapse(parent)
+
+            stack = [('merge', best, leaf)]
+            while stack:
+                action, target, subtree = stack.pop()
+                if action == 'merge':
+                    stack.extend(self._merge_subtree(target, subtree))
+                else:
+                    stack.extend(self._place_subtree(target, subtree))
+            moves += 1
+        return moves
+
+    def _decay_node(self, node):
+        """
+        Brings a node's counts up to the tree's current time.
+        """
+        steps = self.time - node.timestamp
+        if steps:
+            node.decay_counts(self.decay ** steps)
+            node.timestamp = self.time
+
+    def cobweb(self, instance, weight=1):
         """
         The core cobweb algorithm used in fitting and categorization.
 
@@ -137,6 +1384,25 @@ class CobwebTree(object):
         the instance is inserted and the leaf is returned. Otherwise, a new
         leaf is created.
 
+        If the tree decays its counts (see: :class:`CobwebTree`), the children
+        of each node are decayed and pruned before they are compared (see:
+        :meth:`CobwebTree.decay_children`). If the tree has a node budget and
+        the instance made it grow past the budget, the tree is compacted (see:
+        :meth:`CobwebTree.compact`) and the node that now holds the instance
+        is returned.
+
+        If the tree has an operation policy (see: :class:`CobwebTree`), merges
+        and splits are only evaluated at the nodes that the policy allows. If
+        the tree limits the children of each node, splits that would exceed
+        the limit are not evaluated, and a node that a new child takes past
+        the limit has some of its children grouped (see:
+        :meth:`CobwebTree._limit_children`).
+
+        If the tree indexes duplicates (see: :class:`CobwebTree`) and the
+        instance is an exact match for a leaf that was indexed earlier, the
+        instance is instead added to that leaf and its ancestors without
+        evaluating any operations (see: :meth:`CobwebTree._indexed_leaf`).
+
         .. note:: This function is equivalent to calling
             :meth:`CobwebTree.ifit` but its better to call ifit because it is
             the polymorphic method siganture between the different cobweb
@@ -144,63 +1410,159 @@ class CobwebTree(object):
 
         :param instance: an instance to incorporate into the tree
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
         :return: a concept describing the instance
         :rtype: CobwebNode
 
         .. seealso:: :meth:`CobwebTree.ifit`, :meth:`CobwebTree.categorize`
         """
+        instance = self.intern_instance(instance)
+        if self.decay is not None:
+            self.time += 1
+
+        if self.leaf_index is not None:
+            fingerprint = self.fingerprint(instance)
+            leaf = self._indexed_leaf(fingerprint, instance, weight)
+            if leaf is not None:
+                return leaf
+
         current = self.root
 
         while current:
+            if self.decay is not None:
+                current = self.decay_children(current)
+
             # the current.count == 0 here is for the initially empty tree.
             if not current.children and (current.is_exact_match(instance) or
                                          current.count == 0):
                 # print("leaf match")
-                current.increment_counts(instance)
+                current.increment_counts(instance, weight)
                 break
 
             elif not current.children:
                 # print("fringe split")
-                new = current.__class__(current)
-                current.parent = new
-                new.children.append(current)
-
-                if new.parent:
-                    new.parent.children.remove(current)
-                    new.parent.children.append(new)
-                else:
-                    self.root = new
-
-                new.increment_counts(instance)
-                current = new.create_new_child(instance)
+                current = current.fringe_split(instance, weight)
+                self.num_nodes += 2
                 break
 
             else:
-                best1_cu, best1, best2 = current.two_best_children(instance)
-                _, best_action = current.get_best_operation(instance, best1,
-                                                            best2, best1_cu)
+                best1_cu, best1, best2 = current.two_best_children(instance,
+                                                                   weight)
+                possible_ops = ALL_OPERATIONS
+                if self.operation_policy is not None:
+                    possible_ops = self.operation_policy.possible_ops(current)
+                if (self.max_children is not None and
+                        len(current.children) - 1 + len(best1.children) >
+                        self.max_children):
+                    possible_ops = [op for op in possible_ops
+                                    if op != 'split']
+                _, best_action = current.get_best_operation(
+                    instance, best1, best2, best1_cu, possible_ops, weight)
+                if self.operation_policy is not None:
+                    self.operation_policy.record(current, possible_ops,
+                                                 best_action)
 
                 # print(best_action)
                 if best_action == 'best':
-                    current.increment_counts(instance)
+                    current.increment_counts(instance, weight)
                     current = best1
                 elif best_action == 'new':
-                    current.increment_counts(instance)
-                    current = current.create_new_child(instance)
+                    current.increment_counts(instance, weight)
+                    parent = current
+                    current = current.create_new_child(instance, weight)
+                    self.num_nodes += 1
+                    if (self.max_children is not None and
+                            len(parent.children) > self.max_children):
+                        self._limit_children(parent, current)
                     break
                 elif best_action == 'merge':
-                    current.increment_counts(instance)
+                    current.increment_counts(instance, weight)
                     new_child = current.merge(best1, best2)
                     current = new_child
+                    self.num_nodes += 1
                 elif best_action == 'split':
                     current.split(best1)
+                    self.num_nodes -= 1
                 else:
                     raise Exception('Best action choice "' + best_action +
                                     '" not a recognized option. This should be'
                                     ' impossible...')
 
+        if self.max_nodes is not None and self.num_nodes > self.max_nodes:
+            path = []
+            node = current
+            while node is not None:
+                path.append(node)
+                node = node.parent
+            self.compact(self.max_nodes - self.max_nodes // 10)
+            # The instance's leaf may have been folded into an ancestor.
+            for node in path:
+                if node.parent is not None or node is self.root:
+                    current = node
+                    break
+
+        if self.leaf_index is not None:
+            self.leaf_index[fingerprint] = current
+
         return current
 
+    def fingerprint(self, instance):
+        """
+        Returns a hashable key for an instance that two instances share
+        exactly when a leaf holding one would be an exact match for the other
+        (see: :meth:`CobwebNode.is_exact_match`), i.e., the set of the
+        instance's visible attribute value pairs.
+
+        :param instance: an instance
+        :type instance: :ref:`Instance<instance-rep>`
+        :return: the instance's fingerprint
+        :rtype: frozenset
+        """
+        return frozenset((attr, instance[attr]) for attr in instance
+                         if attr[0] != "_")
+
+    def _indexed_leaf(self, fingerprint, instance, weight=1):
+        """
+        Adds an instance to the leaf indexed under its fingerprint, if there
+        is one, and returns the leaf.
+
+        The leaf is checked before it is used: it must still be a leaf of this
+        tree and an exact match for the instance. Operations that restructure
+        the tree therefore do not need to update the index; an entry that is
+        no longer valid is dropped and the instance is sorted down the tree
+        as usual (which indexes the leaf it ends up in).
+
+        :param fingerprint: the instance's fingerprint
+        :type fingerprint: frozenset
+        :param instance: an interned instance to incorporate into the tree
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
+        :return: the leaf the instance was added to, or None
+        :rtype: CobwebNode
+        """
+        leaf = self.leaf_index.get(fingerprint)
+        if leaf is None:
+            return None
+
+        path = []
+        node = leaf
+        while node is not None:
+            path.append(node)
+            node = node.parent
+
+        if (path[-1] is not self.root or leaf.children or
+                not leaf.is_exact_match(instance)):
+            del self.leaf_index[fingerprint]
+            return None
+
+        for node in reversed(path):
+            if self.decay is not None:
+                self.decay_children(node, prune=False)
+            node.increment_counts(instance, weight)
+        return leaf
+
     def _cobweb_categorize(self, instance):
         """
         A cobweb specific version of categorize, not intended to be
@@ -208,6 +1570,7 @@ class CobwebTree(object):
 
         .. seealso:: :meth:`CobwebTree.categorize`
         """
+        instance = self.intern_instance(instance, extend=False)
         current = self.root
         while current:
             if not current.children:
@@ -216,6 +1579,36 @@ class CobwebTree(object):
             _, best1, best2 = current.two_best_children(instance)
             current = best1
 
+    def _cobweb_categorize_batch(self, instances):
+        """
+        A cobweb specific version of categorize_batch, not intended to be
+        externally called.
+
+        .. seealso:: :meth:`CobwebTree.categorize_batch`
+        """
+        instances = [self.intern_instance(instance, extend=False)
+                     for instance in instances]
+        concepts = [None] * len(instances)
+
+        batches = [(self.root, list(range(len(instances))))]
+        while batches:
+            current, batch = batches.pop()
+            if not current.children:
+                for i in batch:
+                    concepts[i] = current
+                continue
+
+            routed = {}
+            best = current.categorize_children([instances[i] for i in batch])
+            for i, child in zip(batch, best):
+                if id(child) not in routed:
+                    routed[id(child)] = (child, [])
+                routed[id(child)][1].append(i)
+            batches.extend(routed.values())
+
+        return concepts
+
+    @read_locked
     def infer_missing(self, instance, choice_fn="most likely",
                       allow_none=True):
         """
@@ -250,6 +1643,117 @@ class CobwebTree(object):
 
         return temp_instance
 
+    def _parallel_map(self, fn, args, processes=None, chunksize=None):
+        """
+        Calls ``fn(tree, arg)`` for each of the args using a pool of worker
+        processes and returns the results in order. The function must be
+        defined at the top level of a module so it can be sent to the workers.
+
+        The tree is handed to the workers once rather than with every task.
+        Where processes can be forked, workers share the parent's copy of the
+        tree (copy-on-write); otherwise the tree is pickled once for each
+        worker when the pool starts. The tree must not be modified while this
+        is running.
+        """
+        global _parallel_tree
+
+        args = list(args)
+        if processes == 1 or len(args) <= 1:
+            return [fn(self, a) for a in args]
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context()
+            with ctx.Pool(processes, _init_parallel_worker, (self,)) as pool:
+                return pool.map(partial(_run_parallel, fn), args, chunksize)
+
+        ctx = multiprocessing.get_context('fork')
+        with _parallel_lock:
+            _parallel_tree = self
+            try:
+                pool = ctx.Pool(processes, _init_parallel_worker)
+            finally:
+                _parallel_tree = None
+        with pool:
+            return pool.map(partial(_run_parallel, fn), args, chunksize)
+
+    @read_locked
+    def categorize_parallel(self, instances, processes=None, chunksize=None):
+        """
+        Categorize a collection of instances using a pool of worker processes
+        and return their resulting concepts in order.
+
+        Each instance is categorized exactly as in
+        :meth:`CobwebTree.categorize` (so this also works for subclasses that
+        override it), and the returned concepts are the nodes of this tree.
+        The tree is shared with the workers once, not sent with every task.
+        **This process does not modify the tree's knowledge**, and the tree
+        must not be modified until it returns.
+
+        :param instances: a collection of instances to be categorized
+        :type instances: [:ref:`Instance<instance-rep>`,
+            :ref:`Instance<instance-rep>`, ...]
+        :param processes: the number of worker processes to use, defaults to
+            the number of CPUs.
+        :type processes: int
+        :param chunksize: the number of instances sent to a worker at a time,
+            see :meth:`multiprocessing.pool.Pool.map`.
+        :type chunksize: int
+        :return: the concept describing each instance, in the same order
+        :rtype: [CobwebNode, CobwebNode, ...]
+
+        .. seealso:: :meth:`CobwebTree.categorize`
+        """
+        concept_ids = self._parallel_map(_parallel_categorize, instances,
+                                         processes, chunksize)
+
+        concepts = {}
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            concepts[node.concept_id] = node
+            nodes.extend(node.children)
+
+        return [concepts[concept_id] for concept_id in concept_ids]
+
+    @read_locked
+    def infer_missing_parallel(self, instances, choice_fn="most likely",
+                               allow_none=True, processes=None,
+                               chunksize=None):
+        """
+        Calls infer_missing on a collection of instances using a pool of
+        worker processes and returns the completed instances in order.
+
+        See :meth:`CobwebTree.categorize_parallel` for how the work is shared
+        between the processes. Note that with the "sampled" choice function
+        each worker draws from its own copy of the random number generator.
+
+        :param instances: the instances to be completed.
+        :type instances: [:ref:`Instance<instance-rep>`,
+            :ref:`Instance<instance-rep>`, ...]
+        :param choice_fn: a string specifying the choice function to use,
+            either "most likely" or "sampled".
+        :type choice_fn: a string
+        :param allow_none: whether attributes not in the instance can be
+            inferred to be missing. If False, then all attributes will be
+            inferred with some value.
+        :type allow_none: Boolean
+        :param processes: the number of worker processes to use, defaults to
+            the number of CPUs.
+        :type processes: int
+        :param chunksize: the number of instances sent to a worker at a time,
+            see :meth:`multiprocessing.pool.Pool.map`.
+        :type chunksize: int
+        :return: the completed instances, in the same order
+        :rtype: [:ref:`Instance<instance-rep>`,
+            :ref:`Instance<instance-rep>`, ...]
+
+        .. seealso:: :meth:`CobwebTree.infer_missing`
+        """
+        args = [(instance, choice_fn, allow_none) for instance in instances]
+        return self._parallel_map(_parallel_infer_missing, args, processes,
+                                  chunksize)
+
+    @read_locked
     def categorize(self, instance):
         """
         Sort an instance in the categorization tree and return its resulting
@@ -271,6 +1775,35 @@ class CobwebTree(object):
         self._sanity_check_instance(instance)
         return self._cobweb_categorize(instance)
 
+    @read_locked
+    def categorize_batch(self, instances):
+        """
+        Sort a collection of instances in the categorization tree and return
+        their resulting concepts.
+
+        This returns the same concepts as calling
+        :meth:`CobwebTree.categorize` on each instance (up to the random
+        tie-breaking between equally good children), but rather than sorting
+        each instance from the root on its own the whole batch is pushed down
+        the tree together. At each node the instances routed there are scored
+        against the node's children in one call to
+        :meth:`CobwebNode.categorize_children`, so the per node setup is paid
+        once per batch rather than once per instance. **This process does not
+        modify the tree's knowledge.**
+
+        :param instances: a collection of instances to be categorized
+        :type instances: [:ref:`Instance<instance-rep>`,
+            :ref:`Instance<instance-rep>`, ...]
+        :return: the concept describing each instance, in the same order
+        :rtype: [CobwebNode, CobwebNode, ...]
+
+        .. seealso:: :meth:`CobwebTree.categorize`
+        """
+        instances = list(instances)
+        for instance in instances:
+            self._sanity_check_instance(instance)
+        return self._cobweb_categorize_batch(instances)
+
 
 class CobwebNode(object):
     """
@@ -288,9 +1821,18 @@ class CobwebNode(object):
     used as a copy constructor to "deepcopy" a node, including all references
     to other parts of the original node's CobwebTree.
 
+    Nodes declare their fields in ``__slots__`` so that they do not carry a
+    per-instance ``__dict__``; large trees hold millions of nodes. Subclasses
+    that add fields should declare them in their own ``__slots__`` (see
+    :class:`Cobweb3Node <concept_formation.cobweb3.Cobweb3Node>`).
+
     :param otherNode: Another concept node to deepcopy.
     :type otherNode: CobwebNode
     """
+    __slots__ = ('concept_id', 'count', 'av_counts', 'sq_counts',
+                 'sq_counts_total', 'visible_attrs', 'children', 'parent',
+                 'tree', 'children_table', 'timestamp', 'version')
+
     # a counter used to generate unique concept names.
     _counter = 0
 
@@ -299,17 +1841,36 @@ class CobwebNode(object):
         self.concept_id = self.gensym()
         self.count = 0.0
         self.av_counts = {}
-        self.children = []
+        self.sq_counts = {}
+        self.sq_counts_total = 0.0
+        self.visible_attrs = 0
+        self.children = Children()
         self.parent = None
         self.tree = None
+        self.children_table = None
+        self.timestamp = 0
+        self.version = 0
 
         if otherNode:
             self.tree = otherNode.tree
             self.parent = otherNode.parent
+            self.timestamp = otherNode.timestamp
             self.update_counts_from_node(otherNode)
 
-            for child in otherNode.children:
-                self.children.append(self.__class__(child))
+            # The descendants are copied in the same (preorder) order as
+            # recursive copying would, but with an explicit stack so that
+            # deep trees can be copied.
+            stack = [(child, self) for child in reversed(otherNode.children)]
+            while stack:
+                original, parent = stack.pop()
+                new = self.__class__()
+                new.tree = original.tree
+                new.parent = parent
+                new.timestamp = original.timestamp
+                new.update_counts_from_node(original)
+                parent.children.append(new)
+                stack.extend((child, new) for child in
+                             reversed(original.children))
 
     def shallow_copy(self):
         """
@@ -323,9 +1884,91 @@ class CobwebNode(object):
         temp = self.__class__()
         temp.tree = self.tree
         temp.parent = self.parent
-        temp.update_counts_from_node(self)
+        temp.copy_counts_from(self)
         return temp
 
+    def copy_counts_from(self, node):
+        """
+        Sets the counts of the current node, which must not have any counts
+        yet, to a copy of the specified node's counts.
+
+        This gives the same counts as
+        :meth:`CobwebNode.update_counts_from_node`, but copies the node's
+        tables directly (including its squared counts) rather than adding the
+        counts one value at a time. The node's timestamp (see:
+        :meth:`CobwebTree.decay_children`) is copied along with the counts.
+
+        :param node: Another node from the same CobwebTree
+        :type node: CobwebNode
+        """
+        self.version += 1
+        self.timestamp = node.timestamp
+        self.count = node.count
+        self.av_counts = {attr: node.av_counts[attr].copy() for attr in
+                          node.av_counts}
+        self.sq_counts = node.sq_counts.copy()
+        self.sq_counts_total = node.sq_counts_total
+        self.visible_attrs = node.visible_attrs
+
+    def intern_counts(self, vocabulary):
+        """
+        Replaces the attributes and values in the node's tables by their
+        canonical copies in a tree's vocabulary (see:
+        :meth:`CobwebTree.intern_instance`), e.g., when the node is copied from
+        another tree. Keys that are not in the vocabulary are kept.
+
+        :param vocabulary: a tree's vocabulary
+        :type vocabulary: dict
+        """
+        av_counts = {}
+        sq_counts = {}
+        for attr in self.av_counts:
+            values = self.av_counts[attr]
+            key = vocabulary.get(attr, attr)
+            av_counts[key] = {vocabulary.get(val, val): values[val]
+                              for val in values}
+            sq_counts[key] = self.sq_counts[attr]
+        self.av_counts = av_counts
+        self.sq_counts = sq_counts
+
+    def __getstate__(self):
+        """
+        Returns the node's fields for pickling and copying.
+
+        The node's tree is stored first and its parent is left out, so a node
+        refers only down the tree and to the tree itself. When the tree is
+        pickled it stores its nodes from the leaves up (see
+        :meth:`CobwebTree.__getstate__`), so every child has already been
+        stored by the time its parent is and pickling does not recurse down
+        the tree. The parents are restored by :meth:`CobwebNode.__setstate__`.
+        A node without a tree keeps its parent.
+        """
+        state = {'tree': self.tree}
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                if slot not in state and hasattr(self, slot):
+                    state[slot] = getattr(self, slot)
+        if hasattr(self, '__dict__'):
+            state.update(self.__dict__)
+        if self.tree is not None:
+            del state['parent']
+        state['children_table'] = None
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores a pickled or copied node and sets the parent of each of its
+        children.
+        """
+        if not hasattr(self, 'parent'):
+            self.parent = None
+        self.timestamp = 0
+        self.version = 0
+        for attr in state:
+            setattr(self, attr, state[attr])
+        for child in self.children:
+            child.parent = self
+
     def attrs(self, attr_filter=None):
         """
         Iterates over the attributes present in the node's attribute-value
@@ -342,21 +1985,89 @@ class CobwebNode(object):
         else:
             return filter(attr_filter, self.av_counts)
 
-    def increment_counts(self, instance):
+    def increment_counts(self, instance, weight=1):
         """
         Increment the counts at the current node according to the specified
         instance.
 
         :param instance: A new instances to incorporate into the node.
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
+        """
+        self.version += 1
+        self.count += weight
+        for attr in instance:
+            if attr not in self.av_counts:
+                self.add_attr(attr)
+            prior_count = self.av_counts[attr].get(instance[attr], 0)
+            self.av_counts[attr][instance[attr]] = prior_count + weight
+            self.update_sq_counts(attr, prior_count, prior_count + weight)
+
+        if self.parent is not None and self.parent.children_table is not None:
+            self.parent.children_table.update_row(self, instance)
+
+    def decrement_counts(self, instance, weight=1):
+        """
+        Decrement the counts at the current node according to the specified
+        instance, undoing :meth:`CobwebNode.increment_counts`.
+
+        Values whose counts drop to (about) zero are removed from the node's
+        table, as are attributes that are left without any values, so the node
+        is the same as if the instance had never been added to it. As in
+        :meth:`CobwebNode.remove_counts_from_node`, a count within a rounding
+        error of zero (e.g., after removing fractional weights) counts as
+        zero.
+
+        :param instance: An instance that was previously added to the node.
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to remove
+        :type weight: a positive number
+        """
+        self.version += 1
+        prior_count = self.count
+        self.count -= weight
+        if self.count <= prior_count * 1e-9:
+            self.count = 0
+        for attr in instance:
+            prior_count = self.av_counts[attr][instance[attr]]
+            new_count = prior_count - weight
+            if new_count <= prior_count * 1e-9:
+                new_count = 0
+            self.update_sq_counts(attr, prior_count, new_count)
+            if new_count > 0:
+                self.av_counts[attr][instance[attr]] = new_count
+            else:
+                del self.av_counts[attr][instance[attr]]
+                if not self.av_counts[attr]:
+                    self.remove_attr(attr)
+
+        if self.parent is not None and self.parent.children_table is not None:
+            self.parent.children_table.update_row(self, instance)
+
+    def has_instance(self, instance, weight=1):
+        """
+        Returns whether the node's counts include the instance (at least
+        weight times), i.e., whether :meth:`CobwebNode.decrement_counts` could
+        remove it.
+
+        :param instance: an instance
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance
+        :type weight: a positive number
+        :return: whether the node holds the instance
+        :rtype: bool
         """
-        self.count += 1
+        # Fractional weights can leave the counts a rounding error short.
+        weight *= 1 - 1e-9
+        if self.count < weight:
+            return False
         for attr in instance:
             if attr not in self.av_counts:
-                self.av_counts[attr] = {}
-            if instance[attr] not in self.av_counts[attr]:
-                self.av_counts[attr][instance[attr]] = 0
-            self.av_counts[attr][instance[attr]] += 1
+                return False
+            if self.av_counts[attr].get(instance[attr], 0) < weight:
+                return False
+        return True
 
     def update_counts_from_node(self, node):
         """
@@ -368,14 +2079,110 @@ class CobwebNode(object):
         :param node: Another node from the same CobwebTree
         :type node: CobwebNode
         """
+        self.version += 1
         self.count += node.count
         for attr in node.attrs('all'):
             if attr not in self.av_counts:
-                self.av_counts[attr] = {}
+                self.add_attr(attr)
             for val in node.av_counts[attr]:
-                if val not in self.av_counts[attr]:
-                    self.av_counts[attr][val] = 0
-                self.av_counts[attr][val] += node.av_counts[attr][val]
+                prior_count = self.av_counts[attr].get(val, 0)
+                new_count = prior_count + node.av_counts[attr][val]
+                self.av_counts[attr][val] = new_count
+                self.update_sq_counts(attr, prior_count, new_count)
+
+    def remove_counts_from_node(self, node):
+        """
+        Decrements the counts of the current node by the amount in the
+        specified node, undoing :meth:`CobwebNode.update_counts_from_node`.
+
+        Values whose counts drop to (about) zero are removed from the node's
+        table, as are attributes that are left without any values.
+
+        :param node: Another node from the same CobwebTree whose counts are
+            included in this node's
+        :type node: CobwebNode
+        """
+        self.version += 1
+        self.count -= node.count
+        for attr in node.attrs('all'):
+            for val in node.av_counts[attr]:
+                prior_count = self.av_counts[attr][val]
+                new_count = prior_count - node.av_counts[attr][val]
+                # Decayed counts are not whole numbers, so a value that the
+                # node no longer has can be left with a rounding error.
+                if new_count <= prior_count * 1e-9:
+                    new_count = 0
+                    del self.av_counts[attr][val]
+                else:
+                    self.av_counts[attr][val] = new_count
+                self.update_sq_counts(attr, prior_count, new_count)
+            if not self.av_counts[attr]:
+                self.remove_attr(attr)
+
+    def decay_counts(self, factor):
+        """
+        Multiplies all of the node's counts by a factor (see:
+        :meth:`CobwebTree.decay_children`).
+
+        :param factor: the decay factor
+        :type factor: float
+        """
+        self.version += 1
+        sq_factor = factor * factor
+        self.count *= factor
+        self.sq_counts_total *= sq_factor
+        for attr in self.av_counts:
+            values = self.av_counts[attr]
+            for val in values:
+                values[val] *= factor
+            self.sq_counts[attr] *= sq_factor
+
+    def add_attr(self, attr):
+        """
+        Adds an empty value table for a previously unseen attribute.
+
+        :param attr: an attribute that is not yet in the node's table
+        :type attr: :ref:`Attribute<attributes>`
+        """
+        self.av_counts[attr] = {}
+        self.sq_counts[attr] = 0.0
+        if attr[0] != "_":
+            self.visible_attrs += 1
+
+    def remove_attr(self, attr):
+        """
+        Removes the (empty) value table of an attribute, undoing
+        :meth:`CobwebNode.add_attr`.
+
+        :param attr: an attribute that no longer has any values in the node
+        :type attr: :ref:`Attribute<attributes>`
+        """
+        if attr[0] != "_":
+            self.sq_counts_total -= self.sq_counts[attr]
+            self.visible_attrs -= 1
+        del self.av_counts[attr]
+        del self.sq_counts[attr]
+
+    def update_sq_counts(self, attr, prior_count, new_count):
+        """
+        Updates the running sum of squared value counts for an attribute after
+        one of its values changed from prior_count to new_count.
+
+        These sums are maintained so that
+        :meth:`CobwebNode.expected_correct_guesses` does not need to walk the
+        entire attribute-value table.
+
+        :param attr: the attribute whose value count changed
+        :type attr: :ref:`Attribute<attributes>`
+        :param prior_count: the value's count before the change
+        :type prior_count: float
+        :param new_count: the value's count after the change
+        :type new_count: float
+        """
+        delta = new_count * new_count - prior_count * prior_count
+        self.sq_counts[attr] += delta
+        if attr[0] != "_":
+            self.sq_counts_total += delta
 
     def expected_correct_guesses(self):
         """
@@ -385,21 +2192,91 @@ class CobwebNode(object):
         This is the sum of the probability of each attribute value squared.
         This function is used in calculating category utility.
 
+        The squared value counts of the visible attributes are maintained
+        incrementally (see :meth:`CobwebNode.update_sq_counts`), so this is
+        computed in constant time as:
+
+        .. math::
+
+            \\frac{1}{|A|} \\sum_i \\sum_j P(A_i = V_{ij})^2 =
+            \\frac{\\sum_i \\sum_j count(A_i = V_{ij})^2}{|A| \\times count^2}
+
         :return: the number of correct guesses that are expected from the given
                  concept.
         :rtype: float
         """
-        correct_guesses = 0.0
-        attr_count = 0
+        return (self.sq_counts_total / (self.count * self.count) /
+                self.visible_attrs)
 
-        for attr in self.attrs():
-            attr_count += 1
+    def expected_correct_guesses_for_insert(self, instance, weight=1):
+        """
+        Returns the number of correct guesses that would be expected from the
+        given concept if the instance were added to it.
+
+        This does not modify the node or build a temporary copy of it. Only the
+        values in the instance change, so the squared counts are updated using
+        :math:`(c + w)^2 - c^2 = 2cw + w^2` for each value the instance
+        touches, where :math:`w` is the weight of the instance (1 for a single
+        instance).
+
+        :param instance: The instance currently being categorized
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
+        :return: the number of correct guesses that would be expected after
+            the instance is added to the concept.
+        :rtype: float
+        """
+        count = self.count + weight
+        sq_counts_total = self.sq_counts_total
+        visible_attrs = self.visible_attrs
+
+        for attr in instance:
+            if attr[0] == "_":
+                continue
             if attr in self.av_counts:
-                for val in self.av_counts[attr]:
-                    prob = (self.av_counts[attr][val]) / self.count
-                    correct_guesses += (prob * prob)
+                prior_count = self.av_counts[attr].get(instance[attr], 0)
+            else:
+                prior_count = 0
+                visible_attrs += 1
+            sq_counts_total += 2 * prior_count * weight + weight * weight
+
+        return sq_counts_total / (count * count) / visible_attrs
+
+    def expected_correct_guesses_for_merge(self, node):
+        """
+        Returns the number of correct guesses that would be expected from the
+        given concept if the counts of another node were added to it (see:
+        :meth:`CobwebNode.update_counts_from_node`).
+
+        Like :meth:`CobwebNode.expected_correct_guesses_for_insert`, this does
+        not modify the node or build a temporary copy of it. The squared
+        counts of the merged concept are the squared counts of both nodes
+        plus :math:`2 c_1 c_2` for each value that both nodes have seen.
+
+        :param node: another node of the same tree
+        :type node: CobwebNode
+        :return: the number of correct guesses that would be expected after
+            the node's counts are added to the concept.
+        :rtype: float
+        """
+        count = self.count + node.count
+        sq_counts_total = self.sq_counts_total + node.sq_counts_total
+        visible_attrs = self.visible_attrs
+
+        for attr in node.av_counts:
+            if attr[0] == "_":
+                continue
+            if attr not in self.av_counts:
+                visible_attrs += 1
+                continue
+            values = self.av_counts[attr]
+            other_values = node.av_counts[attr]
+            for val in other_values:
+                if val in values:
+                    sq_counts_total += 2 * values[val] * other_values[val]
 
-        return correct_guesses / attr_count
+        return sq_counts_total / (count * count) / visible_attrs
 
     def category_utility(self):
         """
@@ -444,8 +2321,30 @@ class CobwebNode(object):
         return ((child_correct_guesses - self.expected_correct_guesses()) /
                 len(self.children))
 
+    def children_correct_guesses(self):
+        """
+        Returns the sum of the expected correct guesses of the node's children
+        weighted by their counts, i.e., :math:`\\sum_k C_k.count \\times
+        \\sum_i \\sum_j P(A_i = V_{ij} | C_k)^2`.
+
+        Dividing this sum by the count of the parent gives the first term of
+        :meth:`CobwebNode.category_utility`. Because the children's expected
+        correct guesses are maintained incrementally, the category utility of
+        the hypothetical operations (e.g., :meth:`CobwebNode.cu_for_merge`)
+        can be computed by adjusting this sum for only the children that the
+        operation changes, instead of building a temporary tree.
+
+        :return: the count weighted expected correct guesses of the children
+        :rtype: float
+        """
+        correct_guesses = 0.0
+        for child in self.children:
+            correct_guesses += child.count * child.expected_correct_guesses()
+        return correct_guesses
+
     def get_best_operation(self, instance, best1, best2, best1_cu,
-                           possible_ops=["best", "new", "merge", "split"]):
+                           possible_ops=["best", "new", "merge", "split"],
+                           weight=1):
         """
         Given an instance, the two best children based on category utility and
         a set of possible operations, find the operation that produces the
@@ -493,7 +2392,12 @@ class CobwebNode(object):
                 :align: center
 
         Each operation is entertained and the resultant category utility is
-        used to pick which operation to perform. The list of operations to
+        used to pick which operation to perform. If the tree prunes operations
+        (see: :class:`CobwebTree`), a merge or split is only evaluated if an
+        upper bound on its category utility (see:
+        :meth:`CobwebNode.cu_for_merge_bound` and
+        :meth:`CobwebNode.cu_for_split_bound`) is not below the best operation
+        so far. The list of operations to
         entertain can be controlled with the possible_ops parameter. For
         example, when performing categorization without modifying knoweldge
         only the best and new operators are used.
@@ -511,6 +2415,8 @@ class CobwebNode(object):
         :param possible_ops: A list of operations from ["best", "new", "merge",
             "split"] to entertain.
         :type possible_ops: ["best", "new", "merge", "split"]
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
         :return: A tuple of the category utility of the best operation and the
             name of the best operation.
         :rtype: (cu_bestOp, name_bestOp)
@@ -518,34 +2424,144 @@ class CobwebNode(object):
         if not best1:
             raise ValueError("Need at least one best child.")
 
+        # Merge and split are skipped when an upper bound on their category
+        # utility is below the best operation found so far. The tie breaking
+        # random number is drawn either way, so pruning never changes which
+        # operation is chosen.
+        stats = getattr(self.tree, 'operation_stats', None)
+        prune = getattr(self.tree, 'prune_operations', False)
+        children_cg = None
+        parent_cg = None
+        best_cu = None
         operations = []
 
         if "best" in possible_ops:
             operations.append((best1_cu, random(), "best"))
+            best_cu = best1_cu
         if "new" in possible_ops:
-            operations.append((self.cu_for_new_child(instance), random(),
-                               'new'))
+            children_cg = self.children_correct_guesses()
+            parent_cg = self.expected_correct_guesses_for_insert(instance,
+                                                                 weight)
+            cu = self.cu_for_new_child(instance, weight, children_cg,
+                                       parent_cg)
+            operations.append((cu, random(), 'new'))
+            if best_cu is None or cu > best_cu:
+                best_cu = cu
         if "merge" in possible_ops and len(self.children) > 2 and best2:
-            operations.append((self.cu_for_merge(best1, best2, instance),
-                               random(), 'merge'))
+            if children_cg is None:
+                children_cg = self.children_correct_guesses()
+            if parent_cg is None:
+                parent_cg = self.expected_correct_guesses_for_insert(instance,
+                                                                     weight)
+            if prune and best_cu is not None and (
+                    self.cu_for_merge_bound(best1, best2, instance, weight,
+                                            children_cg, parent_cg) <
+                    best_cu - 1e-9):
+                random()
+                if stats is not None:
+                    stats['merge', 'pruned'] += 1
+            else:
+                cu = self.cu_for_merge(best1, best2, instance, weight,
+                                       children_cg, parent_cg)
+                operations.append((cu, random(), 'merge'))
+                if best_cu is None or cu > best_cu:
+                    best_cu = cu
+                if stats is not None:
+                    stats['merge', 'evaluated'] += 1
         if "split" in possible_ops and len(best1.children) > 0:
-            operations.append((self.cu_for_split(best1), random(), 'split'))
+            if children_cg is None:
+                children_cg = self.children_correct_guesses()
+            if prune and best_cu is not None and (
+                    self.cu_for_split_bound(best1, children_cg) <
+                    best_cu - 1e-9):
+                random()
+                if stats is not None:
+                    stats['split', 'pruned'] += 1
+            else:
+                operations.append((self.cu_for_split(best1, children_cg),
+                                   random(), 'split'))
+                if stats is not None:
+                    stats['split', 'evaluated'] += 1
 
         operations.sort(reverse=True)
         # print(operations)
         best_op = (operations[0][0], operations[0][2])
+        if stats is not None:
+            stats[best_op[1], 'chosen'] += 1
         # print(best_op)
         return best_op
 
-    def two_best_children(self, instance):
+    def _best_bulk_merge(self, required=False, child=None):
+        """
+        Returns the two children whose merge (see: :meth:`CobwebNode.merge`)
+        would most increase the node's category utility, or None if no merge
+        would increase it. This is used by :meth:`CobwebTree.fit_bulk
+        <concept_formation.cobweb.CobwebTree.fit_bulk>` and
+        :meth:`CobwebTree.merge_tree
+        <concept_formation.cobweb.CobwebTree.merge_tree>`, after the node's
+        instances have all been added to its children, and by
+        :meth:`CobwebTree.reorganize
+        <concept_formation.cobweb.CobwebTree.reorganize>`. The merged nodes
+        are scored with :meth:`CobwebNode.expected_correct_guesses_for_merge`
+        rather than built.
+
+        :param required: if True, the best merge is returned even if it
+            would decrease the node's category utility (see:
+            :meth:`CobwebTree._limit_children
+            <concept_formation.cobweb.CobwebTree._limit_children>`)
+        :type required: bool
+        :param child: if set, only merges of this child with one of the other
+            children are considered, which takes time linear rather than
+            quadratic in the number of children
+        :type child: CobwebNode
+        :return: the two children to merge, or None
+        :rtype: (CobwebNode, CobwebNode) or None
+        """
+        children = list(self.children)
+        child_cgs = [child.count * child.expected_correct_guesses()
+                     for child in children]
+        children_cg = sum(child_cgs)
+        parent_cg = self.expected_correct_guesses()
+        best_cu = ((children_cg / self.count - parent_cg) /
+                   len(self.children))
+        if required:
+            best_cu = float('-inf')
+        best = None
+        if child is None:
+            pairs = ((i, j) for i in range(len(children))
+                     for j in range(i + 1, len(children)))
+        else:
+            i = children.index(child)
+            pairs = ((i, j) for j in range(len(children)) if j != i)
+        for i, j in pairs:
+            child1 = children[i]
+            child2 = children[j]
+            merged_cg = ((child1.count + child2.count) *
+                         child1.expected_correct_guesses_for_merge(child2))
+            cu = (((children_cg - child_cgs[i] - child_cgs[j] + merged_cg) /
+                   self.count - parent_cg) / (len(children) - 1))
+            if cu > best_cu:
+                best_cu = cu
+                best = (child1, child2)
+        return best
+
+    def two_best_children(self, instance, weight=1):
         """
         Calculates the category utility of inserting the instance into each of
         this node's children and returns the best two. In the event of ties
         children are sorted first by category utility, then by their size, then
         by a random value.
 
+        If the node has a :class:`ChildrenTable
+        <concept_formation.children_table.ChildrenTable>` (see:
+        :meth:`CobwebNode.get_children_table`), the relative category utility
+        of every child is computed in a single vectorized pass and only the
+        children tied with the best two scores are sorted.
+
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
         :return: the category utility and indices for the two best children
             (the second tuple will be ``None`` if there is only 1 child).
         :rtype: ((cu_best1,index_best1),(cu_best2,index_best2))
@@ -553,19 +2569,30 @@ class CobwebNode(object):
         if len(self.children) == 0:
             raise Exception("No children!")
 
-        children_relative_cu = [(self.relative_cu_for_insert(child, instance),
-                                 child.count, random(), child) for child in
-                                self.children]
+        table = self.get_children_table()
+        if table is None:
+            children_relative_cu = [(self.relative_cu_for_insert(child,
+                                                                 instance,
+                                                                 weight),
+                                     child.count, random(), child) for child
+                                    in self.children]
+        else:
+            relative_cus = table.relative_cu_for_insert(instance, weight)
+            second = np.partition(relative_cus, -2)[-2]
+            children_relative_cu = [(float(relative_cus[i]),
+                                     table.children[i].count, random(),
+                                     table.children[i]) for i in
+                                    np.nonzero(relative_cus >= second)[0]]
         children_relative_cu.sort(reverse=True)
 
         # Convert the relative CU's of the two best children into CU scores
         # that can be compared with the other operations.
-        const = self.compute_relative_CU_const(instance)
+        const = self.compute_relative_CU_const(instance, weight)
 
         best1 = children_relative_cu[0][3]
         best1_relative_cu = children_relative_cu[0][0]
-        best1_cu = (best1_relative_cu / (self.count+1) / len(self.children)
-                    + const)
+        best1_cu = (best1_relative_cu / (self.count + weight) /
+                    len(self.children) + const)
 
         best2 = None
         if len(children_relative_cu) > 1:
@@ -573,7 +2600,80 @@ class CobwebNode(object):
 
         return best1_cu, best1, best2
 
-    def compute_relative_CU_const(self, instance):
+    def categorize_children(self, instances):
+        """
+        Returns the child that each instance would be sorted into, i.e., the
+        best child that :meth:`CobwebNode.two_best_children` would return for
+        it, with ties broken in the same way.
+
+        The children and their weighted expected correct guesses (or the
+        node's :class:`ChildrenTable
+        <concept_formation.children_table.ChildrenTable>`) are prepared once
+        and then reused for every instance.
+
+        :param instances: The instances currently being categorized
+        :type instances: [:ref:`Instance<instance-rep>`,
+            :ref:`Instance<instance-rep>`, ...]
+        :return: the best child for each instance
+        :rtype: [CobwebNode, CobwebNode, ...]
+        """
+        if len(self.children) == 0:
+            raise Exception("No children!")
+
+        children = list(self.children)
+        counts = [child.count for child in children]
+        table = self.get_children_table()
+        if table is None:
+            correct_guesses = [child.count * child.expected_correct_guesses()
+                               for child in children]
+
+        best = []
+        for instance in instances:
+            if table is None:
+                relative_cus = [
+                    (child.count + 1) *
+                    child.expected_correct_guesses_for_insert(instance) -
+                    correct_guesses[i] for i, child in enumerate(children)]
+            else:
+                relative_cus = table.relative_cu_for_insert(instance).tolist()
+
+            scores = list(zip(relative_cus, counts))
+            top = max(scores)
+            tied = [(random(), i) for i, score in enumerate(scores)
+                    if score == top]
+            best.append(children[max(tied)[1]])
+
+        return best
+
+    def get_children_table(self):
+        """
+        Returns an up to date :class:`ChildrenTable
+        <concept_formation.children_table.ChildrenTable>` for the node's
+        children, or None if inserts should be scored one child at a time.
+
+        A table is used when the tree's ``min_vectorized_children`` is set and
+        the node has at least that many children. The table is created the
+        first time it is needed and synced on each later call. Because this
+        also happens while a tree is only being read, creating and syncing
+        tables is guarded by a module level lock.
+
+        :return: the node's children table or None
+        :rtype: ChildrenTable
+        """
+        threshold = None
+        if self.tree is not None:
+            threshold = self.tree.min_vectorized_children
+        if threshold is None or len(self.children) < max(threshold, 2):
+            return None
+
+        with _children_table_lock:
+            if self.children_table is None:
+                self.children_table = ChildrenTable(self)
+            else:
+                self.children_table.sync()
+            return self.children_table
+
+    def compute_relative_CU_const(self, instance, weight=1):
         """
         Computes the constant value that is used to convert between CU and
         relative CU scores. The constant value is basically the category
@@ -590,27 +2690,28 @@ class CobwebNode(object):
         child :math:`k`,  :math:`C_k.count` is the number of instances stored
         in child :math:`C_k`, :math:`count` is the number of instances stored
         in the root. Finally, :math:`UpdatedRoot` is a copy of the root that
-        has been updated with the counts of the instance.
+        has been updated with the counts of the instance. (For a weighted
+        instance, :math:`count + 1` becomes :math:`count + w`.)
 
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
         :return: The value of the constant used to relativize the CU.
         :rtype: float
         """
-        temp = self.shallow_copy()
-        temp.increment_counts(instance)
-        ec_root_u = temp.expected_correct_guesses()
+        ec_root_u = self.expected_correct_guesses_for_insert(instance, weight)
 
         const = 0
         for c in self.children:
-            const += ((c.count / (self.count + 1)) *
+            const += ((c.count / (self.count + weight)) *
                       c.expected_correct_guesses())
 
         const -= ec_root_u
         const /= len(self.children)
         return const
 
-    def relative_cu_for_insert(self, child, instance):
+    def relative_cu_for_insert(self, child, instance, weight=1):
         """
         Computes a relative CU score for each insert operation. The relative CU
         score is more efficient to calculate for each insert operation and is
@@ -641,8 +2742,12 @@ class CobwebNode(object):
             \\sum_j P(A_i = V_{ij}| UpdatedC_i)^2 - (C_i.count) * \\sum_i
             \\sum_j P(A_i = V_{ij}| C_i)^2
 
-        where :math:`UpdatedC_i` is a copy of :math:`C_i` that has been updated
-        with the counts from the given instance.
+        where :math:`UpdatedC_i` is :math:`C_i` updated with the counts from
+        the given instance. The expected correct guesses of :math:`UpdatedC_i`
+        are computed with
+        :meth:`CobwebNode.expected_correct_guesses_for_insert`, which only
+        touches the attributes present in the instance, so no temporary copy
+        of the child is made.
 
         By computing relative_CU scores instead of CU scores for each insert
         operation, the time complexity of the underlying Cobweb algorithm is
@@ -652,19 +2757,24 @@ class CobwebNode(object):
         being categorized, :math:`A` is the average number of attributes per
         instance, and :math:`V` is the average number of values per attribute.
 
+        For an instance with a weight of :math:`w`, :math:`C_i.count + 1`
+        becomes :math:`C_i.count + w` and :math:`UpdatedC_i` holds :math:`w`
+        copies of the instance.
+
         :param child: a child of the current node
         :type child: CobwebNode
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
         :return: the category utility of adding the instance to the given node
         :rtype: float
         """
-        temp = child.shallow_copy()
-        temp.increment_counts(instance)
-        return ((child.count + 1) * temp.expected_correct_guesses() -
+        return ((child.count + weight) *
+                child.expected_correct_guesses_for_insert(instance, weight) -
                 child.count * child.expected_correct_guesses())
 
-    def cu_for_insert(self, child, instance):
+    def cu_for_insert(self, child, instance, weight=1):
         """
         Compute the category utility of adding the instance to the specified
         child.
@@ -679,6 +2789,8 @@ class CobwebNode(object):
         :type child: CobwebNode
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
         :return: the category utility of adding the instance to the given node
         :rtype: float
 
@@ -687,17 +2799,17 @@ class CobwebNode(object):
 
         """
         temp = self.shallow_copy()
-        temp.increment_counts(instance)
+        temp.increment_counts(instance, weight)
 
         for c in self.children:
             temp_child = c.shallow_copy()
             temp.children.append(temp_child)
             temp_child.parent = temp
             if c == child:
-                temp_child.increment_counts(instance)
+                temp_child.increment_counts(instance, weight)
         return temp.category_utility()
 
-    def create_new_child(self, instance):
+    def create_new_child(self, instance, weight=1):
         """
         Create a new child (to the current node) with the counts initialized by
         the *given instance*.
@@ -707,13 +2819,16 @@ class CobwebNode(object):
 
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
         :return: The new child
         :rtype: CobwebNode
         """
         new_child = self.__class__()
         new_child.parent = self
         new_child.tree = self.tree
-        new_child.increment_counts(instance)
+        new_child.timestamp = self.timestamp
+        new_child.increment_counts(instance, weight)
         self.children.append(new_child)
         return new_child
 
@@ -729,37 +2844,92 @@ class CobwebNode(object):
         :rtype: CobwebNode
         """
         if self.count > 0:
-            new = self.__class__(self)
+            new = self.__class__()
             new.parent = self
             new.tree = self.tree
+            new.copy_counts_from(self)
             self.children.append(new)
             return new
 
-    def cu_for_new_child(self, instance):
+    def fringe_split(self, instance, weight=1):
+        """
+        Performs a fringe split at the current node, which must be a leaf: a
+        new node with a copy of the leaf's counts takes the leaf's place in
+        the tree, and the leaf and a new leaf for the instance become its
+        children.
+
+        Only the leaf's counts are copied (see:
+        :meth:`CobwebNode.copy_counts_from`), and the leaf keeps its identity
+        and concept id, so nodes that refer to it remain valid.
+
+        :param instance: The instance currently being categorized
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
+        :return: The new leaf for the instance
+        :rtype: CobwebNode
+
+        .. seealso:: :meth:`CobwebNode.cu_for_fringe_split`
+        """
+        new = self.shallow_copy()
+        self.parent = new
+        new.children.append(self)
+
+        if new.parent:
+            siblings = new.parent.children
+            siblings.remove(self)
+            siblings.append(new)
+        else:
+            self.tree.root = new
+
+        new.increment_counts(instance, weight)
+        return new.create_new_child(instance, weight)
+
+    def cu_for_new_child(self, instance, weight=1, children_cg=None,
+                         parent_cg=None):
         """
         Return the category utility for creating a new child using the
         particular instance.
 
         This operation does not actually create the child it only calculates
         what the result of creating it would be. For the actual new function
-        see: :meth:`CobwebNode.create_new_child`.
+        see: :meth:`CobwebNode.create_new_child`. The existing children are
+        unchanged by this operation, so their contribution is taken from
+        :meth:`CobwebNode.children_correct_guesses` and only the new child's
+        expected correct guesses are computed.
 
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
+        :param children_cg: the node's
+            :meth:`CobwebNode.children_correct_guesses`, if it is already
+            known
+        :type children_cg: float
+        :param parent_cg: the node's
+            :meth:`CobwebNode.expected_correct_guesses_for_insert` for the
+            instance, if it is already known
+        :type parent_cg: float
         :return: the category utility of adding the instance to a new child.
         :rtype: float
 
         .. seealso:: :meth:`CobwebNode.get_best_operation`
         """
-        temp = self.shallow_copy()
-        for c in self.children:
-            temp.children.append(c.shallow_copy())
+        if children_cg is None:
+            children_cg = self.children_correct_guesses()
+        new_child = self.__class__()
+        new_child.tree = self.tree
 
-        # temp = self.shallow_copy()
+        child_correct_guesses = (
+            children_cg +
+            weight * new_child.expected_correct_guesses_for_insert(instance,
+                                                                   weight))
 
-        temp.increment_counts(instance)
-        temp.create_new_child(instance)
-        return temp.category_utility()
+        if parent_cg is None:
+            parent_cg = self.expected_correct_guesses_for_insert(instance,
+                                                                 weight)
+        return ((child_correct_guesses / (self.count + weight) - parent_cg) /
+                (len(self.children) + 1))
 
     def merge(self, best1, best2):
         """
@@ -781,6 +2951,7 @@ class CobwebNode(object):
         new_child = self.__class__()
         new_child.parent = self
         new_child.tree = self.tree
+        new_child.timestamp = self.timestamp
 
         new_child.update_counts_from_node(best1)
         new_child.update_counts_from_node(best2)
@@ -796,13 +2967,16 @@ class CobwebNode(object):
 
         return new_child
 
-    def cu_for_merge(self, best1, best2, instance):
+    def cu_for_merge(self, best1, best2, instance, weight=1,
+                     children_cg=None, parent_cg=None):
         """
         Return the category utility for merging the two best children.
 
         This does not actually merge the two children it only calculates what
         the result of the merge would be. For the actual merge operation see:
-        :meth:`CobwebNode.merge`
+        :meth:`CobwebNode.merge`. Only the merged node is built; the other
+        children contribute through
+        :meth:`CobwebNode.children_correct_guesses`.
 
         :param best1: The child of the current node with the best category
             utility
@@ -812,30 +2986,124 @@ class CobwebNode(object):
         :type best2: CobwebNode
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
+        :param children_cg: the node's
+            :meth:`CobwebNode.children_correct_guesses`, if it is already
+            known
+        :type children_cg: float
+        :param parent_cg: the node's
+            :meth:`CobwebNode.expected_correct_guesses_for_insert` for the
+            instance, if it is already known
+        :type parent_cg: float
         :return: The category utility that would result from merging best1 and
             best2.
         :rtype: float
 
         .. seealso:: :meth:`CobwebNode.get_best_operation`
         """
-        temp = self.shallow_copy()
-        temp.increment_counts(instance)
-
+        if children_cg is None:
+            children_cg = self.children_correct_guesses()
         new_child = self.__class__()
         new_child.tree = self.tree
-        new_child.parent = temp
         new_child.update_counts_from_node(best1)
         new_child.update_counts_from_node(best2)
-        new_child.increment_counts(instance)
-        temp.children.append(new_child)
 
-        for c in self.children:
-            if c == best1 or c == best2:
-                continue
-            temp_child = c.shallow_copy()
-            temp.children.append(temp_child)
+        child_correct_guesses = (
+            children_cg -
+            best1.count * best1.expected_correct_guesses() -
+            best2.count * best2.expected_correct_guesses() +
+            (new_child.count + weight) *
+            new_child.expected_correct_guesses_for_insert(instance, weight))
+
+        if parent_cg is None:
+            parent_cg = self.expected_correct_guesses_for_insert(instance,
+                                                                 weight)
+        return ((child_correct_guesses / (self.count + weight) - parent_cg) /
+                (len(self.children) - 1))
+
+    def cu_for_merge_bound(self, best1, best2, instance, weight=1,
+                           children_cg=None, parent_cg=None):
+        """
+        Returns an upper bound on :meth:`CobwebNode.cu_for_merge` that does
+        not build the merged node.
+
+        The merged node's sum of squared counts is the sum of best1's and
+        best2's, plus twice the products of their counts of each value, plus
+        the terms for the instance's values. Only the product terms need every
+        value of both children; by the Cauchy-Schwarz inequality they are at
+        most :math:`\\sqrt{S_1 S_2}`, where :math:`S` is a child's sum of
+        squared counts. The merged node also has at least as many attributes
+        as best1, best2, or the instance, so the bound only visits the
+        instance's attributes.
 
-        return temp.category_utility()
+        :param best1: The child of the current node with the best category
+            utility
+        :type best1: CobwebNode
+        :param best2: The child of the current node with the second best
+            category utility
+        :type best2: CobwebNode
+        :param instance: The instance currently being categorized
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
+        :param children_cg: the node's
+            :meth:`CobwebNode.children_correct_guesses`, if it is already
+            known
+        :type children_cg: float
+        :param parent_cg: the node's
+            :meth:`CobwebNode.expected_correct_guesses_for_insert` for the
+            instance, if it is already known
+        :type parent_cg: float
+        :return: an upper bound on the category utility of merging best1 and
+            best2
+        :rtype: float
+        """
+        if children_cg is None:
+            children_cg = self.children_correct_guesses()
+
+        squared_counts1 = best1._squared_counts()
+        squared_counts2 = best2._squared_counts()
+        squared_counts = (squared_counts1 + squared_counts2 +
+                          2 * sqrt(squared_counts1 * squared_counts2))
+        instance_attrs = 0
+        for attr in instance:
+            if attr[0] != "_":
+                val = instance[attr]
+                squared_counts += weight * (
+                    2 * (best1._value_count(attr, val) +
+                         best2._value_count(attr, val)) + weight)
+                instance_attrs += 1
+        visible_attrs = max(best1.visible_attrs, best2.visible_attrs,
+                            instance_attrs)
+
+        merged_cg = (squared_counts / (best1.count + best2.count + weight) /
+                     visible_attrs)
+        child_correct_guesses = (
+            children_cg -
+            best1.count * best1.expected_correct_guesses() -
+            best2.count * best2.expected_correct_guesses() + merged_cg)
+        if parent_cg is None:
+            parent_cg = self.expected_correct_guesses_for_insert(instance,
+                                                                 weight)
+        return ((child_correct_guesses / (self.count + weight) - parent_cg) /
+                (len(self.children) - 1))
+
+    def _squared_counts(self):
+        """
+        Returns the sum of the squared counts of the concept's visible
+        attribute values, as used by :meth:`CobwebNode.cu_for_merge_bound`.
+        """
+        return self.sq_counts_total
+
+    def _value_count(self, attr, val):
+        """
+        Returns the count of an attribute value, as used by
+        :meth:`CobwebNode.cu_for_merge_bound`.
+        """
+        if attr not in self.av_counts:
+            return 0
+        return self.av_counts[attr].get(val, 0)
 
     def split(self, best):
         """
@@ -855,7 +3123,7 @@ class CobwebNode(object):
             child.tree = self.tree
             self.children.append(child)
 
-    def cu_for_fringe_split(self, instance):
+    def cu_for_fringe_split(self, instance, weight=1):
         """
         Return the category utility of performing a fringe split (i.e.,
         adding a leaf to a leaf).
@@ -869,6 +3137,8 @@ class CobwebNode(object):
 
         :param instance: The instance currently being categorized
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance being added
+        :type weight: a positive number
         :return: the category utility of fringe splitting at the current node.
         :rtype: float
 
@@ -877,12 +3147,12 @@ class CobwebNode(object):
         temp = self.shallow_copy()
 
         temp.create_child_with_current_counts()
-        temp.increment_counts(instance)
-        temp.create_new_child(instance)
+        temp.increment_counts(instance, weight)
+        temp.create_new_child(instance, weight)
 
         return temp.category_utility()
 
-    def cu_for_split(self, best):
+    def cu_for_split(self, best, children_cg=None):
         """
         Return the category utility for splitting the best child.
 
@@ -890,25 +3160,79 @@ class CobwebNode(object):
         result of the split would be. For the actual split operation see:
         :meth:`CobwebNode.split`. Unlike the category utility calculations for
         the other operations split does not need the instance because splits
-        trigger a recursive call on the current node.
+        trigger a recursive call on the current node. No nodes are copied; the
+        promoted grandchildren's contribution is read from
+        :meth:`CobwebNode.children_correct_guesses` on best.
 
         :param best: The child of the current node with the best category
             utility
         :type best: CobwebNode
+        :param children_cg: the node's
+            :meth:`CobwebNode.children_correct_guesses`, if it is already
+            known
+        :type children_cg: float
         :return: The category utility that would result from splitting best
         :rtype: float
 
         .. seealso:: :meth:`CobwebNode.get_best_operation`
         """
-        temp = self.shallow_copy()
+        if children_cg is None:
+            children_cg = self.children_correct_guesses()
+        child_correct_guesses = (children_cg -
+                                 best.count * best.expected_correct_guesses() +
+                                 best.children_correct_guesses())
 
-        for c in self.children + best.children:
-            if c == best:
-                continue
-            temp_child = c.shallow_copy()
-            temp.children.append(temp_child)
+        return ((child_correct_guesses / self.count -
+                 self.expected_correct_guesses()) /
+                (len(self.children) - 1 + len(best.children)))
 
-        return temp.category_utility()
+    def cu_for_split_bound(self, best, children_cg=None):
+        """
+        Returns an upper bound on :meth:`CobwebNode.cu_for_split` that does
+        not visit best's children.
+
+        A concept never expects more than one correct guess per attribute, so
+        the count weighted expected correct guesses of best's children (the
+        children that the split would promote) are at most best's count.
+
+        :param best: The child of the current node with the best category
+            utility
+        :type best: CobwebNode
+        :param children_cg: the node's
+            :meth:`CobwebNode.children_correct_guesses`, if it is already
+            known
+        :type children_cg: float
+        :return: an upper bound on the category utility of splitting best
+        :rtype: float
+        """
+        if children_cg is None:
+            children_cg = self.children_correct_guesses()
+        child_correct_guesses = (children_cg -
+                                 best.count * best.expected_correct_guesses() +
+                                 best.count)
+
+        return ((child_correct_guesses / self.count -
+                 self.expected_correct_guesses()) /
+                (len(self.children) - 1 + len(best.children)))
+
+    def _exact_instance(self):
+        """
+        Returns the instance that the concept is an exact match of (see:
+        :meth:`CobwebNode.is_exact_match`), or None if its instances are not
+        all the same.
+
+        :return: the instance or None
+        :rtype: :ref:`Instance<instance-rep>` or None
+        """
+        instance = {}
+        for attr in self.attrs():
+            if len(self.av_counts[attr]) != 1:
+                return None
+            for val in self.av_counts[attr]:
+                if self.av_counts[attr][val] != self.count:
+                    return None
+                instance[attr] = val
+        return instance
 
     def is_exact_match(self, instance):
         """
@@ -961,27 +3285,65 @@ class CobwebNode(object):
         """
         return self.pretty_print()
 
+    def _walk(self, postorder=False):
+        """
+        Returns this node and all of its descendants. By default they are in
+        preorder (each node before its children, in the order the tree is
+        printed); with ``postorder`` every node comes after its children.
+
+        The tree is traversed with an explicit stack, so this works for trees
+        that are deeper than the recursion limit.
+
+        :param postorder: whether to list the children before their parents
+        :type postorder: bool
+        :return: the nodes of the subtree rooted at this node
+        :rtype: [CobwebNode, ...]
+        """
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if postorder:
+                stack.extend(node.children)
+            else:
+                stack.extend(reversed(node.children))
+        if postorder:
+            nodes.reverse()
+        return nodes
+
     def pretty_print(self, depth=0):
         """
         Print the categorization tree
 
         The string formatting inserts tab characters to align child nodes of
-        the same depth.
+        the same depth. Each node is formatted by
+        :meth:`CobwebNode._pretty_print_node`.
 
-        :param depth: The current depth in the print, intended to be called
-                      recursively
+        :param depth: The depth of the current node in the print
         :type depth: int
         :return: a formated string displaying the tree and its children
         :rtype: str
         """
+        lines = []
+        stack = [(self, depth)]
+        while stack:
+            node, node_depth = stack.pop()
+            lines.append(node._pretty_print_node(node_depth))
+            stack.extend((c, node_depth + 1) for c in reversed(node.children))
+        return "".join(lines)
 
-        ret = str(('\t' * depth) + "|-" + str(self.av_counts) + ":" +
-                  str(self.count) + '\n')
-
-        for c in self.children:
-            ret += c.pretty_print(depth+1)
+    def _pretty_print_node(self, depth):
+        """
+        Formats a single line of :meth:`CobwebNode.pretty_print` for this node.
 
-        return ret
+        :param depth: The depth of the node in the print
+        :type depth: int
+        :return: the node's line
+        :rtype: str
+        """
+        return str(('\t' * depth) + "|-" + str(self.av_counts) + ":" +
+                   str(self.count) + '\n')
 
     def depth(self):
         """
@@ -990,10 +3352,12 @@ class CobwebNode(object):
         :return: the depth of the current node in its tree
         :rtype: int
         """
-
-        if self.parent:
-            return 1 + self.parent.depth()
-        return 0
+        depth = 0
+        node = self.parent
+        while node:
+            depth += 1
+            node = node.parent
+        return depth
 
     def is_parent(self, other_concept):
         """
@@ -1025,10 +3389,13 @@ class CobwebNode(object):
         :return: the number of concepts below this concept.
         :rtype: int
         """
-        children_count = 0
-        for c in self.children:
-            children_count += c.num_concepts()
-        return 1 + children_count
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
 
     def output_json(self):
         """
@@ -1038,6 +3405,24 @@ class CobwebNode(object):
                  the node and its children
         :rtype: obj
         """
+        output = self._output_json_node()
+        stack = [(self, output)]
+        while stack:
+            node, node_output = stack.pop()
+            for child in node.children:
+                child_output = child._output_json_node()
+                node_output['children'].append(child_output)
+                stack.append((child, child_output))
+        return output
+
+    def _output_json_node(self):
+        """
+        Outputs this node for :meth:`CobwebNode.output_json`, with an empty
+        list of children that is filled in by the caller.
+
+        :return: an object that contains the node's structural information
+        :rtype: obj
+        """
         output = {}
         output['name'] = "Concept" + str(self.concept_id)
         output['size'] = self.count
@@ -1050,9 +3435,6 @@ class CobwebNode(object):
                                    value in self.av_counts[attr]}
                 # temp[attr + " = " + str(value)] = self.av_counts[attr][value]
 
-        for child in self.children:
-            output["children"].append(child.output_json())
-
         output['counts'] = temp
 
         return output
@@ -1180,3 +3562,23 @@ class CobwebNode(object):
                         raise Exception("Should always be greater than 0")
 
         return ll
+
+
+def combine_trees(trees):
+    """
+    Combines trees that were fit on separate shards of a dataset into a new
+    tree, by merging each of the other trees into a copy of the first (see:
+    :meth:`CobwebTree.merge_tree`). The trees are not changed.
+
+    :param trees: the trees to combine, all of the same class
+    :type trees: [CobwebTree, CobwebTree, ...]
+    :return: the combined tree
+    :rtype: CobwebTree
+    """
+    trees = list(trees)
+    if not trees:
+        raise ValueError("Need at least one tree to combine.")
+    combined = copy.deepcopy(trees[0])
+    for tree in trees[1:]:
+        combined.merge_tree(tree)
+    return combined
@@ -20,6 +20,7 @@ from concept_formation.continuous_value import ContinuousValue
 from concept_formation.utils import isNumber
 from concept_formation.utils import weighted_choice
 from concept_formation.utils import most_likely_choice
+from concept_formation.utils import write_locked
 
 cv_key = "#ContinuousValue#"
 
@@ -55,24 +56,33 @@ class Cobweb3Tree(CobwebTree):
         inner most attributes, some objects might have multiple attributes
         (i.e., 'attr' for different objects) that contribute to the scaling.
     :param inner_attr_scaling: boolean
+    :param kwargs: the other parameters of the tree (e.g., ``thread_safe``
+        or ``max_nodes``) are passed to :class:`CobwebTree
+        <concept_formation.cobweb.CobwebTree>`, which describes them. NumPy
+        scoring of children (``min_vectorized_children``) is not used by
+        Cobweb/3 nodes.
     """
 
-    def __init__(self, scaling=0.5, inner_attr_scaling=True):
+    def __init__(self, scaling=0.5, inner_attr_scaling=True, **kwargs):
         """
         The tree constructor.
         """
-        self.root = Cobweb3Node()
-        self.root.tree = self
         self.scaling = scaling
         self.inner_attr_scaling = inner_attr_scaling
         self.attr_scales = {}
+        super(Cobweb3Tree, self).__init__(**kwargs)
 
+    def _new_root(self):
+        root = Cobweb3Node()
+        root.tree = self
+        return root
+
+    @write_locked
     def clear(self):
         """
         Clears the concepts of the tree, but maintains the scaling parameter.
         """
-        self.root = Cobweb3Node()
-        self.root.tree = self
+        super(Cobweb3Tree, self).clear()
         self.attr_scales = {}
 
     def get_inner_attr(self, attr):
@@ -92,27 +102,57 @@ class Cobweb3Tree(CobwebTree):
         else:
             return attr
 
-    def update_scales(self, instance):
+    def update_scales(self, instance, weight=1, decay=True):
         """
         Reads through all the attributes in an instance and updates the
         tree scales object so that the attributes can be properly scaled.
+        If the tree decays (and decay is True), the scales are decayed first.
         """
+        if decay and self.decay is not None:
+            for scale in self.attr_scales.values():
+                scale.decay(self.decay)
         for attr in instance:
             if isNumber(instance[attr]):
                 inner_attr = self.get_inner_attr(attr)
                 if inner_attr not in self.attr_scales:
                     self.attr_scales[inner_attr] = ContinuousValue()
-                self.attr_scales[inner_attr].update(instance[attr])
+                self.attr_scales[inner_attr].update(instance[attr], weight)
 
-    def cobweb(self, instance):
+    def cobweb(self, instance, weight=1):
         """
         A modification of the cobweb function to update the scales object
         first, so that attribute values can be properly scaled.
         """
-        self.update_scales(instance)
-        return super(Cobweb3Tree, self).cobweb(instance)
+        self.update_scales(instance, weight)
+        return super(Cobweb3Tree, self).cobweb(instance, weight)
+
+    def _merge_tree_state(self, other):
+        """
+        Combines the vocabulary and the attribute scales of another tree into
+        this one when it is merged (see: :meth:`CobwebTree.merge_tree
+        <concept_formation.cobweb.CobwebTree.merge_tree>`).
+        """
+        super(Cobweb3Tree, self)._merge_tree_state(other)
+        for attr in other.attr_scales:
+            if attr not in self.attr_scales:
+                self.attr_scales[self.vocabulary.get(attr, attr)] = \
+                    ContinuousValue()
+            self.attr_scales[attr].combine(other.attr_scales[attr])
+
+    def _bulk_preprocess(self, pairs):
+        """
+        Checks and interns the instances given to :meth:`CobwebTree.fit_bulk
+        <concept_formation.cobweb.CobwebTree.fit_bulk>` and adds them to the
+        attribute scales. All of the instances are treated as current, so the
+        scales are not decayed.
+        """
+        pairs = super(Cobweb3Tree, self)._bulk_preprocess(pairs)
+        for instance, weight in pairs:
+            self.update_scales(instance, weight, decay=False)
+        return pairs
 
-    def ifit(self, instance):
+    @write_locked
+    def ifit(self, instance, weight=1):
         """
         Incrementally fit a new instance into the tree and return its resulting
         concept.
@@ -122,13 +162,39 @@ class Cobweb3Tree(CobwebTree):
 
         :param instance: An instance to be categorized into the tree.
         :type instance:  :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add (see:
+            :meth:`CobwebTree.ifit`)
+        :type weight: a positive number
         :return: A concept describing the instance
         :rtype: Cobweb3Node
 
         .. seealso:: :meth:`CobwebTree.cobweb`
         """
         self._sanity_check_instance(instance)
-        return self.cobweb(instance)
+        self._sanity_check_weight(weight)
+        return self.cobweb(instance, weight)
+
+    @write_locked
+    def unfit(self, leaf, instance, weight=1):
+        """
+        The cobweb3 version of :meth:`CobwebTree.unfit`, which also removes
+        the instance's numeric values from the tree's attribute scales.
+
+        :param leaf: a leaf of the tree that holds the instance
+        :type leaf: Cobweb3Node
+        :param instance: the instance to remove
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to remove
+        :type weight: a positive number
+        """
+        super(Cobweb3Tree, self).unfit(leaf, instance, weight)
+        for attr in instance:
+            if isNumber(instance[attr]):
+                inner_attr = self.get_inner_attr(attr)
+                scale = self.attr_scales[inner_attr]
+                scale.remove(instance[attr], weight)
+                if scale.num <= 0:
+                    del self.attr_scales[inner_attr]
 
 
 class Cobweb3Node(CobwebNode):
@@ -143,8 +209,25 @@ class Cobweb3Node(CobwebNode):
     base and then the returned concept can be used to calculate probabilities
     of certain attributes or determine concept labels.
     """
+    __slots__ = ('cv_attrs',)
+
+    def __init__(self, otherNode=None):
+        """Create a new Cobweb3Node"""
+        self.cv_attrs = []
+        super(Cobweb3Node, self).__init__(otherNode)
+
+    def get_children_table(self):
+        """
+        Cobweb/3 nodes always score inserts one child at a time because
+        :class:`ChildrenTable
+        <concept_formation.children_table.ChildrenTable>` only covers nominal
+        counts.
+
+        :return: None
+        """
+        return None
 
-    def increment_counts(self, instance):
+    def increment_counts(self, instance, weight=1):
         """
         Increment the counts at the current node according to the specified
         instance.
@@ -165,20 +248,152 @@ class Cobweb3Node(CobwebNode):
 
         :param instance: A new instances to incorporate into the node.
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
 
         """
-        self.count += 1
+        self.version += 1
+        self.count += weight
 
         for attr in instance:
-            self.av_counts[attr] = self.av_counts.setdefault(attr, {})
+            if attr not in self.av_counts:
+                self.add_attr(attr)
 
             if isNumber(instance[attr]):
                 if cv_key not in self.av_counts[attr]:
-                    self.av_counts[attr][cv_key] = ContinuousValue()
-                self.av_counts[attr][cv_key].update(instance[attr])
+                    self.add_cv(attr)
+                self.av_counts[attr][cv_key].update(instance[attr], weight)
             else:
                 prior_count = self.av_counts[attr].get(instance[attr], 0)
-                self.av_counts[attr][instance[attr]] = prior_count + 1
+                self.av_counts[attr][instance[attr]] = prior_count + weight
+                self.update_sq_counts(attr, prior_count, prior_count + weight)
+
+    def decrement_counts(self, instance, weight=1):
+        """
+        Decrement the counts at the current node according to the specified
+        instance, modified to remove numeric values from their
+        :class:`ContinuousValue
+        <concept_formation.continuous_value.ContinuousValue>` (see:
+        :meth:`CobwebNode.decrement_counts
+        <concept_formation.cobweb.CobwebNode.decrement_counts>`).
+
+        :param instance: An instance that was previously added to the node.
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to remove
+        :type weight: a positive number
+        """
+        self.version += 1
+        prior_count = self.count
+        self.count -= weight
+        if self.count <= prior_count * 1e-9:
+            self.count = 0
+
+        for attr in instance:
+            if isNumber(instance[attr]):
+                cv = self.av_counts[attr][cv_key]
+                cv.remove(instance[attr], weight)
+                if cv.num <= 0:
+                    del self.av_counts[attr][cv_key]
+                    if attr[0] != "_":
+                        self.cv_attrs.remove(attr)
+            else:
+                prior_count = self.av_counts[attr][instance[attr]]
+                new_count = prior_count - weight
+                if new_count <= prior_count * 1e-9:
+                    new_count = 0
+                self.update_sq_counts(attr, prior_count, new_count)
+                if new_count > 0:
+                    self.av_counts[attr][instance[attr]] = new_count
+                else:
+                    del self.av_counts[attr][instance[attr]]
+            if not self.av_counts[attr]:
+                self.remove_attr(attr)
+
+    def remove_counts_from_node(self, node):
+        """
+        Decrements the counts of the current node by the amount in the
+        specified node, modified to handle numbers (see:
+        :meth:`CobwebNode.remove_counts_from_node
+        <concept_formation.cobweb.CobwebNode.remove_counts_from_node>`).
+
+        :param node: Another node from the same Cobweb3Tree whose counts are
+            included in this node's
+        :type node: Cobweb3Node
+        """
+        self.version += 1
+        self.count -= node.count
+        for attr in node.attrs('all'):
+            for val in node.av_counts[attr]:
+                if val == cv_key:
+                    cv = self.av_counts[attr][cv_key]
+                    prior_num = cv.num
+                    cv.subtract(node.av_counts[attr][cv_key])
+                    if cv.num <= prior_num * 1e-9:
+                        del self.av_counts[attr][cv_key]
+                        if attr[0] != "_":
+                            self.cv_attrs.remove(attr)
+                else:
+                    prior_count = self.av_counts[attr][val]
+                    new_count = prior_count - node.av_counts[attr][val]
+                    if new_count <= prior_count * 1e-9:
+                        new_count = 0
+                        del self.av_counts[attr][val]
+                    else:
+                        self.av_counts[attr][val] = new_count
+                    self.update_sq_counts(attr, prior_count, new_count)
+            if not self.av_counts[attr]:
+                self.remove_attr(attr)
+
+    def decay_counts(self, factor):
+        """
+        Multiplies all of the node's counts by a factor, modified to decay the
+        numeric values (see: :meth:`CobwebNode.decay_counts
+        <concept_formation.cobweb.CobwebNode.decay_counts>`).
+
+        :param factor: the decay factor
+        :type factor: float
+        """
+        self.version += 1
+        for attr in self.av_counts:
+            if cv_key in self.av_counts[attr]:
+                self.av_counts[attr][cv_key].decay(factor)
+        sq_factor = factor * factor
+        self.count *= factor
+        self.sq_counts_total *= sq_factor
+        for attr in self.av_counts:
+            values = self.av_counts[attr]
+            for val in values:
+                if val != cv_key:
+                    values[val] *= factor
+            self.sq_counts[attr] *= sq_factor
+
+    def has_instance(self, instance, weight=1):
+        """
+        Returns whether the node's counts include the instance (at least
+        weight times), modified to handle numbers (see:
+        :meth:`CobwebNode.has_instance
+        <concept_formation.cobweb.CobwebNode.has_instance>`).
+
+        :param instance: an instance
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance
+        :type weight: a positive number
+        :return: whether the node holds the instance
+        :rtype: bool
+        """
+        weight *= 1 - 1e-9
+        if self.count < weight:
+            return False
+        for attr in instance:
+            if attr not in self.av_counts:
+                return False
+            if isNumber(instance[attr]):
+                cv = self.av_counts[attr].get(cv_key)
+                if cv is None or cv.num < weight:
+                    return False
+            elif self.av_counts[attr].get(instance[attr], 0) < weight:
+                return False
+        return True
 
     def update_counts_from_node(self, node):
         """
@@ -194,19 +409,66 @@ class Cobweb3Node(CobwebNode):
         :param node: Another node from the same Cobweb3Tree
         :type node: Cobweb3Node
         """
+        self.version += 1
         self.count += node.count
         for attr in node.attrs('all'):
-            self.av_counts[attr] = self.av_counts.setdefault(attr, {})
+            if attr not in self.av_counts:
+                self.add_attr(attr)
             for val in node.av_counts[attr]:
                 if val == cv_key:
-                    self.av_counts[attr][val] = self.av_counts[attr].get(
-                        val, ContinuousValue())
+                    if cv_key not in self.av_counts[attr]:
+                        self.add_cv(attr)
                     self.av_counts[attr][val].combine(
                         node.av_counts[attr][val])
                 else:
-                    self.av_counts[attr][val] = (self.av_counts[attr].get(val,
-                                                                          0) +
-                                                 node.av_counts[attr][val])
+                    prior_count = self.av_counts[attr].get(val, 0)
+                    new_count = prior_count + node.av_counts[attr][val]
+                    self.av_counts[attr][val] = new_count
+                    self.update_sq_counts(attr, prior_count, new_count)
+
+    def copy_counts_from(self, node):
+        """
+        Sets the counts of the current node, which must not have any counts
+        yet, to a copy of the specified node's counts, modified to copy the
+        numeric values.
+
+        :param node: Another node from the same Cobweb3Tree
+        :type node: Cobweb3Node
+        """
+        super(Cobweb3Node, self).copy_counts_from(node)
+        for attr in self.av_counts:
+            if cv_key in self.av_counts[attr]:
+                self.av_counts[attr][cv_key] = \
+                    self.av_counts[attr][cv_key].copy()
+        self.cv_attrs = list(node.cv_attrs)
+
+    def intern_counts(self, vocabulary):
+        """
+        Replaces the attributes and values in the node's tables by their
+        canonical copies in a tree's vocabulary, including the attributes of
+        its numeric values (see: :meth:`CobwebNode.intern_counts
+        <concept_formation.cobweb.CobwebNode.intern_counts>`).
+
+        :param vocabulary: a tree's vocabulary
+        :type vocabulary: dict
+        """
+        super(Cobweb3Node, self).intern_counts(vocabulary)
+        self.cv_attrs = [vocabulary.get(attr, attr) for attr in self.cv_attrs]
+
+    def add_cv(self, attr):
+        """
+        Adds an empty :class:`ContinuousValue
+        <concept_formation.continuous_value.ContinuousValue>` for a numeric
+        attribute and, if the attribute is visible, records it so that
+        :meth:`Cobweb3Node.expected_correct_guesses` only needs to visit the
+        numeric attributes.
+
+        :param attr: an attribute that does not have a numeric value yet
+        :type attr: :ref:`Attribute<attributes>`
+        """
+        self.av_counts[attr][cv_key] = ContinuousValue()
+        if attr[0] != "_":
+            self.cv_attrs.append(attr)
 
     def expected_correct_guesses(self):
         """
@@ -250,54 +512,211 @@ class Cobweb3Node(CobwebNode):
         that there is additional measurement error, but the value is chosen so
         as to yield a sensical upper bound on the expected correct guesses.
 
+        The nominal portion of this sum is maintained incrementally by
+        :meth:`CobwebNode.update_sq_counts
+        <concept_formation.cobweb.CobwebNode.update_sq_counts>`. The numeric
+        portion depends on the tree's attribute scales, which change with every
+        instance, so it is recomputed over the node's numeric attributes.
+
         :return: The number of attribute values that would be correctly guessed
             in the current concept.
         :rtype: float
         """
+        correct_guesses = self.sq_counts_total / (self.count * self.count)
+
+        for attr in self.cv_attrs:
+            correct_guesses += self.cv_correct_guesses(
+                attr, self.av_counts[attr][cv_key], self.count)
+
+        return correct_guesses / self.visible_attrs
+
+    def expected_correct_guesses_for_insert(self, instance, weight=1):
+        """
+        Returns the number of correct guesses that would be expected from the
+        given concept if the instance were added to it, without modifying the
+        node or building a temporary copy of it.
+
+        This extends :meth:`CobwebNode.expected_correct_guesses_for_insert
+        <concept_formation.cobweb.CobwebNode.expected_correct_guesses_for_insert>`
+        to handle numeric values. Only the continuous values of numeric
+        attributes in the instance are copied and updated; the remaining
+        numeric attributes are rescored with the incremented count.
+
+        :param instance: The instance currently being categorized
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
+        :return: the number of correct guesses that would be expected after
+            the instance is added to the concept.
+        :rtype: float
+        """
+        count = self.count + weight
+        sq_counts_total = self.sq_counts_total
+        visible_attrs = self.visible_attrs
         correct_guesses = 0.0
-        attr_count = 0
 
-        for attr in self.attrs():
-            attr_count += 1
+        for attr in instance:
+            if attr[0] == "_":
+                continue
+            if attr not in self.av_counts:
+                visible_attrs += 1
 
-            for val in self.av_counts[attr]:
-                if val == cv_key:
-                    scale = 1.0
-                    if self.tree is not None and self.tree.scaling:
-                        inner_attr = self.tree.get_inner_attr(attr)
-                        if inner_attr in self.tree.attr_scales:
-                            inner = self.tree.attr_scales[inner_attr]
-                            scale = ((1/self.tree.scaling) *
-                                     inner.unbiased_std())
-
-                    # we basically add noise to the std and adjust the
-                    # normalizing constant to ensure the probability of a
-                    # particular value never exceeds 1.
-                    cv = self.av_counts[attr][cv_key]
-                    std = sqrt(cv.scaled_unbiased_std(scale) *
-                               cv.scaled_unbiased_std(scale) +
-                               (1 / (4 * pi)))
-                    prob_attr = cv.num / self.count
-                    correct_guesses += ((prob_attr * prob_attr) *
-                                        (1/(2 * sqrt(pi) * std)))
+            if isNumber(instance[attr]):
+                if attr in self.av_counts and cv_key in self.av_counts[attr]:
+                    cv = self.av_counts[attr][cv_key].copy()
                 else:
-                    prob = (self.av_counts[attr][val]) / self.count
-                    correct_guesses += (prob * prob)
+                    cv = ContinuousValue()
+                cv.update(instance[attr], weight)
+                correct_guesses += self.cv_correct_guesses(attr, cv, count)
+            else:
+                prior_count = 0
+                if attr in self.av_counts:
+                    prior_count = self.av_counts[attr].get(instance[attr], 0)
+                sq_counts_total += 2 * prior_count * weight + weight * weight
+
+        for attr in self.cv_attrs:
+            if attr in instance and isNumber(instance[attr]):
+                continue
+            correct_guesses += self.cv_correct_guesses(
+                attr, self.av_counts[attr][cv_key], count)
+
+        correct_guesses += sq_counts_total / (count * count)
+        return correct_guesses / visible_attrs
+
+    def expected_correct_guesses_for_merge(self, node):
+        """
+        Returns the number of correct guesses that would be expected from the
+        given concept if the counts of another node were added to it, without
+        modifying the node or building a temporary copy of it.
+
+        This extends :meth:`CobwebNode.expected_correct_guesses_for_merge
+        <concept_formation.cobweb.CobwebNode.expected_correct_guesses_for_merge>`
+        to handle numeric values. The continuous values of the numeric
+        attributes that both nodes have seen are copied and combined.
+
+        :param node: another node of the same tree
+        :type node: Cobweb3Node
+        :return: the number of correct guesses that would be expected after
+            the node's counts are added to the concept.
+        :rtype: float
+        """
+        count = self.count + node.count
+        sq_counts_total = self.sq_counts_total + node.sq_counts_total
+        visible_attrs = self.visible_attrs
+        correct_guesses = 0.0
+
+        for attr in node.av_counts:
+            if attr[0] == "_":
+                continue
+            if attr not in self.av_counts:
+                visible_attrs += 1
+                values = {}
+            else:
+                values = self.av_counts[attr]
+            other_values = node.av_counts[attr]
+            for val in other_values:
+                if val == cv_key:
+                    cv = other_values[cv_key]
+                    if cv_key in values:
+                        cv = values[cv_key].copy()
+                        cv.combine(other_values[cv_key])
+                    correct_guesses += self.cv_correct_guesses(attr, cv,
+                                                               count)
+                elif val in values:
+                    sq_counts_total += 2 * values[val] * other_values[val]
+
+        for attr in self.cv_attrs:
+            if attr in node.av_counts and cv_key in node.av_counts[attr]:
+                continue
+            correct_guesses += self.cv_correct_guesses(
+                attr, self.av_counts[attr][cv_key], count)
+
+        correct_guesses += sq_counts_total / (count * count)
+        return correct_guesses / visible_attrs
+
+    def _squared_counts(self):
+        """
+        Returns the sum of the squared counts of the concept's visible
+        attribute values, counting the values of each numeric attribute as a
+        single value (see: :meth:`Cobweb3Node._value_count`).
+        """
+        squared_counts = self.sq_counts_total
+        for attr in self.cv_attrs:
+            if attr[0] != "_":
+                num = self.av_counts[attr][cv_key].num
+                squared_counts += num * num
+        return squared_counts
+
+    def _value_count(self, attr, val):
+        """
+        Returns the count of an attribute value for
+        :meth:`CobwebNode.cu_for_merge_bound
+        <concept_formation.cobweb.CobwebNode.cu_for_merge_bound>`, where all of
+        the values of a numeric attribute count as one value. A numeric
+        attribute never expects more than :math:`P(A_i)^2` correct guesses,
+        so this keeps the bound an upper bound.
+        """
+        if attr not in self.av_counts:
+            return 0
+        if isNumber(val):
+            if cv_key not in self.av_counts[attr]:
+                return 0
+            return self.av_counts[attr][cv_key].num
+        return self.av_counts[attr].get(val, 0)
 
-        return correct_guesses / attr_count
+    def attr_scale(self, attr):
+        """
+        Returns the amount that the std of a numeric attribute is scaled by
+        when making category utility calculations (see:
+        :class:`Cobweb3Tree`). If scaling is disabled or the attribute has no
+        scale yet, then 1.0 is returned.
+
+        :param attr: a numeric attribute
+        :type attr: :ref:`Attribute<attributes>`
+        :return: the scale for the attribute
+        :rtype: float
+        """
+        scale = 1.0
+        if self.tree is not None and self.tree.scaling:
+            inner_attr = self.tree.get_inner_attr(attr)
+            if inner_attr in self.tree.attr_scales:
+                inner = self.tree.attr_scales[inner_attr]
+                scale = ((1/self.tree.scaling) *
+                         inner.unbiased_std())
+        return scale
 
-    def pretty_print(self, depth=0):
+    def cv_correct_guesses(self, attr, cv, count):
         """
-        Print the categorization tree
+        Returns the expected correct guesses contributed by a numeric
+        attribute, before it is averaged over the node's attributes.
 
-        The string formatting inserts tab characters to align child nodes of
-        the same depth. Numerical values are printed with their means and
-        standard deviations.
+        :param attr: a numeric attribute
+        :type attr: :ref:`Attribute<attributes>`
+        :param cv: the attribute's continuous value
+        :type cv: ContinuousValue
+        :param count: the number of instances in the concept
+        :type count: float
+        :return: :math:`P(A_i)^2 * \\frac{1}{2 * \\sqrt{\\pi} * \\sigma}`
+        :rtype: float
+        """
+        # we basically add noise to the std and adjust the
+        # normalizing constant to ensure the probability of a
+        # particular value never exceeds 1.
+        std = cv.scaled_unbiased_std(self.attr_scale(attr))
+        std = sqrt(std * std + (1 / (4 * pi)))
+        prob_attr = cv.num / count
+        return ((prob_attr * prob_attr) *
+                (1/(2 * sqrt(pi) * std)))
+
+    def _pretty_print_node(self, depth):
+        """
+        Formats a single line of :meth:`CobwebNode.pretty_print
+        <concept_formation.cobweb.CobwebNode.pretty_print>` for this node.
+        Numerical values are printed with their means and standard deviations.
 
-        :param depth: The current depth in the print, intended to be called
-            recursively
+        :param depth: The depth of the node in the print
         :type depth: int
-        :return: a formated string displaying the tree and its children
+        :return: the node's line
         :rtype: str
         """
         ret = str(('\t' * depth) + "|-")
@@ -315,9 +734,6 @@ class Cobweb3Node(CobwebNode):
 
         ret += "{" + ", ".join(attributes) + "}: " + str(self.count) + '\n'
 
-        for c in self.children:
-            ret += c.pretty_print(depth+1)
-
         return ret
 
     def get_weighted_values(self, attr, allow_none=True):
@@ -519,6 +935,28 @@ class Cobweb3Node(CobwebNode):
                             raise Exception("p must be greater than 0")
         return ll
 
+    def _exact_instance(self):
+        """
+        Returns the instance that the concept is an exact match of (see:
+        :meth:`Cobweb3Node.is_exact_match`), or None if its instances are not
+        all the same. Numeric attributes get the value of their mean.
+        """
+        instance = {}
+        for attr in self.attrs():
+            if len(self.av_counts[attr]) != 1:
+                return None
+            for val in self.av_counts[attr]:
+                if val == cv_key:
+                    cv = self.av_counts[attr][cv_key]
+                    if cv.num != self.count or cv.unbiased_std() != 0.0:
+                        return None
+                    instance[attr] = cv.unbiased_mean()
+                elif self.av_counts[attr][val] != self.count:
+                    return None
+                else:
+                    instance[attr] = val
+        return instance
+
     def is_exact_match(self, instance):
         """
         Returns true if the concept exactly matches the instance.
@@ -558,16 +996,16 @@ class Cobweb3Node(CobwebNode):
                     return False
         return True
 
-    def output_json(self):
+    def _output_json_node(self):
         """
-        Outputs the categorization tree in JSON form.
+        Outputs this node for :meth:`CobwebNode.output_json
+        <concept_formation.cobweb.CobwebNode.output_json>`.
 
-        This is a modification of the :meth:`CobwebNode.output_json
-        <concept_formation.cobweb.CobwebNode.output_json>` to handle numeric
-        values.
+        This is a modification of :meth:`CobwebNode._output_json_node
+        <concept_formation.cobweb.CobwebNode._output_json_node>` to handle
+        numeric values.
 
-        :return: an object that contains all of the structural information of
-            the node and its children
+        :return: an object that contains the node's structural information
         :rtype: obj
         """
         output = {}
@@ -589,9 +1027,6 @@ class Cobweb3Node(CobwebNode):
                 else:
                     temp[str(attr)][str(val)] = self.av_counts[attr][val]
 
-        for child in self.children:
-            output["children"].append(child.output_json())
-
         output["counts"] = temp
 
         return output
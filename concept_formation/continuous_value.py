@@ -9,7 +9,7 @@ from math import pi
 from concept_formation.utils import c4
 
 
-class ContinuousValue():
+class ContinuousValue(object):
     """
     This class is used to store the number of samples, the mean of the samples,
     and the squared error of the samples for :ref:`Numeric Values<val-num>`.
@@ -19,6 +19,7 @@ class ContinuousValue():
     Initially the number of values, the mean of the values, and the
     squared errors of the values are set to 0.
     """
+    __slots__ = ('num', 'mean', 'meanSq')
 
     def __init__(self):
         """constructor"""
@@ -158,7 +159,7 @@ class ContinuousValue():
         for x in data:
             self.update(x)
 
-    def update(self, x):
+    def update(self, x, weight=1):
         """
         Incrementally update the mean and squared mean error (meanSq) values in
         an efficient and practical (no precision problems) way.
@@ -166,13 +167,47 @@ class ContinuousValue():
         This uses and algorithm by Knuth found here:
         `<https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance>`_
 
+        A weight adds that many copies of the value at once (using the weighted
+        form of the same algorithm by West). Because of rounding, the squared
+        mean error is clamped so that it never becomes negative.
+
         :param x: A new value to incorporate into the distribution
         :type x: Number
+        :param weight: the number of copies of the value to add
+        :type weight: a positive number
         """
-        self.num += 1
+        self.num += weight
         delta = x - self.mean
-        self.mean += delta / self.num
-        self.meanSq += delta * (x - self.mean)
+        self.mean += delta * weight / self.num
+        self.meanSq = max(0.0, self.meanSq + weight * delta * (x - self.mean))
+
+    def remove(self, x, weight=1):
+        """
+        Removes a value that was previously added with
+        :meth:`ContinuousValue.update`, by running the update in reverse.
+
+        If every value is removed (to within a rounding error, as fractional
+        weights can leave), the continuous value is reset to its initial
+        (empty) state. Because of rounding, the squared mean error is clamped
+        so that it never becomes negative.
+
+        :param x: A value to remove from the distribution
+        :type x: Number
+        :param weight: the number of copies of the value to remove
+        :type weight: a positive number
+        """
+        num = self.num - weight
+        if num <= self.num * 1e-9:
+            self.num = 0.0
+            self.mean = 0.0
+            self.meanSq = 0.0
+            return
+
+        mean = (self.num * self.mean - weight * x) / num
+        self.meanSq = max(0.0, self.meanSq -
+                          weight * (x - mean) * (x - self.mean))
+        self.mean = mean
+        self.num = num
 
     def combine(self, other):
         """
@@ -195,6 +230,48 @@ class ContinuousValue():
                      (self.num + other.num))
         self.num += other.num
 
+    def subtract(self, other):
+        """
+        Removes another ContinuousValue's distribution from this one, undoing
+        :meth:`ContinuousValue.combine`. The other distribution must have been
+        combined into (or otherwise be part of) this one.
+
+        If every value is removed (to within a rounding error, as fractional
+        weights can leave), the continuous value is reset to its initial
+        (empty) state. Because of rounding, the squared mean error is clamped
+        so that it never becomes negative.
+
+        :param other: Another ContinuousValue distribution to be removed from
+            this one.
+        :type other: ContinuousValue
+        """
+        if not isinstance(other, ContinuousValue):
+            raise ValueError("Can only subtract 2 continuous values.")
+        num = self.num - other.num
+        if num <= self.num * 1e-9:
+            self.num = 0.0
+            self.mean = 0.0
+            self.meanSq = 0.0
+            return
+
+        mean = (self.num * self.mean - other.num * other.mean) / num
+        delta = other.mean - mean
+        self.meanSq = max(0.0, self.meanSq - other.meanSq - delta * delta *
+                          ((num * other.num) / self.num))
+        self.mean = mean
+        self.num = num
+
+    def decay(self, factor):
+        """
+        Multiplies the number of values seen (and so the squared mean error)
+        by a factor, leaving the mean and variance unchanged.
+
+        :param factor: the decay factor
+        :type factor: float
+        """
+        self.num *= factor
+        self.meanSq *= factor
+
     def integral_of_gaussian_product(self, other):
         """
         Computes the integral (from -inf to inf) of the product of two
@@ -8,7 +8,6 @@ from __future__ import print_function
 from __future__ import unicode_literals
 from __future__ import absolute_import
 from __future__ import division
-from concept_formation.cobweb3 import Cobweb3Node
 from concept_formation.trestle import TrestleTree
 from concept_formation.structure_mapper import StructureMapper
 from concept_formation.preprocessor import SubComponentProcessor
@@ -27,9 +26,7 @@ class DummyTree(TrestleTree):
     """
 
     def __init__(self):
-        self.root = Cobweb3Node()
-        self.root.tree = self
-        self.gensym_counter = 0
+        super(DummyTree, self).__init__()
         self.structure_map_internally = False
 
     def gensym(self):
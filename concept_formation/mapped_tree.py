@@ -0,0 +1,369 @@
+"""
+The mapped tree module contains the :class:`MappedTree` class, which opens a
+tree saved with :meth:`CobwebTree.save
+<concept_formation.cobweb.CobwebTree.save>` as a read-only memory map and
+uses it for categorization and prediction without loading it.
+
+Nodes are represented by small views (see: :class:`MappedNodeMixin`) that
+read their counts directly from the mapped file when they are used. Because
+the views are subclasses of the tree's node class, categorization, prediction,
+and probabilities are computed by the same code as for a loaded tree and give
+the same results. Many processes can open the same file and share a single
+physical copy of it, and opening a tree does not depend on its size.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from __future__ import division
+from collections import OrderedDict
+import mmap
+import sys
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.cobweb import CobwebNode
+from concept_formation.cobweb3 import Cobweb3Tree
+from concept_formation.cobweb3 import Cobweb3Node
+from concept_formation.continuous_value import ContinuousValue
+from concept_formation.serialization import read_header
+
+
+class MappedTree(object):
+    """
+    A read-only view of a tree saved with :meth:`CobwebTree.save
+    <concept_formation.cobweb.CobwebTree.save>`.
+
+    The tree supports :meth:`MappedTree.categorize`,
+    :meth:`MappedTree.categorize_batch`, and :meth:`MappedTree.infer_missing`,
+    which behave like the :class:`CobwebTree
+    <concept_formation.cobweb.CobwebTree>` methods of the same name, and the
+    returned concepts support :meth:`predict
+    <concept_formation.cobweb.CobwebNode.predict>` and :meth:`probability
+    <concept_formation.cobweb.CobwebNode.probability>`. Trestle instances are
+    not structure mapped, so they must be given in their mapped and flattened
+    form.
+
+    The views of the most recently used nodes are kept, so that nodes near
+    the root do not have to be read again for every instance. The tree should
+    be closed (or used as a context manager) when it is no longer needed.
+
+    :param path: a file written by :meth:`CobwebTree.save
+        <concept_formation.cobweb.CobwebTree.save>`
+    :type path: str
+    :param cache_size: the number of node views to keep
+    :type cache_size: int
+    """
+    lock = None
+    min_vectorized_children = None
+
+    categorize = CobwebTree.categorize
+    categorize_batch = CobwebTree.categorize_batch
+    infer_missing = CobwebTree.infer_missing
+    _sanity_check_instance = CobwebTree._sanity_check_instance
+    _cobweb_categorize = CobwebTree._cobweb_categorize
+    _cobweb_categorize_batch = CobwebTree._cobweb_categorize_batch
+    get_inner_attr = Cobweb3Tree.get_inner_attr
+
+    def __init__(self, path, cache_size=1024):
+        if sys.byteorder != 'little':
+            raise ValueError("Memory mapped trees are only supported on "
+                             "little-endian machines.")
+
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self.mmap)
+        meta, arrays = read_header(buf)
+
+        self.views = [buf]
+        for name in arrays:
+            offset, typecode, length = arrays[name]
+            size = (4 if typecode == 'i' else 8) * length
+            view = buf[offset:offset + size].cast(typecode)
+            self.views.append(view)
+            setattr(self, name, view)
+
+        state = meta['state']
+        for attr in ('scaling', 'inner_attr_scaling', 'attr_scales'):
+            if attr in state:
+                setattr(self, attr, state[attr])
+
+        self.tree_class = meta['tree_class']
+        self.keys = meta['vocabulary']
+        self.vocabulary = {key: key for key in
+                           self.keys[:meta['num_interned']]}
+
+        if issubclass(meta['node_class'], Cobweb3Node):
+            self.node_class = MappedCobweb3Node
+        elif issubclass(meta['node_class'], CobwebNode):
+            self.node_class = MappedCobwebNode
+        else:
+            raise ValueError("Unsupported node class: %s" %
+                             meta['node_class'].__name__)
+
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.root = self.node_class(self, 0, None)
+
+    def node(self, index, parent):
+        """
+        Returns the view of a node, reusing a recently used view if possible.
+
+        :param index: the node's position in the saved tree
+        :type index: int
+        :param parent: the view of the node's parent
+        :type parent: MappedNodeMixin
+        :return: the node's view
+        :rtype: MappedNodeMixin
+        """
+        cache = self.cache
+        if index in cache:
+            cache.move_to_end(index)
+            return cache[index]
+
+        node = self.node_class(self, index, parent)
+        if self.cache_size > 0:
+            cache[index] = node
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return node
+
+    def close(self):
+        """
+        Releases the memory map. Nodes of the tree cannot be used afterwards.
+        """
+        for view in reversed(self.views):
+            view.release()
+        self.views = []
+        self.cache.clear()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __str__(self):
+        return str(self.root)
+
+    def intern_instance(self, instance, extend=False):
+        """
+        Returns a copy of the instance that uses the saved tree's keys where
+        possible (see: :meth:`CobwebTree.intern_instance
+        <concept_formation.cobweb.CobwebTree.intern_instance>`). Unlike a
+        normal tree, the vocabulary is never extended.
+
+        :param instance: an instance to intern
+        :type instance: :ref:`Instance<instance-rep>`
+        :param extend: ignored, since a mapped tree is read-only
+        :type extend: bool
+        :return: an equal instance that uses the tree's canonical keys
+        :rtype: :ref:`Instance<instance-rep>`
+        """
+        vocabulary = self.vocabulary
+        return {vocabulary.get(attr, attr):
+                vocabulary.get(instance[attr], instance[attr])
+                for attr in instance}
+
+
+class MappedTable(Mapping):
+    """
+    A read-only attribute-value table that reads a node's counts from a
+    :class:`MappedTree`. The values of an attribute are read the first time it
+    is accessed; nominal counts are numbers and numeric values are
+    :class:`ContinuousValue
+    <concept_formation.continuous_value.ContinuousValue>` objects.
+
+    :param tree: the tree the node belongs to
+    :type tree: MappedTree
+    :param ranges: the range of entries for each of the node's attributes,
+        and the index of the first continuous value in the range
+    :type ranges: {:ref:`Attribute<attributes>`: (int, int, int)}
+    """
+
+    def __init__(self, tree, ranges):
+        self.tree = tree
+        self.ranges = ranges
+        self.values = {}
+
+    def __getitem__(self, attr):
+        if attr in self.values:
+            return self.values[attr]
+
+        start, end, cv = self.ranges[attr]
+        tree = self.tree
+        keys = tree.keys
+        values = {}
+        for e in range(start, end):
+            val = tree.entry_val[e]
+            count = tree.entry_count[e]
+            if val >= 0:
+                values[keys[val]] = int(count) if count.is_integer() else count
+            else:
+                value = ContinuousValue()
+                value.num = count
+                value.mean = tree.cv_mean[cv]
+                value.meanSq = tree.cv_meanSq[cv]
+                values[keys[-val - 1]] = value
+                cv += 1
+        self.values[attr] = values
+        return values
+
+    def __contains__(self, attr):
+        return attr in self.ranges
+
+    def __iter__(self):
+        return iter(self.ranges)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class MappedNodeMixin(object):
+    """
+    Makes a node class read its fields from a :class:`MappedTree`. The fields
+    that are derived from the node's counts (e.g., its sum of squared counts)
+    are computed the first time they are needed.
+
+    :param tree: the tree the node belongs to
+    :type tree: MappedTree
+    :param index: the node's position in the saved tree
+    :type index: int
+    :param parent: the node's parent view
+    :type parent: MappedNodeMixin
+    """
+    __slots__ = ()
+
+    def __init__(self, tree, index, parent):
+        self._tree = tree
+        self._index = index
+        self._parent = parent
+        self._av_counts = None
+        self._sq_counts_total = None
+        self._visible_attrs = None
+        self._cv_attrs = None
+
+    @property
+    def tree(self):
+        return self._tree
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def concept_id(self):
+        return self._tree.concept_id[self._index]
+
+    @property
+    def count(self):
+        return self._tree.count[self._index]
+
+    @property
+    def children(self):
+        tree = self._tree
+        start = tree.child_start[self._index]
+        return [tree.node(i, self) for i in
+                range(start, start + tree.num_children[self._index])]
+
+    @property
+    def children_table(self):
+        return None
+
+    @property
+    def av_counts(self):
+        if self._av_counts is None:
+            self._read_table()
+        return self._av_counts
+
+    @property
+    def sq_counts_total(self):
+        if self._av_counts is None:
+            self._read_table()
+        return self._sq_counts_total
+
+    @property
+    def visible_attrs(self):
+        if self._av_counts is None:
+            self._read_table()
+        return self._visible_attrs
+
+    @property
+    def cv_attrs(self):
+        if self._av_counts is None:
+            self._read_table()
+        return self._cv_attrs
+
+    def _read_table(self):
+        """
+        Scans the node's entries once to find the range of each attribute and
+        to compute the fields derived from the counts.
+        """
+        tree = self._tree
+        keys = tree.keys
+        ranges = {}
+        sq_counts_total = 0.0
+        visible_attrs = 0
+        cv_attrs = []
+
+        cv = tree.cv_start[self._index]
+        e = tree.entry_start[self._index]
+        end = tree.entry_start[self._index + 1]
+        while e < end:
+            attr_id = tree.entry_attr[e]
+            attr = keys[attr_id]
+            attr_start = e
+            attr_cv = cv
+            visible = attr[0] != "_"
+            while e < end and tree.entry_attr[e] == attr_id:
+                if tree.entry_val[e] < 0:
+                    cv += 1
+                    if visible:
+                        cv_attrs.append(attr)
+                elif visible:
+                    count = tree.entry_count[e]
+                    sq_counts_total += count * count
+                e += 1
+            ranges[attr] = (attr_start, e, attr_cv)
+            if visible:
+                visible_attrs += 1
+
+        self._av_counts = MappedTable(tree, ranges)
+        self._sq_counts_total = sq_counts_total
+        self._visible_attrs = visible_attrs
+        self._cv_attrs = cv_attrs
+
+    def __hash__(self):
+        return hash("CobwebNode" + str(self.concept_id))
+
+    def __eq__(self, other):
+        return (isinstance(other, MappedNodeMixin) and
+                other._tree is self._tree and other._index == self._index)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class MappedCobwebNode(MappedNodeMixin, CobwebNode):
+    """
+    A read-only view of a saved :class:`CobwebNode
+    <concept_formation.cobweb.CobwebNode>`.
+    """
+    __slots__ = ('_tree', '_index', '_parent', '_av_counts',
+                 '_sq_counts_total', '_visible_attrs', '_cv_attrs')
+
+
+class MappedCobweb3Node(MappedNodeMixin, Cobweb3Node):
+    """
+    A read-only view of a saved :class:`Cobweb3Node
+    <concept_formation.cobweb3.Cobweb3Node>`.
+    """
+    __slots__ = ('_tree', '_index', '_parent', '_av_counts',
+                 '_sq_counts_total', '_visible_attrs', '_cv_attrs')
@@ -0,0 +1,176 @@
+"""
+The operation policy module contains policies that decide at which nodes a
+:class:`CobwebTree <concept_formation.cobweb.CobwebTree>` evaluates the merge
+and split operations while it is fitting instances (see:
+:meth:`CobwebNode.get_best_operation
+<concept_formation.cobweb.CobwebNode.get_best_operation>`).
+
+Merges and splits reorganize the tree. They matter most early on, while the
+tree is still small, and rarely win once it has settled, but by default they
+are evaluated at every node that an instance passes through. A policy can
+skip them at some nodes to save time; the best and new operations are always
+evaluated. Skipping an operation can change the tree that is learned, so a
+policy trades some category utility for speed.
+
+A tree uses a policy by passing it as the ``operation_policy`` parameter of
+the tree's constructor, e.g., ``CobwebTree(operation_policy=
+PeriodicPolicy(5))``.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from __future__ import division
+
+ALL_OPERATIONS = ["best", "new", "merge", "split"]
+BASIC_OPERATIONS = ["best", "new"]
+
+
+class OperationPolicy(object):
+    """
+    The base operation policy, which evaluates every operation at every node
+    (the same as a tree without a policy).
+
+    A policy is asked which operations to evaluate at a node before they are
+    evaluated (see: :meth:`OperationPolicy.possible_ops`) and is told which
+    operation was chosen afterwards (see: :meth:`OperationPolicy.record`).
+    Policies that keep track of nodes key them by their ``concept_id``.
+    """
+
+    def possible_ops(self, node):
+        """
+        Returns the operations to evaluate at a node.
+
+        :param node: the node that an instance is being added to
+        :type node: CobwebNode
+        :return: a list of operations from ["best", "new", "merge", "split"]
+        :rtype: [str, ...]
+        """
+        return ALL_OPERATIONS
+
+    def record(self, node, possible_ops, operation):
+        """
+        Records the operation that was chosen at a node.
+
+        :param node: the node that an instance is being added to
+        :type node: CobwebNode
+        :param possible_ops: the operations that were evaluated, as returned
+            by :meth:`OperationPolicy.possible_ops`
+        :type possible_ops: [str, ...]
+        :param operation: the operation that was chosen
+        :type operation: str
+        """
+        pass
+
+    def reset(self):
+        """
+        Forgets everything that the policy has recorded (e.g., when its tree
+        is cleared).
+        """
+        pass
+
+
+class MinCountPolicy(OperationPolicy):
+    """
+    Only evaluates merges and splits at nodes that have seen at least a
+    minimum number of instances. Small concepts are reorganized by later
+    merges and splits further up the tree, if they are needed at all.
+
+    :param min_count: the count a node needs before merges and splits are
+        evaluated at it
+    :type min_count: float
+    """
+
+    def __init__(self, min_count=20):
+        if min_count < 0:
+            raise ValueError("min_count must be non-negative.")
+        self.min_count = min_count
+
+    def possible_ops(self, node):
+        if node.count >= self.min_count:
+            return ALL_OPERATIONS
+        return BASIC_OPERATIONS
+
+
+class PeriodicPolicy(OperationPolicy):
+    """
+    Only evaluates merges and splits on every k-th instance that passes
+    through a node, starting with the first.
+
+    :param period: the number of visits to a node between evaluations of
+        merges and splits
+    :type period: int
+    """
+
+    def __init__(self, period=5):
+        if period < 1:
+            raise ValueError("period must be at least 1.")
+        self.period = period
+        self.visits = {}
+
+    def possible_ops(self, node):
+        visits = self.visits.get(node.concept_id, 0)
+        self.visits[node.concept_id] = visits + 1
+        if visits % self.period == 0:
+            return ALL_OPERATIONS
+        return BASIC_OPERATIONS
+
+    def reset(self):
+        self.visits = {}
+
+
+class WinRatePolicy(OperationPolicy):
+    """
+    Keeps an exponentially decayed rate of how often merges and splits win at
+    each node, and stops evaluating an operation at a node once its rate drops
+    below a threshold. A skipped operation is evaluated again after it has
+    been skipped ``retry`` times, so that it can recover if the data changes.
+
+    Every operation starts with a rate of 1. Each time that it is evaluated,
+    its rate is updated to :math:`decay \\cdot rate + (1 - decay) \\cdot won`,
+    where won is 1 if it was chosen and 0 otherwise.
+
+    :param decay: how much of an operation's previous rate is kept after each
+        evaluation
+    :type decay: a float between 0.0 and 1.0 (exclusive)
+    :param min_rate: the rate below which an operation is skipped
+    :type min_rate: float
+    :param retry: how many times an operation is skipped before it is
+        evaluated again
+    :type retry: int
+    """
+
+    def __init__(self, decay=0.8, min_rate=0.05, retry=20):
+        if not 0 <= decay < 1:
+            raise ValueError("decay must be in the range [0, 1).")
+        if retry < 1:
+            raise ValueError("retry must be at least 1.")
+        self.decay = decay
+        self.min_rate = min_rate
+        self.retry = retry
+        self.rates = {}
+        self.skipped = {}
+
+    def possible_ops(self, node):
+        ops = list(BASIC_OPERATIONS)
+        for op in ("merge", "split"):
+            key = (node.concept_id, op)
+            if self.rates.get(key, 1) >= self.min_rate:
+                ops.append(op)
+            elif self.skipped.get(key, 0) + 1 >= self.retry:
+                self.skipped[key] = 0
+                ops.append(op)
+            else:
+                self.skipped[key] = self.skipped.get(key, 0) + 1
+        return ops
+
+    def record(self, node, possible_ops, operation):
+        for op in ("merge", "split"):
+            if op in possible_ops:
+                key = (node.concept_id, op)
+                self.rates[key] = (self.decay * self.rates.get(key, 1) +
+                                   (1 - self.decay) * (op == operation))
+
+    def reset(self):
+        self.rates = {}
+        self.skipped = {}
@@ -0,0 +1,297 @@
+"""
+The serialization module saves and loads concept trees in a compact binary
+format (see: :meth:`CobwebTree.save
+<concept_formation.cobweb.CobwebTree.save>` and :meth:`CobwebTree.load
+<concept_formation.cobweb.CobwebTree.load>`).
+
+A file starts with a small header and a pickled description of the tree: its
+class, its node class, its parameters (e.g., ``attr_scales`` or
+``gensym_counter``), and a list of the attributes and values in the tree,
+starting with the tree's vocabulary (see: :meth:`CobwebTree.intern_instance
+<concept_formation.cobweb.CobwebTree.intern_instance>`). The rest of
+the file is a set of flat little-endian arrays that hold the nodes and their
+counts, so loading a tree does not recurse and does not unpickle every node:
+
+* one entry per node, in breadth-first order so that the children of each node
+  are stored next to each other: ``concept_id``, ``count``, ``child_start``,
+  ``num_children``, and ``entry_start`` and ``cv_start`` (where the node's
+  counts and continuous values start; these have one extra element marking
+  the end of the last node's).
+* one entry per attribute value count, in the order of each node's table (so
+  that a loaded tree iterates over its counts in the same order):
+  ``entry_attr`` and ``entry_val`` (indices into the vocabulary) and
+  ``entry_count``. For a :class:`ContinuousValue
+  <concept_formation.continuous_value.ContinuousValue>` the value index is
+  stored as ``-index - 1`` and the count is the number of values it has seen.
+* one entry per continuous value, in the same order as the counts:
+  ``cv_mean`` and ``cv_meanSq``.
+
+Every array starts on an 8 byte boundary, so the file can also be read in place
+from a memory map.
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from __future__ import division
+from array import array
+from collections import deque
+import pickle
+import struct
+import sys
+
+from concept_formation.children import Children
+from concept_formation.continuous_value import ContinuousValue
+
+MAGIC = b'CFTREE01'
+_HEADER = struct.Struct('<8sQQQQ')
+
+
+def array_layout(num_nodes, num_entries, num_cvs):
+    """
+    Returns the name, typecode, and length of each array in a saved tree, in
+    the order they are stored.
+
+    :param num_nodes: the number of nodes in the tree
+    :type num_nodes: int
+    :param num_entries: the number of attribute value counts in the tree
+    :type num_entries: int
+    :param num_cvs: the number of continuous values in the tree
+    :type num_cvs: int
+    :return: the layout of the arrays
+    :rtype: [(str, str, int), ...]
+    """
+    return [('concept_id', 'q', num_nodes),
+            ('count', 'd', num_nodes),
+            ('child_start', 'q', num_nodes),
+            ('num_children', 'q', num_nodes),
+            ('entry_start', 'q', num_nodes + 1),
+            ('cv_start', 'q', num_nodes + 1),
+            ('entry_attr', 'i', num_entries),
+            ('entry_val', 'i', num_entries),
+            ('entry_count', 'd', num_entries),
+            ('cv_mean', 'd', num_cvs),
+            ('cv_meanSq', 'd', num_cvs)]
+
+
+def _padding(size):
+    return -size % 8
+
+
+def _itemsize(typecode):
+    return 4 if typecode == 'i' else 8
+
+
+def read_header(buf):
+    """
+    Reads the header and pickled description of a saved tree from the start
+    of a buffer.
+
+    :param buf: the contents of a saved tree (e.g., bytes or a memory map)
+    :type buf: bytes-like
+    :return: the tree description (a dict) and the offset, typecode, and
+        length of each array, keyed by name
+    :rtype: (dict, {str: (int, str, int)})
+    """
+    magic, meta_len, num_nodes, num_entries, num_cvs = \
+        _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a saved concept tree.")
+
+    offset = _HEADER.size
+    meta = pickle.loads(bytes(buf[offset:offset + meta_len]))
+    offset += meta_len + _padding(meta_len)
+
+    arrays = {}
+    for name, typecode, length in array_layout(num_nodes, num_entries,
+                                               num_cvs):
+        arrays[name] = (offset, typecode, length)
+        size = _itemsize(typecode) * length
+        offset += size + _padding(size)
+    return meta, arrays
+
+
+def save_tree(tree, path):
+    """
+    Saves a tree to a file.
+
+    If the tree decays its counts, the counts are saved as of the tree's
+    current time (see: :meth:`CobwebTree.decay_children
+    <concept_formation.cobweb.CobwebTree.decay_children>`), so a loaded tree
+    does not need the nodes' timestamps.
+
+    :param tree: the tree to save
+    :type tree: CobwebTree
+    :param path: the file to write
+    :type path: str
+    """
+    vocabulary = {}
+    for key in tree.vocabulary:
+        vocabulary.setdefault(key, len(vocabulary))
+    num_interned = len(vocabulary)
+
+    data = {name: array(typecode) for name, typecode, _ in
+            array_layout(0, 0, 0)}
+    nodes = deque([tree.root])
+    num_nodes = 1
+    while nodes:
+        node = nodes.popleft()
+        factor = 1
+        if tree.decay is not None and node.timestamp != tree.time:
+            factor = tree.decay ** (tree.time - node.timestamp)
+        data['concept_id'].append(node.concept_id)
+        data['count'].append(node.count * factor)
+        data['child_start'].append(num_nodes)
+        data['num_children'].append(len(node.children))
+        data['entry_start'].append(len(data['entry_attr']))
+        data['cv_start'].append(len(data['cv_mean']))
+        num_nodes += len(node.children)
+        nodes.extend(node.children)
+
+        for attr in node.av_counts:
+            attr_id = vocabulary.setdefault(attr, len(vocabulary))
+            for val in node.av_counts[attr]:
+                count = node.av_counts[attr][val]
+                val_id = vocabulary.setdefault(val, len(vocabulary))
+                data['entry_attr'].append(attr_id)
+                if isinstance(count, ContinuousValue):
+                    data['entry_val'].append(-val_id - 1)
+                    data['entry_count'].append(count.num * factor)
+                    data['cv_mean'].append(count.mean)
+                    data['cv_meanSq'].append(count.meanSq * factor)
+                else:
+                    data['entry_val'].append(val_id)
+                    data['entry_count'].append(count * factor)
+    data['entry_start'].append(len(data['entry_attr']))
+    data['cv_start'].append(len(data['cv_mean']))
+
+    state = tree._tree_state()
+    del state['root']
+    del state['vocabulary']
+    if state.get('leaf_index') is not None:
+        state['leaf_index'] = {}
+    meta = pickle.dumps({'tree_class': type(tree),
+                         'node_class': type(tree.root),
+                         'state': state,
+                         'vocabulary': sorted(vocabulary,
+                                              key=vocabulary.get),
+                         'num_interned': num_interned},
+                        pickle.HIGHEST_PROTOCOL)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(meta), len(data['concept_id']),
+                             len(data['entry_attr']), len(data['cv_mean'])))
+        f.write(meta)
+        f.write(b'\0' * _padding(len(meta)))
+        for name, _, _ in array_layout(0, 0, 0):
+            if sys.byteorder != 'little':
+                data[name].byteswap()
+            f.write(data[name].tobytes())
+            f.write(b'\0' * _padding(data[name].itemsize * len(data[name])))
+
+
+def load_arrays(buf, arrays):
+    """
+    Copies the arrays of a saved tree out of a buffer.
+
+    :param buf: the contents of a saved tree
+    :type buf: bytes-like
+    :param arrays: the array layout returned by :func:`read_header`
+    :type arrays: {str: (int, str, int)}
+    :return: the arrays, keyed by name
+    :rtype: {str: array.array}
+    """
+    data = {}
+    for name in arrays:
+        offset, typecode, length = arrays[name]
+        data[name] = array(typecode)
+        data[name].frombytes(
+            bytes(buf[offset:offset + _itemsize(typecode) * length]))
+        if sys.byteorder != 'little':
+            data[name].byteswap()
+    return data
+
+
+def load_tree(path):
+    """
+    Loads a tree saved with :func:`save_tree`.
+
+    :param path: the file to read
+    :type path: str
+    :return: the loaded tree
+    :rtype: CobwebTree
+    """
+    with open(path, 'rb') as f:
+        buf = f.read()
+    meta, arrays = read_header(buf)
+    data = load_arrays(buf, arrays)
+    del buf
+
+    tree_class = meta['tree_class']
+    node_class = meta['node_class']
+    vocabulary = meta['vocabulary']
+    tree = tree_class.__new__(tree_class)
+    tree.__setstate__(meta['state'])
+    tree.vocabulary = {key: key for key in
+                       vocabulary[:meta['num_interned']]}
+
+    concept_id = data['concept_id'].tolist()
+    count = data['count'].tolist()
+    child_start = data['child_start'].tolist()
+    num_children = data['num_children'].tolist()
+    entry_start = data['entry_start'].tolist()
+    cv_mean = data['cv_mean'].tolist()
+    cv_meanSq = data['cv_meanSq'].tolist()
+
+    # Look up the vocabulary for all of the entries at once. Continuous
+    # values are marked with a None count.
+    attrs = [vocabulary[a] for a in data['entry_attr']]
+    vals = [vocabulary[v if v >= 0 else -v - 1] for v in data['entry_val']]
+    counts = [(int(c) if c.is_integer() else c) if v >= 0 else None
+              for v, c in zip(data['entry_val'], data['entry_count'])]
+    cv_nums = [c for v, c in zip(data['entry_val'], data['entry_count'])
+               if v < 0]
+
+    nodes = [node_class() for i in range(len(concept_id))]
+    cv = 0
+    for i, node in enumerate(nodes):
+        node.tree = tree
+        node.timestamp = tree.time
+        node.concept_id = concept_id[i]
+        node.count = count[i]
+
+        start = child_start[i]
+        node.children = Children(nodes[start:start + num_children[i]])
+        for child in node.children:
+            child.parent = node
+
+        # This adds the squared counts directly rather than calling
+        # update_sq_counts for every value.
+        av_counts = node.av_counts
+        sq_counts = node.sq_counts
+        sq_counts_total = 0.0
+        start, end = entry_start[i], entry_start[i + 1]
+        for attr, val, val_count in zip(attrs[start:end], vals[start:end],
+                                        counts[start:end]):
+            if attr not in av_counts:
+                node.add_attr(attr)
+
+            if val_count is not None:
+                av_counts[attr][val] = val_count
+                sq_counts[attr] += val_count * val_count
+                if attr[0] != "_":
+                    sq_counts_total += val_count * val_count
+            else:
+                node.add_cv(attr)
+                value = av_counts[attr][val]
+                value.num = cv_nums[cv]
+                value.mean = cv_mean[cv]
+                value.meanSq = cv_meanSq[cv]
+                cv += 1
+        node.sq_counts_total = sq_counts_total
+
+    tree.root = nodes[0]
+    tree.num_nodes = len(nodes)
+    if concept_id:
+        node_class._counter = max(node_class._counter, max(concept_id))
+    return tree
@@ -0,0 +1,51 @@
+"""
+Times the tree walks, copying, and pickling on a chain of concepts that is
+5000 levels deep, well past Python's default recursion limit. Operations that
+fail with a RecursionError (as all of them did when the walks were recursive)
+are reported instead of timed.
+"""
+from __future__ import print_function
+from __future__ import division
+import copy
+import pickle
+import sys
+from timeit import timeit
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.cobweb import CobwebNode
+
+
+def deep_tree(depth):
+    tree = CobwebTree()
+    leaf = tree.root
+    for i in range(depth):
+        data = {'a%i' % (i % 5): 'v%i' % (i % 3), 'b': 'v%i' % (i % 2)}
+        leaf.increment_counts(data)
+        leaf = leaf.create_new_child(data)
+    return tree, leaf
+
+
+if __name__ == "__main__":
+    depth = 5000
+    tree, leaf = deep_tree(depth)
+    print('depth %i, recursion limit %i' % (depth, sys.getrecursionlimit()))
+
+    operations = [
+        ('num_concepts', lambda: tree.root.num_concepts()),
+        ('depth', lambda: leaf.depth()),
+        ('pretty_print', lambda: tree.root.pretty_print()),
+        ('output_json', lambda: tree.root.output_json()),
+        ('copy constructor', lambda: CobwebNode(tree.root)),
+        ('deepcopy', lambda: copy.deepcopy(tree)),
+        ('pickle dumps', lambda: pickle.dumps(tree)),
+        ('pickle round trip', lambda: pickle.loads(pickle.dumps(tree))),
+    ]
+
+    number = 5
+    print('operation\tseconds')
+    for name, fn in operations:
+        try:
+            seconds = timeit(fn, number=number) / number
+            print('%s\t%0.4f' % (name, seconds))
+        except RecursionError:
+            print('%s\tRecursionError' % name)
@@ -0,0 +1,51 @@
+"""
+Builds trees from the bundled datasets with :meth:`CobwebTree.fit
+<concept_formation.cobweb.CobwebTree.fit>` and :meth:`CobwebTree.fit_bulk
+<concept_formation.cobweb.CobwebTree.fit_bulk>` and reports the time to build
+each tree, its size, the category utility of its root, and how often it
+predicts the label of held out instances correctly.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import seed
+from random import shuffle
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.cobweb3 import Cobweb3Tree
+from concept_formation.datasets import load_congressional_voting
+from concept_formation.datasets import load_iris
+from concept_formation.datasets import load_mushroom
+
+
+def accuracy(tree, instances, attr):
+    correct = 0
+    for instance in instances:
+        observed = {a: instance[a] for a in instance if a != attr}
+        concept = tree.categorize(observed)
+        correct += concept.predict(attr) == instance[attr]
+    return correct / len(instances)
+
+
+if __name__ == "__main__":
+    datasets = [('voting', CobwebTree, load_congressional_voting,
+                 'Class Name'),
+                ('iris', Cobweb3Tree, load_iris, 'class'),
+                ('mushroom', CobwebTree, load_mushroom, 'classification')]
+
+    print('dataset\tbuilder\tseconds\tconcepts\troot cu\taccuracy')
+    for name, tree_class, load, attr in datasets:
+        seed(0)
+        instances = load()
+        shuffle(instances)
+        split = len(instances) * 3 // 4
+        train, test = instances[:split], instances[split:]
+        for builder in ['fit', 'fit_bulk']:
+            seed(0)
+            tree = tree_class()
+            start = default_timer()
+            getattr(tree, builder)(train)
+            seconds = default_timer() - start
+            print('%s\t%s\t%0.3f\t%i\t%0.4f\t%0.3f' % (
+                name, builder, seconds, tree.root.num_concepts(),
+                tree.root.category_utility(), accuracy(tree, test, attr)))
@@ -0,0 +1,53 @@
+"""
+Fits a stream of instances that each have a unique id, which gives the nodes
+of a tree hundreds of children, into trees with different limits on the
+children of each node (see: :class:`CobwebTree
+<concept_formation.cobweb.CobwebTree>`). Reports the shape of each tree, the
+time to fit it, the slowest insert (including any grouping of children that
+it caused), and the time to categorize the instances again.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import choice
+from random import seed
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+
+
+def id_stream(num_instances=3000, num_attrs=2):
+    instances = []
+    for i in range(num_instances):
+        instance = {'a%i' % j: choice(['v1', 'v2']) for j in range(num_attrs)}
+        instance['id'] = 'i%i' % i
+        instances.append(instance)
+    return instances
+
+
+if __name__ == "__main__":
+    seed(0)
+    instances = id_stream()
+
+    print('max_children\tnodes\tmax depth\tmean depth\tmax children\t'
+          'fit seconds\tslowest insert ms\tcategorize seconds')
+    for max_children in [None, 100, 30, 10]:
+        seed(0)
+        tree = CobwebTree(max_children=max_children)
+        slowest = 0
+        start = default_timer()
+        for instance in instances:
+            insert_start = default_timer()
+            tree.ifit(instance)
+            slowest = max(slowest, default_timer() - insert_start)
+        seconds = default_timer() - start
+
+        start = default_timer()
+        for instance in instances:
+            tree.categorize(instance)
+        categorize_seconds = default_timer() - start
+
+        stats = tree.structure_stats()
+        print('%s\t%i\t%i\t%0.2f\t%i\t%0.3f\t%0.2f\t%0.3f' % (
+            max_children, stats['nodes'], stats['max_depth'],
+            stats['mean_depth'], stats['max_children'], seconds,
+            slowest * 1000, categorize_seconds))
@@ -0,0 +1,78 @@
+"""
+Fits a dataset with one tree, and again by fitting shards of it in separate
+processes and combining the shard trees (see: :func:`combine_trees
+<concept_formation.cobweb.combine_trees>`). Reports the time to fit each
+shard, the time to combine them, the category utility of the root, and how
+often each tree predicts the label of held out instances correctly.
+
+The congressional voting data is resampled with noise to make it large
+enough for sharding to matter.
+"""
+from __future__ import print_function
+from __future__ import division
+from multiprocessing import Pool
+from random import choice
+from random import random
+from random import seed
+from random import shuffle
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.cobweb import combine_trees
+from concept_formation.datasets import load_congressional_voting
+from concept_formation.datasets import load_mushroom
+
+
+def noisy_voting(num_instances=4000, noise=0.1):
+    instances = load_congressional_voting()
+    resampled = []
+    for i in range(num_instances):
+        instance = dict(choice(instances))
+        for attr in instance:
+            if attr != 'Class Name' and random() < noise:
+                instance[attr] = choice(['y', 'n', '?'])
+        resampled.append(instance)
+    return resampled
+
+
+def fit_shard(instances):
+    seed(0)
+    tree = CobwebTree()
+    start = default_timer()
+    tree.fit(instances)
+    return tree, default_timer() - start
+
+
+def accuracy(tree, instances, attr):
+    correct = 0
+    for instance in instances:
+        observed = {a: instance[a] for a in instance if a != attr}
+        concept = tree.categorize(observed)
+        correct += concept.predict(attr) == instance[attr]
+    return correct / len(instances)
+
+
+if __name__ == "__main__":
+    seed(0)
+    datasets = [('voting', noisy_voting, 'Class Name'),
+                ('mushroom', load_mushroom, 'classification')]
+
+    print('dataset\tshards\tslowest shard seconds\tcombine seconds\t'
+          'root cu\taccuracy')
+    for name, load, attr in datasets:
+        instances = load()
+        shuffle(instances)
+        split = len(instances) * 3 // 4
+        train, test = instances[:split], instances[split:]
+        for num_shards in [1, 2, 4]:
+            pool = Pool(num_shards)
+            results = pool.map(fit_shard, [train[i::num_shards]
+                                           for i in range(num_shards)])
+            pool.close()
+            trees = [tree for tree, _ in results]
+            start = default_timer()
+            tree = combine_trees(trees)
+            seconds = default_timer() - start
+            print('%s\t%i\t%0.3f\t%0.3f\t%0.4f\t%0.3f' % (
+                name, num_shards, max(s for _, s in results), seconds,
+                tree.root.category_utility(), accuracy(tree, test, attr)))
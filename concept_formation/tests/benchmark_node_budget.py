@@ -0,0 +1,40 @@
+"""
+Fits the congressional voting data into trees with different node budgets
+(see: :class:`CobwebTree <concept_formation.cobweb.CobwebTree>`) and reports
+the size of each tree, the time to fit it, and how often it predicts the
+party of held out instances correctly.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import seed
+from random import shuffle
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.datasets import load_congressional_voting
+
+
+def accuracy(tree, instances, attr='Class Name'):
+    correct = 0
+    for instance in instances:
+        observed = {a: instance[a] for a in instance if a != attr}
+        concept = tree.categorize(observed)
+        correct += concept.predict(attr) == instance[attr]
+    return correct / len(instances)
+
+
+if __name__ == "__main__":
+    seed(0)
+    instances = load_congressional_voting()
+    shuffle(instances)
+    train, test = instances[:335], instances[335:]
+
+    print('max_nodes\tconcepts\tseconds\taccuracy')
+    for max_nodes in [None, 200, 100, 50, 10]:
+        seed(0)
+        tree = CobwebTree(max_nodes=max_nodes)
+        start = default_timer()
+        tree.fit(train, randomize_first=False)
+        seconds = default_timer() - start
+        print('%s\t%i\t%0.3f\t%0.3f' % (max_nodes, tree.root.num_concepts(),
+                                        seconds, accuracy(tree, test)))
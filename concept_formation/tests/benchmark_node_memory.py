@@ -0,0 +1,56 @@
+"""
+Reports the memory used per concept node when fitting the bundled datasets.
+
+The total is measured with tracemalloc and includes each node's probability
+tables, while the shallow size only counts the node object itself (plus its
+``__dict__`` when the node class does not use ``__slots__``). Running this on
+a version of the package from before nodes were slotted gives the baseline to
+compare against.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import seed
+from sys import getsizeof
+import tracemalloc
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.cobweb3 import Cobweb3Tree
+from concept_formation.datasets import load_congressional_voting
+from concept_formation.datasets import load_forest_fires
+
+
+def shallow_size(node):
+    size = getsizeof(node)
+    if hasattr(node, '__dict__'):
+        size += getsizeof(node.__dict__)
+    return size
+
+
+def bytes_per_node(tree_class, instances):
+    seed(0)
+    tracemalloc.start()
+    tree = tree_class()
+    tree.fit(instances, randomize_first=False)
+    total, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = [tree.root]
+    shallow = 0
+    num_nodes = 0
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        shallow += shallow_size(node)
+        num_nodes += 1
+
+    return num_nodes, total / num_nodes, shallow / num_nodes
+
+
+if __name__ == "__main__":
+    print('tree\tnodes\ttotal bytes/node\tshallow bytes/node')
+    for tree_class, instances in [
+            (CobwebTree, load_congressional_voting()),
+            (Cobweb3Tree, load_forest_fires())]:
+        num_nodes, total, shallow = bytes_per_node(tree_class, instances)
+        print('%s\t%i\t%0.1f\t\t%0.1f' % (tree_class.__name__, num_nodes,
+                                          total, shallow))
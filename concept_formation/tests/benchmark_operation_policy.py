@@ -0,0 +1,45 @@
+"""
+Fits the mushroom and congressional voting data with different operation
+policies (see: :mod:`concept_formation.operation_policy`) and reports the
+time to fit each tree, how many merges and splits were evaluated, and the
+category utility of the root of the final tree.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import seed
+from random import shuffle
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.datasets import load_congressional_voting
+from concept_formation.datasets import load_mushroom
+from concept_formation.operation_policy import MinCountPolicy
+from concept_formation.operation_policy import PeriodicPolicy
+from concept_formation.operation_policy import WinRatePolicy
+
+
+def policies():
+    return [('always', None),
+            ('min count 20', MinCountPolicy(20)),
+            ('every 5th visit', PeriodicPolicy(5)),
+            ('win rate', WinRatePolicy())]
+
+
+if __name__ == "__main__":
+    print('dataset\tpolicy\tseconds\tmerges\tsplits\troot cu')
+    for name, load in [('voting', load_congressional_voting),
+                       ('mushroom', load_mushroom)]:
+        seed(0)
+        instances = load()
+        shuffle(instances)
+        for policy_name, policy in policies():
+            seed(0)
+            tree = CobwebTree(operation_policy=policy)
+            start = default_timer()
+            for instance in instances:
+                tree.ifit(instance)
+            seconds = default_timer() - start
+            stats = tree.operation_stats
+            print('%s\t%s\t%0.3f\t%i\t%i\t%0.4f' % (
+                name, policy_name, seconds, stats['merge', 'evaluated'],
+                stats['split', 'evaluated'], tree.root.category_utility()))
@@ -0,0 +1,52 @@
+"""
+Fits the bundled datasets, and a synthetic dataset with many values per
+attribute, with and without pruning merges and splits by their category
+utility bounds (see: :class:`CobwebTree
+<concept_formation.cobweb.CobwebTree>`). It checks that both trees are the
+same and reports the time to fit them and how often each operation was pruned.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import choice
+from random import seed
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.cobweb3 import Cobweb3Tree
+from concept_formation.datasets import load_congressional_voting
+from concept_formation.datasets import load_iris
+from concept_formation.datasets import load_forest_fires
+
+
+def many_values(num_instances=500, num_attrs=10, num_values=200):
+    return [{'a%i' % j: 'v%i' % choice(range(num_values))
+             for j in range(num_attrs)} for i in range(num_instances)]
+
+
+if __name__ == "__main__":
+    seed(0)
+    datasets = [('voting', CobwebTree, load_congressional_voting()),
+                ('many values', CobwebTree, many_values()),
+                ('iris', Cobweb3Tree, load_iris()),
+                ('forest fires', Cobweb3Tree, load_forest_fires())]
+
+    print('dataset\tsame tree\tseconds\tpruned seconds\tmerges pruned\t'
+          'splits pruned')
+    for name, tree_class, instances in datasets:
+        results = []
+        for prune_operations in [False, True]:
+            seed(0)
+            tree = tree_class()
+            tree.prune_operations = prune_operations
+            start = default_timer()
+            for instance in instances:
+                tree.ifit(instance)
+            results.append((str(tree), default_timer() - start,
+                            tree.operation_stats))
+        stats = results[1][2]
+        print('%s\t%s\t%0.3f\t%0.3f\t%i/%i\t%i/%i' % (
+            name, results[0][0] == results[1][0], results[0][1],
+            results[1][1], stats['merge', 'pruned'],
+            stats['merge', 'pruned'] + stats['merge', 'evaluated'],
+            stats['split', 'pruned'],
+            stats['split', 'pruned'] + stats['split', 'evaluated']))
@@ -0,0 +1,58 @@
+"""
+Fits the congressional voting data into trees in a shuffled order and ordered
+by party and by votes, reorganizes each tree (see: :meth:`CobwebTree.reorganize
+<concept_formation.cobweb.CobwebTree.reorganize>`), and reports the depth and
+branching of the tree, the time to categorize held out instances, and how
+often the tree predicts their party correctly, before and after.
+"""
+from __future__ import print_function
+from __future__ import division
+from random import seed
+from random import shuffle
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+from concept_formation.datasets import load_congressional_voting
+
+
+def evaluate(tree, instances, attr='Class Name'):
+    correct = 0
+    start = default_timer()
+    for instance in instances:
+        observed = {a: instance[a] for a in instance if a != attr}
+        concept = tree.categorize(observed)
+        correct += concept.predict(attr) == instance[attr]
+    return default_timer() - start, correct / len(instances)
+
+
+def report(order, stage, stats, seconds, accuracy):
+    print('%s\t%s\t%i\t%i\t%0.2f\t%i\t%0.2f\t%0.4f\t%0.3f' % (
+        order, stage, stats['nodes'], stats['max_depth'],
+        stats['mean_depth'], stats['max_children'], stats['mean_children'],
+        seconds, accuracy))
+
+
+if __name__ == "__main__":
+    seed(0)
+    instances = load_congressional_voting()
+    shuffle(instances)
+    train, test = instances[:335], instances[335:]
+    orders = [('shuffled', list(train)),
+              ('party', sorted(train, key=lambda x: x['Class Name'])),
+              ('votes', sorted(train, key=lambda x: sorted(x.items())))]
+
+    print('order\tstage\tnodes\tmax depth\tmean depth\tmax children\t'
+          'mean children\tcategorize seconds\taccuracy')
+    for order, stream in orders:
+        seed(0)
+        tree = CobwebTree()
+        tree.fit(stream, randomize_first=False)
+        report(order, 'fit', tree.structure_stats(), *evaluate(tree, test))
+
+        start = default_timer()
+        result = tree.reorganize()
+        print('%s\treorganized in %0.3f seconds: %i splits, %i merges, '
+              '%i moves' % (order, default_timer() - start,
+                            result['splits'], result['merges'],
+                            result['moves']))
+        report(order, 'reorganized', result['after'], *evaluate(tree, test))
@@ -0,0 +1,62 @@
+"""
+Fits a stream of instances with and without a sliding window (see:
+:meth:`CobwebTree.remove <concept_formation.cobweb.CobwebTree.remove>`) and
+reports the number of concepts and the average time per instance for each
+block of the stream. With the window, both stay flat as the stream grows.
+
+The window either keeps the leaf that :meth:`CobwebTree.ifit
+<concept_formation.cobweb.CobwebTree.ifit>` returned for each instance and
+passes it to :meth:`CobwebTree.unfit
+<concept_formation.cobweb.CobwebTree.unfit>`, or searches for a leaf that holds
+the instance with :meth:`CobwebTree.remove
+<concept_formation.cobweb.CobwebTree.remove>`. For comparison, the stream is
+also fit into a tree that decays its counts instead of keeping a window (see:
+:class:`CobwebTree <concept_formation.cobweb.CobwebTree>`).
+"""
+from __future__ import print_function
+from __future__ import division
+from collections import deque
+from random import choice
+from random import seed
+from timeit import default_timer
+
+from concept_formation.cobweb import CobwebTree
+
+
+def stream(n):
+    for i in range(n):
+        yield {'a%i' % j: choice(['v1', 'v2', 'v3', 'v4']) for j in range(6)}
+
+
+def run(instances, window=None, keep_leaves=True, decay=None, block=1000):
+    tree = CobwebTree(decay=decay)
+    recent = deque()
+    start = default_timer()
+    for i, instance in enumerate(instances):
+        leaf = tree.ifit(instance)
+        if window is not None:
+            recent.append((leaf, instance))
+            if len(recent) > window:
+                leaf, old = recent.popleft()
+                if keep_leaves:
+                    tree.unfit(leaf, old)
+                else:
+                    tree.remove(old)
+        if (i + 1) % block == 0:
+            seconds = default_timer() - start
+            print('%i\t%i\t%0.1f' % (i + 1, tree.root.num_concepts(),
+                                     seconds / block * 1e6))
+            start = default_timer()
+
+
+if __name__ == "__main__":
+    seed(0)
+    instances = list(stream(8000))
+    for window, keep_leaves in [(None, True), (1000, True), (1000, False)]:
+        print('window %s, %s' % (window, 'unfit' if keep_leaves else 'remove'))
+        print('instances\tconcepts\tmicroseconds per instance')
+        run(instances, window, keep_leaves)
+
+    print('decay 0.998')
+    print('instances\tconcepts\tmicroseconds per instance')
+    run(instances, decay=0.998)
@@ -1,11 +1,22 @@
 from __future__ import print_function, unicode_literals
 from __future__ import absolute_import, division
 import random
+import copy
+import pickle
+import sys
+import threading
 
 import pytest
 
 from concept_formation.cobweb import CobwebTree
 from concept_formation.cobweb import CobwebNode
+from concept_formation.cobweb import combine_trees
+from concept_formation.children import Children
+from concept_formation.mapped_tree import MappedTree
+from concept_formation.operation_policy import OperationPolicy
+from concept_formation.operation_policy import MinCountPolicy
+from concept_formation.operation_policy import PeriodicPolicy
+from concept_formation.operation_policy import WinRatePolicy
 
 
 def verify_counts(node):
@@ -55,6 +66,26 @@ def verify_counts(node):
         verify_counts(child)
 
 
+def verify_tables(node, instances):
+    """
+    Checks that every children table in the subtree scores inserting the
+    instances the same as scoring one child at a time, i.e., that no table is
+    left with stale rows.
+    """
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        table = node.get_children_table()
+        if table is None:
+            continue
+        for instance in instances:
+            relative_cus = table.relative_cu_for_insert(instance)
+            for child, relative_cu in zip(table.children, relative_cus):
+                assert relative_cu == pytest.approx(
+                    node.relative_cu_for_insert(child, instance))
+
+
 def test_cobweb_init():
     tree = CobwebTree()
     assert isinstance(tree.root, CobwebNode)
@@ -125,3 +156,1138 @@ def test_empty_instance():
     t.ifit({'x': 1})
     t.ifit({'x': 2})
     t.categorize({})
+
+
+def test_expected_correct_guesses():
+    tree = CobwebTree()
+    for i in range(40):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice(['v1', 'v2'])
+        data['_a3'] = random.choice(['v1', 'v2', 'v3'])
+        tree.ifit(data)
+
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+
+        correct_guesses = 0.0
+        attr_count = 0
+        for attr in node.attrs():
+            attr_count += 1
+            for val in node.av_counts[attr]:
+                prob = node.av_counts[attr][val] / node.count
+                correct_guesses += prob * prob
+
+        assert (node.expected_correct_guesses() ==
+                pytest.approx(correct_guesses / attr_count))
+
+
+def test_expected_correct_guesses_for_insert():
+    tree = CobwebTree()
+    for i in range(40):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice(['v1', 'v2'])
+        data['_a3'] = random.choice(['v1', 'v2', 'v3'])
+        tree.ifit(data)
+
+    instances = [{'a1': 'v1', 'a2': 'v3'}, {'a1': 'v5', '_a3': 'v1'},
+                 {'a4': 'v1'}]
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        for instance in instances:
+            temp = node.shallow_copy()
+            temp.increment_counts(instance)
+            assert (node.expected_correct_guesses_for_insert(instance) ==
+                    pytest.approx(temp.expected_correct_guesses()))
+
+
+def temp_tree_cu(node, children, instance=None):
+    """
+    Computes category utility the slow way by building a temporary parent with
+    shallow copies of the given children, each optionally updated with the
+    instance. Used to check the closed form operation scores.
+    """
+    temp = node.shallow_copy()
+    if instance is not None:
+        temp.increment_counts(instance)
+    for child, add_instance in children:
+        temp_child = child.shallow_copy()
+        if add_instance:
+            temp_child.increment_counts(instance)
+        temp.children.append(temp_child)
+    return temp.category_utility()
+
+
+def test_operation_cu():
+    tree = CobwebTree()
+    for i in range(60):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice(['v1', 'v2'])
+        data['_a3'] = random.choice(['v1', 'v2', 'v3'])
+        tree.ifit(data)
+    instance = {'a1': 'v1', 'a2': 'v3', 'a4': 'v1'}
+
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        if not node.children:
+            continue
+
+        empty = CobwebNode()
+        empty.tree = tree
+        expected = temp_tree_cu(node, [(c, False) for c in node.children] +
+                                [(empty, True)], instance)
+        assert node.cu_for_new_child(instance) == pytest.approx(expected)
+
+        if len(node.children) > 2:
+            best1, best2 = node.children[0], node.children[1]
+            merged = best1.shallow_copy()
+            merged.update_counts_from_node(best2)
+            expected = temp_tree_cu(node, [(merged, True)] +
+                                    [(c, False) for c in node.children[2:]],
+                                    instance)
+            assert (node.cu_for_merge(best1, best2, instance) ==
+                    pytest.approx(expected))
+
+        for best in node.children:
+            if not best.children:
+                continue
+            expected = temp_tree_cu(node, [(c, False) for c in
+                                           node.children + best.children
+                                           if c != best])
+            assert node.cu_for_split(best) == pytest.approx(expected)
+
+
+def test_cobweb_node_slots():
+    tree = CobwebTree()
+    tree.fit([{'a': 'b'}, {'a': 'c'}])
+    assert not hasattr(tree.root, '__dict__')
+
+    tree2 = copy.deepcopy(tree)
+    assert str(tree2) == str(tree)
+    assert tree2.root.tree is tree2
+
+
+def test_intern_instance():
+    tree = CobwebTree()
+    a1 = ('rel', 'x', 'y')
+    a2 = tuple(['rel'] + ['x', 'y'])
+    assert a1 == a2 and a1 is not a2
+
+    tree.ifit({a1: 'v1', 'b': 'v2'})
+    tree.ifit({a2: 'v3', 'b': 'v2'})
+
+    leaves = tree.root.children
+    assert len(leaves) == 2
+    keys = [next(k for k in leaf.av_counts if k == a1) for leaf in leaves]
+    assert keys[0] is keys[1]
+
+    assert tree.root.av_counts[a2]['v1'] == 1
+    assert tree.categorize({a2: 'v3', 'b': 'v2'}) == leaves[1]
+
+    vocabulary = dict(tree.vocabulary)
+    tree.categorize({'c': 'v4', 'b': 'v5'})
+    tree.categorize_batch([{'c': 'v4'}, {'d': 'v6'}])
+    tree.infer_missing({'c': 'v4'})
+    assert tree.vocabulary == vocabulary
+    assert 'c' not in tree.vocabulary
+
+    tree.remove({a1: 'v1', 'b': 'v2'})
+    assert 'v1' in tree.vocabulary
+    tree.prune_vocabulary()
+    assert 'v1' not in tree.vocabulary
+    assert set(tree.vocabulary) == {a1, 'b', 'v2', 'v3'}
+
+
+def test_children_table():
+    pytest.importorskip('numpy')
+
+    tree = CobwebTree(min_vectorized_children=2)
+    for i in range(150):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4', 'v5'])
+        data['a2'] = random.choice(['v1', 'v2', 'v3'])
+        if random.random() < 0.5:
+            data['a3'] = random.choice(['v1', 'v2'])
+        data['_a4'] = random.choice(['v1', 'v2', 'v3'])
+        tree.ifit(data)
+    verify_counts(tree.root)
+
+    instances = [{'a1': 'v1', 'a2': 'v3'}, {'a1': 'v6', '_a4': 'v1'},
+                 {'a3': 'v1', 'a5': 'v1'}]
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        table = node.get_children_table()
+        if table is None:
+            continue
+        for instance in instances:
+            relative_cus = table.relative_cu_for_insert(instance)
+            assert list(relative_cus) == [
+                node.relative_cu_for_insert(child, instance)
+                for child in node.children]
+
+    # Swapping a child's values for others leaves its count unchanged.
+    tree = CobwebTree(min_vectorized_children=2)
+    for val in ['v1', 'v2', 'v3']:
+        tree.ifit({'a': val})
+    assert tree.root.get_children_table() is not None
+    child = tree.root.children[0]
+    old = CobwebNode()
+    old.increment_counts({'a': child.predict('a')})
+    new = CobwebNode()
+    new.increment_counts({'a': 'v4'})
+    child.remove_counts_from_node(old)
+    child.update_counts_from_node(new)
+    verify_tables(tree.root, [{'a': 'v4'}])
+
+    # A child that changes while it is away from its parent.
+    child = tree.root.children[1]
+    tree.root.children.remove(child)
+    child.parent = None
+    child.increment_counts({'a': 'v5'})
+    child.parent = tree.root
+    tree.root.children.append(child)
+    verify_tables(tree.root, [{'a': 'v5'}])
+
+
+def test_categorize_batch():
+    for min_vectorized_children in [None, 2]:
+        if min_vectorized_children is not None:
+            pytest.importorskip('numpy')
+
+        tree = CobwebTree(min_vectorized_children=min_vectorized_children)
+        assert tree.categorize_batch([{'a1': 'v1'}]) == [tree.root]
+
+        instances = []
+        for i in range(200):
+            data = {}
+            for a in range(8):
+                data['a%i' % a] = random.choice(['v1', 'v2', 'v3', 'v4'])
+            data['_a8'] = random.choice(['v1', 'v2'])
+            instances.append(data)
+
+        tree.fit(instances[:100])
+        concepts = tree.categorize_batch(instances)
+        assert len(concepts) == len(instances)
+        assert tree.categorize_batch([]) == []
+
+        # Ties between children are broken randomly, so rather than comparing
+        # with categorize directly check that every step of the path to each
+        # concept picks a best child.
+        for data, concept in zip(instances, concepts):
+            assert not concept.children
+            path = []
+            node = concept
+            while node.parent is not None:
+                path.append(node)
+                node = node.parent
+            assert node is tree.root
+
+            tied = False
+            for child in reversed(path):
+                scores = [(node.relative_cu_for_insert(c, data), c.count)
+                          for c in node.children]
+                best = max(scores)
+                assert scores[node.children.index(child)] == best
+                tied = tied or scores.count(best) > 1
+                node = child
+            if not tied:
+                assert concept is tree.categorize(data)
+
+
+def test_thread_safe():
+    tree = CobwebTree(min_vectorized_children=None, thread_safe=True)
+    assert copy.deepcopy(tree).lock is not None
+    assert copy.deepcopy(CobwebTree()).lock is None
+
+    def random_instance():
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice(['v1', 'v2', 'v3'])
+        if random.random() < 0.5:
+            data['a3'] = random.choice(['v1', 'v2'])
+        return data
+
+    for min_vectorized_children in [None, 2]:
+        if min_vectorized_children is not None:
+            pytest.importorskip('numpy')
+        tree = CobwebTree(min_vectorized_children=min_vectorized_children,
+                          thread_safe=True)
+        errors = []
+        done = threading.Event()
+
+        def fit():
+            try:
+                for i in range(300):
+                    tree.ifit(random_instance())
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        def read():
+            try:
+                while not done.is_set():
+                    concept = tree.categorize(random_instance())
+                    assert not concept.children
+                    tree.infer_missing({'a1': 'v1'})
+                    tree.categorize_batch([random_instance()
+                                           for i in range(5)])
+
+                    # readers never see a partially applied operation
+                    tree.lock.acquire_read()
+                    try:
+                        verify_counts(tree.root)
+                    finally:
+                        tree.lock.release_read()
+            except Exception as e:
+                errors.append(e)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=fit)]
+            threads += [threading.Thread(target=read) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        assert errors == []
+        assert tree.root.count == 300
+        verify_counts(tree.root)
+
+
+def test_save_load(tmp_path):
+    tree = CobwebTree()
+    for i in range(60):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice([1, 2.5, 'v3'])
+        data[('rel', 'a', 'b')] = random.choice(['v1', 'v2'])
+        data['_a3'] = random.choice(['v1', 'v2'])
+        tree.ifit(data)
+
+    path = str(tmp_path / 'tree.bin')
+    tree.save(path)
+    loaded = CobwebTree.load(path)
+    verify_counts(loaded.root)
+    assert type(loaded) is CobwebTree
+    assert str(loaded) == str(tree)
+    assert loaded.vocabulary == tree.vocabulary
+
+    nodes = [(tree.root, loaded.root)]
+    while nodes:
+        node, other = nodes.pop()
+        assert other.tree is loaded
+        assert other.concept_id == node.concept_id
+        assert other.count == node.count
+        assert other.av_counts == node.av_counts
+        assert other.sq_counts == node.sq_counts
+        assert other.sq_counts_total == node.sq_counts_total
+        assert other.visible_attrs == node.visible_attrs
+        assert len(other.children) == len(node.children)
+        for child, other_child in zip(node.children, other.children):
+            assert other_child.parent is other
+            nodes.append((child, other_child))
+
+    # new concepts do not reuse the ids of loaded ones
+    loaded.ifit({'a1': 'v5'})
+    ids = []
+    nodes = [loaded.root]
+    while nodes:
+        node = nodes.pop()
+        ids.append(node.concept_id)
+        nodes.extend(node.children)
+    assert len(ids) == len(set(ids))
+
+    with pytest.raises(ValueError):
+        CobwebTree.load(__file__)
+
+
+def test_mapped_tree(tmp_path):
+    tree = CobwebTree()
+    instances = []
+    for i in range(80):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice(['v1', 'v2', 'v3'])
+        if random.random() < 0.5:
+            data['a3'] = random.choice(['v1', 'v2'])
+        data['_a4'] = random.choice(['v1', 'v2'])
+        instances.append(data)
+    tree.fit(instances)
+
+    path = str(tmp_path / 'tree.bin')
+    tree.save(path)
+    with MappedTree(path, cache_size=10) as mapped:
+        assert str(mapped) == str(tree)
+
+        queries = instances + [{'a1': 'v1'}, {'a5': 'v1'}, {}]
+        for data in queries:
+            # ties are broken the same way when the random state is the same
+            state = random.getstate()
+            concept = tree.categorize(data)
+            random.setstate(state)
+            mapped_concept = mapped.categorize(data)
+            assert mapped_concept.concept_id == concept.concept_id
+            assert mapped_concept.count == concept.count
+
+            for attr in ['a1', 'a3', '_a4', 'a5']:
+                random.setstate(state)
+                prediction = concept.predict(attr)
+                random.setstate(state)
+                assert mapped_concept.predict(attr) == prediction
+                for val in ['v1', 'v2', None]:
+                    assert (mapped_concept.probability(attr, val) ==
+                            concept.probability(attr, val))
+
+            random.setstate(state)
+            completed = tree.infer_missing(data)
+            random.setstate(state)
+            assert mapped.infer_missing(data) == completed
+
+        state = random.getstate()
+        concepts = [c.concept_id for c in tree.categorize_batch(queries)]
+        random.setstate(state)
+        assert [c.concept_id for c in
+                mapped.categorize_batch(queries)] == concepts
+
+
+def test_deep_tree():
+    # A chain of concepts that is deeper than the recursion limit.
+    depth = sys.getrecursionlimit() + 500
+    tree = CobwebTree()
+    leaf = tree.root
+    for i in range(depth):
+        data = {'a1': 'v%i' % (i % 3), '_a2': 'v1'}
+        leaf.increment_counts(data)
+        leaf = leaf.create_new_child(data)
+
+    assert tree.root.num_concepts() == depth + 1
+    assert leaf.depth() == depth
+    lines = str(tree).splitlines()
+    assert len(lines) == depth + 1
+    assert lines[-1].startswith('\t' * depth + '|-')
+
+    output = tree.root.output_json()
+    for i in range(depth):
+        assert len(output['children']) == 1
+        output = output['children'][0]
+    assert output['name'] == "Concept" + str(leaf.concept_id)
+
+    def verify_copy(root, other_root, tree, same_ids=True):
+        nodes = [(root, other_root)]
+        while nodes:
+            node, other = nodes.pop()
+            assert other is not node
+            assert other.tree is tree
+            assert (other.concept_id == node.concept_id) == same_ids
+            assert other.av_counts == node.av_counts
+            assert other.sq_counts_total == node.sq_counts_total
+            assert len(other.children) == len(node.children)
+            for child, other_child in zip(node.children, other.children):
+                assert other_child.parent is other
+                nodes.append((child, other_child))
+
+    for other in [pickle.loads(pickle.dumps(tree)), copy.deepcopy(tree)]:
+        verify_copy(tree.root, other.root, other)
+        assert str(other) == str(tree)
+
+    other_leaf = pickle.loads(pickle.dumps(leaf))
+    assert other_leaf.depth() == depth
+    assert other_leaf.tree.root.num_concepts() == depth + 1
+
+    other_root = CobwebNode(tree.root)
+    assert other_root.num_concepts() == depth + 1
+    verify_copy(tree.root.children[0], other_root.children[0], tree,
+                False)
+
+
+def test_fringe_split():
+    tree = CobwebTree()
+    tree.ifit({'a1': 'v1', 'a2': 'v1', '_a3': 'v1'})
+    leaf = tree.root
+    new_leaf = tree.ifit({'a1': 'v2', 'a2': 'v1'})
+
+    # the first leaf was the root, so the new parent becomes the root
+    assert leaf.parent is tree.root
+    assert tree.root.children == [leaf, new_leaf]
+    assert tree.root.concept_id not in (leaf.concept_id, new_leaf.concept_id)
+    assert tree.root.av_counts == {'a1': {'v1': 1, 'v2': 1}, 'a2': {'v1': 2},
+                                   '_a3': {'v1': 1}}
+    assert tree.root.av_counts['a1'] is not leaf.av_counts['a1']
+
+    for i in range(30):
+        tree.ifit({'a1': random.choice(['v1', 'v2', 'v3']),
+                   'a2': random.choice(['v1', 'v2'])})
+    verify_counts(tree.root)
+
+    leaf = tree.categorize({'a1': 'v1', 'a2': 'v1'})
+    assert not leaf.children
+    parent = leaf.parent
+    num_children = len(parent.children)
+    new_leaf = leaf.fringe_split({'a1': 'v4', 'a2': 'v2'})
+    new = leaf.parent
+    assert new.parent is parent
+    assert len(parent.children) == num_children
+    assert parent.children[-1] is new
+    assert new.children == [leaf, new_leaf]
+    assert new.count == leaf.count + 1
+    for node in (new, leaf, new_leaf):
+        assert node.sq_counts_total == sum(
+            c * c for attr in node.av_counts if attr[0] != "_"
+            for c in node.av_counts[attr].values())
+    verify_counts(new)
+
+
+def test_children():
+    nodes = [CobwebNode() for i in range(5)]
+    children = Children(nodes[:3])
+    children.append(nodes[3])
+    children.remove(nodes[1])
+    children.append(nodes[1])
+    assert children == [nodes[0], nodes[2], nodes[3], nodes[1]]
+    assert list(reversed(children)) == [nodes[1], nodes[3], nodes[2],
+                                        nodes[0]]
+    assert len(children) == 4
+    assert children[-1] is nodes[1]
+    assert children[1:3] == [nodes[2], nodes[3]]
+    assert children.index(nodes[3]) == 2
+    assert nodes[4] not in children
+    with pytest.raises(ValueError):
+        children.remove(nodes[4])
+
+    copied = copy.deepcopy(children)
+    assert len(copied) == 4
+    assert all(c is not n for c, n in zip(copied, children))
+
+    tree = CobwebTree()
+    for i in range(40):
+        tree.ifit({'a1': random.choice(['v1', 'v2', 'v3', 'v4']),
+                   'a2': random.choice(['v1', 'v2'])})
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        assert isinstance(node.children, Children)
+        for child in node.children:
+            assert child.parent is node
+        nodes.extend(node.children)
+    verify_counts(tree.root)
+
+
+def test_index_duplicates():
+    tree = CobwebTree(index_duplicates=True)
+    instances = []
+    for i in range(60):
+        instances.append({'a1': random.choice(['v1', 'v2', 'v3', 'v4']),
+                          'a2': random.choice(['v1', 'v2', 'v3']),
+                          '_a3': random.choice(['v1', 'v2'])})
+    leaves = {}
+    for instance in instances:
+        leaf = tree.ifit(instance)
+        fingerprint = tree.fingerprint(instance)
+        assert not leaf.children
+        assert leaf.is_exact_match(instance)
+        assert tree.leaf_index[fingerprint] is leaf
+        if fingerprint in leaves and leaves[fingerprint].parent is not None:
+            assert leaf is leaves[fingerprint]
+        leaves[fingerprint] = leaf
+    assert tree.root.count == len(instances)
+    verify_counts(tree.root)
+
+    # duplicates skip the descent but update every ancestor
+    instance = instances[0]
+    leaf = tree.leaf_index[tree.fingerprint(instance)]
+    counts = []
+    node = leaf
+    while node is not None:
+        counts.append((node, node.count))
+        node = node.parent
+    assert tree.ifit(dict(instance)) is leaf
+    for node, count in counts:
+        assert node.count == count + 1
+    verify_counts(tree.root)
+
+    # a leaf that is no longer in the tree is dropped from the index
+    leaf.parent.children.remove(leaf)
+    leaf.parent = None
+    new_leaf = tree.ifit(instance)
+    assert new_leaf is not leaf
+    assert tree.leaf_index[tree.fingerprint(instance)] is new_leaf
+
+    copied = copy.deepcopy(tree)
+    assert copied.leaf_index[tree.fingerprint(instance)].tree is copied
+
+    tree.clear()
+    assert tree.leaf_index == {}
+    assert CobwebTree().leaf_index is None
+
+
+def test_weighted_ifit():
+    tree = CobwebTree()
+    for i in range(60):
+        data = {}
+        data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+        data['a2'] = random.choice(['v1', 'v2'])
+        data['_a3'] = random.choice(['v1', 'v2', 'v3'])
+        tree.ifit(data)
+    instance = {'a1': 'v1', 'a2': 'v3', 'a4': 'v1'}
+    weight = 3
+
+    def repeated(node):
+        temp = node.shallow_copy()
+        for i in range(weight):
+            temp.increment_counts(instance)
+        return temp
+
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+
+        weighted = node.shallow_copy()
+        weighted.increment_counts(instance, weight)
+        temp = repeated(node)
+        assert weighted.count == temp.count
+        assert weighted.av_counts == temp.av_counts
+        assert weighted.sq_counts_total == temp.sq_counts_total
+        assert (node.expected_correct_guesses_for_insert(instance, weight) ==
+                pytest.approx(temp.expected_correct_guesses()))
+
+        if not node.children:
+            continue
+
+        # the closed form scores match a temporary tree holding the copies
+        for child in node.children:
+            expected = repeated(node)
+            for c in node.children:
+                expected.children.append(repeated(c) if c is child else
+                                         c.shallow_copy())
+            assert (node.cu_for_insert(child, instance, weight) ==
+                    pytest.approx(expected.category_utility()))
+
+        best1_cu, best1, best2 = node.two_best_children(instance, weight)
+        assert (best1_cu ==
+                pytest.approx(node.cu_for_insert(best1, instance, weight)))
+
+        expected = repeated(node)
+        for c in node.children:
+            expected.children.append(c.shallow_copy())
+        new_child = CobwebNode()
+        new_child.tree = tree
+        expected.children.append(repeated(new_child))
+        assert (node.cu_for_new_child(instance, weight) ==
+                pytest.approx(expected.category_utility()))
+
+        if len(node.children) > 2:
+            best1, best2 = node.children[0], node.children[1]
+            merged = best1.shallow_copy()
+            merged.update_counts_from_node(best2)
+            expected = repeated(node)
+            expected.children.append(repeated(merged))
+            for c in node.children[2:]:
+                expected.children.append(c.shallow_copy())
+            assert (node.cu_for_merge(best1, best2, instance, weight) ==
+                    pytest.approx(expected.category_utility()))
+
+    # fit accepts (instance, count) pairs
+    tree = CobwebTree()
+    tree.fit([({'a1': 'v1'}, 3), {'a1': 'v2'}, ({'a1': 'v1'}, 2.5)],
+             randomize_first=False)
+    assert tree.root.count == 6.5
+    assert tree.root.av_counts['a1'] == {'v1': 5.5, 'v2': 1}
+    verify_counts(tree.root)
+
+    leaf = tree.categorize({'a1': 'v1'})
+    assert leaf.count == 5.5
+    assert tree.ifit({'a1': 'v1'}, weight=2) is leaf
+    assert leaf.count == 7.5
+
+    for weight in [0, -1, 'a']:
+        with pytest.raises(ValueError):
+            tree.ifit({'a1': 'v1'}, weight=weight)
+    assert tree.root.count == 8.5
+
+
+def test_weighted_children_table():
+    pytest.importorskip('numpy')
+
+    tree = CobwebTree(min_vectorized_children=2)
+    for i in range(60):
+        tree.ifit({'a1': random.choice(['v1', 'v2', 'v3', 'v4']),
+                   'a2': random.choice(['v1', 'v2'])}, weight=2)
+    instance = {'a1': 'v1', 'a2': 'v3', 'a4': 'v1'}
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        table = node.get_children_table()
+        if table is None:
+            continue
+        scores = table.relative_cu_for_insert(instance, 4)
+        for child, score in zip(table.children, scores):
+            assert (score == node.relative_cu_for_insert(child, instance, 4))
+    verify_counts(tree.root)
+
+
+def test_remove():
+    instances = [{'a1': random.choice(['v1', 'v2', 'v3']),
+                  'a2': random.choice(['v1', 'v2']),
+                  '_h': random.choice(['v1', 'v2'])} for i in range(40)]
+
+    # Removing fractional weights leaves no counts that are only rounding
+    # errors.
+    tree = CobwebTree()
+    tree.ifit({'a1': 'v1', 'a2': 'v1'}, weight=0.3)
+    tree.ifit({'a1': 'v2', 'a2': 'v1'}, weight=0.7)
+    tree.remove({'a1': 'v1', 'a2': 'v1'}, weight=0.1)
+    tree.remove({'a1': 'v1', 'a2': 'v1'}, weight=0.2)
+    assert tree.root.av_counts == {'a1': {'v2': 0.7}, 'a2': {'v1': 0.7}}
+    assert tree.root.sq_counts_total == pytest.approx(2 * 0.7 ** 2)
+    tree.remove({'a1': 'v2', 'a2': 'v1'}, weight=0.7)
+    assert tree.root.count == 0
+    assert tree.root.av_counts == {}
+    assert tree.root.sq_counts_total == 0
+
+    # The weight that an instance still carries in a decaying tree is not
+    # known, so it cannot be removed.
+    tree = CobwebTree(decay=0.9)
+    leaf = tree.ifit(instances[0])
+    tree.ifit(instances[1])
+    with pytest.raises(ValueError):
+        tree.remove(instances[0])
+    with pytest.raises(ValueError):
+        tree.unfit(leaf, instances[0])
+
+    for min_vectorized_children in [None, 2]:
+        if min_vectorized_children is not None:
+            pytest.importorskip('numpy')
+
+        tree = CobwebTree(min_vectorized_children=min_vectorized_children)
+        for instance in instances:
+            tree.ifit(instance)
+
+        with pytest.raises(ValueError):
+            tree.remove({'a1': 'v4'})
+        with pytest.raises(ValueError):
+            tree.remove(instances[0], weight=100)
+
+        instance = {'a1': 'v1', 'a3': 'v1'}
+        leaf = tree.ifit(instance)
+        tree.unfit(leaf, instance)
+        assert 'a3' not in tree.root.av_counts
+
+        for instance in instances[:30]:
+            tree.remove(instance)
+            verify_counts(tree.root)
+
+        expected = CobwebNode()
+        for instance in instances[30:]:
+            expected.increment_counts(instance)
+        assert tree.root.count == expected.count
+        assert tree.root.av_counts == expected.av_counts
+        assert tree.root.sq_counts_total == pytest.approx(
+            expected.sq_counts_total)
+
+        instance = {'a1': 'v1', 'a2': 'v3', 'a4': 'v1'}
+        nodes = [tree.root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            assert len(node.children) != 1
+            assert all(child.count > 0 for child in node.children)
+            table = node.get_children_table()
+            if table is None:
+                continue
+            scores = table.relative_cu_for_insert(instance)
+            for child, score in zip(table.children, scores):
+                assert (score == pytest.approx(
+                    node.relative_cu_for_insert(child, instance)))
+
+        for instance in instances[30:]:
+            tree.remove(instance)
+        assert tree.root.count == 0
+        assert tree.root.av_counts == {}
+        assert len(tree.root.children) == 0
+        tree.ifit(instances[0])
+        assert tree.root.count == 1
+
+
+def test_decay(tmp_path):
+    with pytest.raises(ValueError):
+        CobwebTree(decay=1.5)
+
+    tree = CobwebTree(decay=0.95, min_count=0.5)
+    for i in range(1000):
+        phase = 'v%i' % (i // 500)
+        tree.ifit({'a1': random.choice(['v1', 'v2', 'v3']), 'a2': phase,
+                   '_h': phase})
+    assert tree.root.count == pytest.approx((1 - 0.95 ** 1000) / 0.05)
+    assert tree.root.num_concepts() < 250
+    assert tree.root.av_counts['a2'].get('v0', 0) < 1e-9
+
+    path = str(tmp_path / 'tree.bin')
+    tree.save(path)
+    loaded = CobwebTree.load(path)
+
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        tree.decay_children(node, prune=False)
+        nodes.extend(node.children)
+        if not node.children:
+            continue
+        assert len(node.children) > 1
+        assert node.count == pytest.approx(
+            sum(child.count for child in node.children))
+        for attr in node.av_counts:
+            for val in node.av_counts[attr]:
+                assert node.av_counts[attr][val] == pytest.approx(
+                    sum(child.av_counts.get(attr, {}).get(val, 0)
+                        for child in node.children), abs=1e-9)
+    assert str(loaded) == str(tree)
+
+    tree.clear()
+    assert tree.time == 0
+
+    # Decay rescales all of a child's values, not just those of the instance
+    # that is added next.
+    pytest.importorskip('numpy')
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(3)} for i in range(300)]
+    tree = CobwebTree(decay=0.97, min_vectorized_children=2)
+    for instance in instances:
+        tree.ifit(instance)
+    verify_tables(tree.root, instances[:10])
+
+    # A decayed child whose next increment restores its count.
+    tree = CobwebTree(min_vectorized_children=2)
+    for instance in [{'a': 'v1', 'b': 'v1'}, {'a': 'v1', 'b': 'v1'},
+                     {'a': 'v2', 'b': 'v2'}, {'a': 'v3', 'b': 'v3'}]:
+        tree.ifit(instance)
+    assert tree.root.get_children_table() is not None
+    child = [c for c in tree.root.children if c.count == 2][0]
+    child.decay_counts(0.5)
+    child.increment_counts({'a': 'v1'})
+    verify_tables(tree.root, [{'a': 'v1', 'b': 'v1'}])
+
+
+def test_max_nodes():
+    with pytest.raises(ValueError):
+        CobwebTree(max_nodes=0)
+
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(4)} for i in range(300)]
+    tree = CobwebTree(max_nodes=50)
+    for instance in instances:
+        leaf = tree.ifit(instance)
+        assert tree.num_nodes == tree.root.num_concepts()
+        assert tree.num_nodes <= 50
+        assert leaf.has_instance(instance)
+        node = leaf
+        while node.parent is not None:
+            node = node.parent
+        assert node is tree.root
+    verify_counts(tree.root)
+
+    expected = CobwebNode()
+    for instance in instances:
+        expected.increment_counts(instance)
+    assert tree.root.av_counts == expected.av_counts
+
+    tree.compact(10)
+    assert tree.num_nodes == tree.root.num_concepts()
+    assert tree.num_nodes <= 10
+    verify_counts(tree.root)
+    assert tree.root.av_counts == expected.av_counts
+
+
+def test_operation_pruning():
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(random.randint(1, 5))}
+                 for i in range(200)]
+    for instance in instances[::3]:
+        instance['_h'] = 'v1'
+
+    trees = []
+    for prune_operations in [False, True]:
+        random.seed(0)
+        tree = CobwebTree()
+        tree.prune_operations = prune_operations
+        for instance in instances:
+            tree.ifit(instance)
+        trees.append(tree)
+    assert str(trees[0]) == str(trees[1])
+    for op in ['best', 'new', 'merge', 'split']:
+        assert (trees[0].operation_stats[op, 'chosen'] ==
+                trees[1].operation_stats[op, 'chosen'])
+    assert trees[0].operation_stats['split', 'pruned'] == 0
+    assert trees[1].operation_stats['split', 'pruned'] > 0
+    for op in ['merge', 'split']:
+        assert (trees[0].operation_stats[op, 'evaluated'] ==
+                trees[1].operation_stats[op, 'evaluated'] +
+                trees[1].operation_stats[op, 'pruned'])
+
+    tree = trees[0]
+    nodes = [tree.root]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        if len(node.children) < 3:
+            continue
+        for instance in instances[:20]:
+            for weight in [1, 2.5]:
+                best1, best2 = node.children[:2]
+                assert (node.cu_for_merge_bound(best1, best2, instance, weight)
+                        >= node.cu_for_merge(best1, best2, instance, weight) -
+                        1e-12)
+        for best in node.children:
+            assert node.cu_for_split_bound(best) >= node.cu_for_split(best)
+
+
+def test_operation_policy():
+    with pytest.raises(ValueError):
+        PeriodicPolicy(0)
+    with pytest.raises(ValueError):
+        WinRatePolicy(decay=1)
+
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(4)} for i in range(200)]
+
+    def fit(policy):
+        random.seed(0)
+        tree = CobwebTree(operation_policy=policy)
+        for instance in instances:
+            tree.ifit(instance)
+        verify_counts(tree.root)
+        return tree
+
+    tree = fit(None)
+    assert str(fit(OperationPolicy())) == str(tree)
+    assert str(fit(PeriodicPolicy(1))) == str(tree)
+    assert str(fit(MinCountPolicy(0))) == str(tree)
+
+    tree = fit(MinCountPolicy(1000))
+    assert tree.operation_stats['merge', 'evaluated'] == 0
+    assert tree.operation_stats['split', 'evaluated'] == 0
+
+    policy = PeriodicPolicy(5)
+    tree = fit(policy)
+    assert policy.visits[tree.root.concept_id] >= len(instances) - 2
+    tree.clear()
+    assert policy.visits == {}
+
+    policy = WinRatePolicy(decay=0.5, min_rate=0.2, retry=3)
+    tree = fit(policy)
+    assert all(0 <= rate <= 1 for rate in policy.rates.values())
+    assert (tree.operation_stats['merge', 'evaluated'] <
+            fit(None).operation_stats['merge', 'evaluated'])
+
+
+def test_fit_bulk():
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(random.randint(2, 4))} for i in range(300)]
+    instances.append((instances[0], 3))
+
+    tree = CobwebTree(index_duplicates=True)
+    tree.fit_bulk(instances)
+    verify_counts(tree.root)
+    assert tree.num_nodes == tree.root.num_concepts()
+    expected = CobwebNode()
+    for instance in instances[:-1]:
+        expected.increment_counts(instance)
+    expected.increment_counts(instances[0], 3)
+    assert tree.root.av_counts == expected.av_counts
+
+    leaves = [node for node in tree.root._walk() if not node.children]
+    fingerprints = {tree.fingerprint(instance) for instance in instances[:-1]}
+    assert len(leaves) == len(fingerprints)
+    for instance in instances[:-1]:
+        leaf = tree.leaf_index[tree.fingerprint(instance)]
+        assert leaf.is_exact_match(instance)
+
+    for instance in instances[:50]:
+        tree.ifit(instance)
+    verify_counts(tree.root)
+    assert tree.num_nodes == tree.root.num_concepts()
+
+    with pytest.raises(ValueError):
+        tree.fit_bulk(instances)
+
+    tree = CobwebTree(max_nodes=50)
+    tree.fit_bulk(instances)
+    assert tree.num_nodes <= 50
+    verify_counts(tree.root)
+
+
+def test_expected_correct_guesses_for_merge():
+    tree = CobwebTree()
+    for i in range(60):
+        tree.ifit({'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                   for j in range(random.randint(1, 4))})
+    nodes = list(tree.root._walk())
+    for node in nodes[:20]:
+        for other in nodes[-20:]:
+            merged = CobwebNode()
+            merged.tree = tree
+            merged.update_counts_from_node(node)
+            merged.update_counts_from_node(other)
+            assert (node.expected_correct_guesses_for_merge(other) ==
+                    pytest.approx(merged.expected_correct_guesses()))
+
+
+def test_merge_tree():
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(random.randint(2, 4))} for i in range(300)]
+    shards = [instances[i::3] for i in range(3)]
+    trees = []
+    for shard in shards:
+        tree = CobwebTree()
+        tree.fit(shard)
+        trees.append(tree)
+    printed = [str(tree) for tree in trees]
+
+    combined = combine_trees(trees)
+    assert [str(tree) for tree in trees] == printed
+    verify_counts(combined.root)
+    assert combined.num_nodes == combined.root.num_concepts()
+    expected = CobwebNode()
+    for instance in instances:
+        expected.increment_counts(instance)
+    assert combined.root.count == expected.count
+    assert combined.root.av_counts == expected.av_counts
+    for node in combined.root._walk():
+        assert node.tree is combined
+        for child in node.children:
+            assert child.parent is node
+        for attr in node.av_counts:
+            assert combined.vocabulary[attr] is attr
+            for val in node.av_counts[attr]:
+                assert combined.vocabulary[val] is val
+    for instance in instances:
+        assert combined.categorize(instance).count > 0
+
+    combined.ifit(instances[0])
+    verify_counts(combined.root)
+
+    empty = CobwebTree()
+    empty.merge_tree(trees[0])
+    assert str(empty) == printed[0]
+    trees[0].merge_tree(CobwebTree())
+    assert str(trees[0]) == printed[0]
+
+    with pytest.raises(ValueError):
+        CobwebTree(decay=0.9).merge_tree(trees[0])
+    with pytest.raises(ValueError):
+        combine_trees([])
+
+
+def test_reorganize():
+    tree = CobwebTree()
+    assert tree.structure_stats() == {'nodes': 1, 'leaves': 1,
+                                      'max_depth': 0, 'mean_depth': 0.0,
+                                      'max_children': 0,
+                                      'mean_children': 0.0}
+    tree.ifit({'a': 'v1'})
+    tree.ifit({'a': 'v2'})
+    tree.ifit({'a': 'v3'})
+    stats = tree.structure_stats()
+    assert stats['nodes'] == tree.root.num_concepts()
+    assert stats['leaves'] == 3
+
+    instances = [{'a%i' % j: random.choice(['v1', 'v2', 'v3'])
+                  for j in range(random.randint(2, 4))} for i in range(300)]
+    instances.sort(key=lambda x: sorted(x.items()))
+    tree = CobwebTree()
+    tree.fit(instances, randomize_first=False)
+    before = tree.structure_stats()
+    av_counts = copy.deepcopy(tree.root.av_counts)
+    cu = tree.root.category_utility()
+
+    result = tree.reorganize()
+    assert result['before'] == before
+    assert result['after'] == tree.structure_stats()
+    assert result['splits'] + result['merges'] + result['moves'] > 0
+    verify_counts(tree.root)
+    assert tree.num_nodes == tree.root.num_concepts()
+    assert tree.root.count == 300
+    assert tree.root.av_counts == av_counts
+    assert tree.root.category_utility() >= cu - 1e-9
+    leaves = 0
+    for node in tree.root._walk():
+        assert len(node.children) != 1
+        for child in node.children:
+            assert child.parent is node
+        if not node.children:
+            leaves += node.count
+    assert leaves == 300
+    for instance in instances:
+        assert tree.categorize(instance).count > 0
+
+    tree.ifit(instances[0])
+    verify_counts(tree.root)
+
+    tree = CobwebTree(max_nodes=50)
+    tree.fit(instances)
+    tree.reorganize()
+    assert tree.num_nodes <= 50
+
+    # Moving leaves can change a child's values without changing its count.
+    pytest.importorskip('numpy')
+    tree = CobwebTree(min_vectorized_children=2)
+    tree.fit(instances)
+    tree.reorganize()
+    verify_tables(tree.root, instances[:20])
+
+
+def test_max_children():
+    with pytest.raises(ValueError):
+        CobwebTree(max_children=1)
+
+    instances = [{'id': 'i%i' % i, 'a': random.choice(['v1', 'v2'])}
+                 for i in range(200)]
+    unlimited = CobwebTree()
+    unlimited.fit(instances)
+    assert max(len(node.children) for node in unlimited.root._walk()) > 5
+
+    def verify(tree, count):
+        verify_counts(tree.root)
+        assert tree.root.count == count
+        assert tree.num_nodes == tree.root.num_concepts()
+        for node in tree.root._walk():
+            assert len(node.children) <= 5
+            assert len(node.children) != 1
+            for child in node.children:
+                assert child.parent is node
+
+    tree = CobwebTree(max_children=5)
+    tree.fit(instances)
+    verify(tree, 200)
+    for instance in instances:
+        leaf = tree.categorize(instance)
+        assert leaf.count == 1
+        assert leaf.av_counts['id'] == {instance['id']: 1}
+
+    tree.reorganize()
+    verify(tree, 200)
+
+    other = CobwebTree()
+    other.fit(instances)
+    tree.merge_tree(other)
+    verify(tree, 400)
+
+    tree = CobwebTree(max_children=5)
+    tree.fit_bulk(instances)
+    verify(tree, 200)
@@ -2,10 +2,17 @@ from __future__ import print_function, unicode_literals
 from __future__ import absolute_import, division
 import unittest
 import random
+import os
+import shutil
+import tempfile
 from numbers import Number
+from math import sqrt
+from math import pi
 
 from concept_formation.cobweb3 import cv_key
 from concept_formation.cobweb3 import Cobweb3Tree
+from concept_formation.trestle import TrestleTree
+from concept_formation.mapped_tree import MappedTree
 
 
 def verify_counts(node):
@@ -78,6 +85,390 @@ class TestCobweb(unittest.TestCase):
             tree.ifit(data)
         verify_counts(tree.root)
 
+    def test_expected_correct_guesses(self):
+        tree = Cobweb3Tree()
+        for i in range(40):
+            data = {}
+            data['x'] = random.normalvariate(0, 4)
+            data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+            data['_a2'] = random.choice(['v1', 'v2'])
+            tree.ifit(data)
+
+        nodes = [tree.root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+
+            scale = tree.attr_scales['x'].unbiased_std() / tree.scaling
+            cv = node.av_counts['x'][cv_key]
+            std = sqrt(cv.scaled_unbiased_std(scale) ** 2 + 1 / (4 * pi))
+            correct_guesses = ((cv.num / node.count) ** 2 /
+                               (2 * sqrt(pi) * std))
+            for val in node.av_counts['a1']:
+                correct_guesses += (node.av_counts['a1'][val] /
+                                    node.count) ** 2
+
+            self.assertAlmostEqual(node.expected_correct_guesses(),
+                                   correct_guesses / 2)
+
+    def test_expected_correct_guesses_for_insert(self):
+        tree = Cobweb3Tree()
+        for i in range(40):
+            data = {}
+            data['x'] = random.normalvariate(0, 4)
+            data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+            data['_a2'] = random.choice(['v1', 'v2'])
+            tree.ifit(data)
+
+        instances = [{'x': 1.5, 'a1': 'v1'}, {'x': -3, '_a2': 'v3'},
+                     {'a1': 'v5', 'y': 2.0}, {'_x': 1.0}]
+        nodes = [tree.root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            for instance in instances:
+                temp = node.shallow_copy()
+                temp.increment_counts(instance)
+                self.assertAlmostEqual(
+                    node.expected_correct_guesses_for_insert(instance),
+                    temp.expected_correct_guesses())
+
+    def test_weighted_ifit(self):
+        tree = Cobweb3Tree()
+        repeated = Cobweb3Tree()
+        for i in range(20):
+            data = {'x': random.normalvariate(0, 4),
+                    'a1': random.choice(['v1', 'v2'])}
+            weight = random.choice([1, 2, 3])
+            tree.ifit(data, weight=weight)
+            for j in range(weight):
+                repeated.update_scales(data)
+                repeated.root.increment_counts(data)
+        verify_counts(tree.root)
+
+        self.assertEqual(tree.root.count, repeated.root.count)
+        self.assertEqual(tree.root.av_counts['a1'],
+                         repeated.root.av_counts['a1'])
+        cv = tree.root.av_counts['x'][cv_key]
+        repeated_cv = repeated.root.av_counts['x'][cv_key]
+        self.assertEqual(cv.num, repeated_cv.num)
+        self.assertAlmostEqual(cv.mean, repeated_cv.mean)
+        self.assertAlmostEqual(cv.meanSq, repeated_cv.meanSq)
+        self.assertAlmostEqual(tree.attr_scales['x'].unbiased_std(),
+                               repeated.attr_scales['x'].unbiased_std())
+
+        instance = {'x': 1.5, 'a1': 'v1', 'y': 2.0}
+        nodes = [tree.root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            temp = node.shallow_copy()
+            for j in range(3):
+                temp.increment_counts(instance)
+            self.assertAlmostEqual(
+                node.expected_correct_guesses_for_insert(instance, 3),
+                temp.expected_correct_guesses())
+
+    def test_remove(self):
+        tree = Cobweb3Tree()
+        instances = [{'x': random.normalvariate(0, 4),
+                      'a1': random.choice(['v1', 'v2'])} for i in range(40)]
+        for data in instances:
+            tree.ifit(data)
+        for data in instances[:30]:
+            tree.remove(data)
+            verify_counts(tree.root)
+
+        expected = Cobweb3Tree()
+        for data in instances[30:]:
+            expected.update_scales(data)
+            expected.root.increment_counts(data)
+        self.assertEqual(tree.root.count, expected.root.count)
+        self.assertEqual(tree.root.av_counts['a1'],
+                         expected.root.av_counts['a1'])
+        cv = tree.root.av_counts['x'][cv_key]
+        expected_cv = expected.root.av_counts['x'][cv_key]
+        self.assertEqual(cv.num, expected_cv.num)
+        self.assertAlmostEqual(cv.mean, expected_cv.mean)
+        self.assertAlmostEqual(cv.meanSq, expected_cv.meanSq)
+        self.assertAlmostEqual(tree.attr_scales['x'].unbiased_std(),
+                               expected.attr_scales['x'].unbiased_std())
+
+        for data in instances[30:]:
+            tree.remove(data)
+        self.assertEqual(tree.root.count, 0)
+        self.assertEqual(tree.root.av_counts, {})
+        self.assertEqual(tree.root.cv_attrs, [])
+        self.assertEqual(tree.attr_scales, {})
+
+    def test_fit_bulk(self):
+        instances = [{'x': random.normalvariate(0, 4),
+                      'a1': random.choice(['v1', 'v2'])} for i in range(60)]
+        tree = Cobweb3Tree()
+        tree.fit_bulk(instances)
+        verify_counts(tree.root)
+        self.assertEqual(tree.root.count, 60)
+        self.assertEqual(tree.root.num_concepts(), tree.num_nodes)
+        self.assertEqual(tree.attr_scales['x'].num, 60)
+        leaves = [node for node in tree.root._walk() if not node.children]
+        self.assertEqual(len(leaves), 60)
+
+        tree = TrestleTree()
+        tree.fit_bulk([{'?o1': {'a': random.choice(['v1', 'v2']),
+                                'x': random.normalvariate(0, 4)}}
+                       for i in range(30)])
+        verify_counts(tree.root)
+        self.assertEqual(tree.root.count, 30)
+        tree.ifit({'?o1': {'a': 'v1', 'x': 1.0}})
+        self.assertEqual(tree.root.count, 31)
+
+    def test_merge_tree(self):
+        instances = [{'x': random.normalvariate(0, 4),
+                      'a1': random.choice(['v1', 'v2'])} for i in range(60)]
+        tree1 = Cobweb3Tree()
+        tree1.fit(instances[:30])
+        tree2 = Cobweb3Tree()
+        tree2.fit(instances[30:])
+
+        nodes1 = list(tree1.root._walk())
+        nodes2 = list(tree2.root._walk())
+        for node in nodes1[:10]:
+            for other in nodes2[:10]:
+                merged = node.shallow_copy()
+                merged.update_counts_from_node(other)
+                self.assertAlmostEqual(
+                    node.expected_correct_guesses_for_merge(other),
+                    merged.expected_correct_guesses())
+
+        tree1.merge_tree(tree2)
+        verify_counts(tree1.root)
+        self.assertEqual(tree1.root.count, 60)
+        self.assertEqual(tree1.num_nodes, tree1.root.num_concepts())
+        cv = tree1.root.av_counts['x'][cv_key]
+        self.assertAlmostEqual(cv.mean,
+                               sum(i['x'] for i in instances) / 60)
+        self.assertEqual(tree1.attr_scales['x'].num, 60)
+        self.assertAlmostEqual(tree1.attr_scales['x'].mean, cv.mean)
+
+    def test_reorganize(self):
+        instances = [{'x': random.normalvariate(10 * (i // 40), 1),
+                      'a1': random.choice(['v1', 'v2'])} for i in range(120)]
+        tree = Cobweb3Tree()
+        tree.fit(instances, randomize_first=False)
+        cu = tree.root.category_utility()
+        mean = tree.root.av_counts['x'][cv_key].mean
+
+        result = tree.reorganize()
+        verify_counts(tree.root)
+        self.assertEqual(result['after'], tree.structure_stats())
+        self.assertEqual(tree.num_nodes, tree.root.num_concepts())
+        self.assertEqual(tree.root.count, 120)
+        self.assertAlmostEqual(tree.root.av_counts['x'][cv_key].mean, mean)
+        self.assertGreaterEqual(tree.root.category_utility(), cu - 1e-9)
+
+    def test_max_children(self):
+        tree = Cobweb3Tree(max_children=3)
+        for i in range(100):
+            tree.ifit({'x': random.normalvariate(0, 4),
+                       'a1': 'v%i' % i})
+        verify_counts(tree.root)
+        self.assertEqual(tree.root.count, 100)
+        self.assertEqual(tree.num_nodes, tree.root.num_concepts())
+        for node in tree.root._walk():
+            self.assertLessEqual(len(node.children), 3)
+
+    def test_decay(self):
+        tree = Cobweb3Tree(decay=0.9, min_count=0.5)
+        for i in range(300):
+            tree.ifit({'x': random.normalvariate(10 * (i // 150), 1),
+                       'a1': random.choice(['v1', 'v2'])})
+        # Pruned concepts take their counts with them, but the scales are
+        # not pruned.
+        self.assertAlmostEqual(tree.root.av_counts['x'][cv_key].num,
+                               tree.root.count)
+        self.assertLess(tree.root.count, 10)
+        self.assertAlmostEqual(tree.attr_scales['x'].num,
+                               (1 - 0.9 ** 300) / 0.1)
+        self.assertGreater(tree.root.av_counts['x'][cv_key].mean, 8)
+        self.assertLess(tree.root.num_concepts(), 100)
+
+    def test_operation_pruning(self):
+        instances = []
+        for i in range(150):
+            instance = {'x': random.normalvariate(0, 4),
+                        'a': random.choice(['v1', 'v2', 'v3'])}
+            if random.random() < 0.5:
+                instance['z'] = random.normalvariate(10, 2)
+            instances.append(instance)
+
+        trees = []
+        for prune_operations in [False, True]:
+            random.seed(0)
+            tree = Cobweb3Tree()
+            tree.prune_operations = prune_operations
+            for instance in instances:
+                tree.ifit(instance)
+            trees.append(tree)
+        self.assertEqual(str(trees[0]), str(trees[1]))
+        for op in ['best', 'new', 'merge', 'split']:
+            self.assertEqual(trees[0].operation_stats[op, 'chosen'],
+                             trees[1].operation_stats[op, 'chosen'])
+
+        nodes = [trees[0].root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            if len(node.children) < 3:
+                continue
+            best1, best2 = node.children[:2]
+            for instance in instances[:20]:
+                self.assertGreaterEqual(
+                    node.cu_for_merge_bound(best1, best2, instance) + 1e-12,
+                    node.cu_for_merge(best1, best2, instance))
+            for best in node.children:
+                self.assertGreaterEqual(node.cu_for_split_bound(best),
+                                        node.cu_for_split(best))
+
+    def test_operation_cu(self):
+        tree = Cobweb3Tree()
+        for i in range(60):
+            data = {}
+            data['x'] = random.normalvariate(0, 4)
+            data['a1'] = random.choice(['v1', 'v2', 'v3', 'v4'])
+            tree.ifit(data)
+        instance = {'x': 1.5, 'a1': 'v5'}
+
+        nodes = [tree.root]
+        while nodes:
+            node = nodes.pop()
+            nodes.extend(node.children)
+            if len(node.children) < 3:
+                continue
+
+            temp = node.shallow_copy()
+            temp.increment_counts(instance)
+            for c in node.children:
+                temp.children.append(c.shallow_copy())
+            temp.create_new_child(instance)
+            self.assertAlmostEqual(node.cu_for_new_child(instance),
+                                   temp.category_utility())
+
+            best1, best2 = node.children[0], node.children[1]
+            temp = node.shallow_copy()
+            temp.increment_counts(instance)
+            merged = best1.shallow_copy()
+            merged.update_counts_from_node(best2)
+            merged.increment_counts(instance)
+            temp.children.append(merged)
+            for c in node.children[2:]:
+                temp.children.append(c.shallow_copy())
+            self.assertAlmostEqual(node.cu_for_merge(best1, best2, instance),
+                                   temp.category_utility())
+
+    def test_parallel(self):
+        tree = Cobweb3Tree()
+        instances = []
+        for i in range(60):
+            data = {}
+            data['x'] = random.normalvariate(0, 4)
+            data['y'] = random.normalvariate(0, 4)
+            data['a'] = random.choice(['v1', 'v2'])
+            instances.append(data)
+        tree.fit(instances[:40])
+
+        queries = [{'x': data['x']} for data in instances]
+        for processes in [1, 2]:
+            concepts = tree.categorize_parallel(queries, processes)
+            self.assertEqual(len(concepts), len(queries))
+            for data, concept in zip(queries, concepts):
+                self.assertIs(concept, tree.categorize(data))
+
+            completed = tree.infer_missing_parallel(queries,
+                                                    processes=processes)
+            self.assertEqual(completed,
+                             [tree.infer_missing(data) for data in queries])
+
+        self.assertEqual(tree.categorize_parallel([]), [])
+
+    def test_save_load(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tempdir, 'tree.bin')
+
+            tree = Cobweb3Tree(scaling=0.25)
+            for i in range(40):
+                data = {}
+                data['x'] = random.normalvariate(0, 4)
+                data['_y'] = random.normalvariate(0, 4)
+                data['a'] = random.choice(['v1', 'v2'])
+                tree.ifit(data)
+            tree.save(path)
+            loaded = Cobweb3Tree.load(path)
+            verify_counts(loaded.root)
+            self.assertEqual(str(loaded), str(tree))
+            self.assertEqual(loaded.scaling, 0.25)
+            self.assertEqual(repr(loaded.attr_scales), repr(tree.attr_scales))
+            self.assertEqual(loaded.root.cv_attrs, tree.root.cv_attrs)
+            self.assertEqual(loaded.root.expected_correct_guesses(),
+                             tree.root.expected_correct_guesses())
+            for i in range(10):
+                data = {'x': random.normalvariate(0, 4)}
+                self.assertEqual(loaded.categorize(data).concept_id,
+                                 tree.categorize(data).concept_id)
+
+            tree = TrestleTree()
+            for i in range(20):
+                tree.ifit({'o1': {'x': random.normalvariate(0, 4),
+                                  'a': random.choice(['v1', 'v2'])},
+                           ('rel', 'o1'): True})
+            tree.save(path)
+            loaded = TrestleTree.load(path)
+            self.assertEqual(str(loaded), str(tree))
+            self.assertEqual(loaded.gensym_counter, tree.gensym_counter)
+            self.assertIsInstance(Cobweb3Tree.load(path), TrestleTree)
+
+            Cobweb3Tree().save(path)
+            self.assertRaises(ValueError, TrestleTree.load, path)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_mapped_tree(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tempdir, 'tree.bin')
+            tree = Cobweb3Tree()
+            for i in range(60):
+                data = {}
+                data['x'] = random.normalvariate(0, 4)
+                data['_y'] = random.normalvariate(0, 4)
+                data['a'] = random.choice(['v1', 'v2'])
+                if random.random() < 0.5:
+                    data['z'] = random.normalvariate(10, 2)
+                tree.ifit(data)
+            tree.save(path)
+
+            mapped = MappedTree(path)
+            self.assertEqual(str(mapped), str(tree))
+            for i in range(30):
+                data = {'x': random.normalvariate(0, 4),
+                        'a': random.choice(['v1', 'v2'])}
+                concept = tree.categorize(data)
+                mapped_concept = mapped.categorize(data)
+                self.assertEqual(mapped_concept.concept_id,
+                                 concept.concept_id)
+                for attr in ['x', 'z', 'a', '_y']:
+                    self.assertEqual(mapped_concept.predict(attr),
+                                     concept.predict(attr))
+                    for val in [0.5, 'v1', None]:
+                        self.assertEqual(
+                            mapped_concept.probability(attr, val),
+                            concept.probability(attr, val))
+                self.assertEqual(mapped.infer_missing(data),
+                                 tree.infer_missing(data))
+            mapped.close()
+        finally:
+            shutil.rmtree(tempdir)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -34,6 +34,69 @@ def test_cv_copy():
     assert cv.meanSq != cv2.meanSq
 
 
+def test_cv_weighted_update():
+    cv = ContinuousValue()
+    cv2 = ContinuousValue()
+    for i in range(10):
+        x = normalvariate(0, 4)
+        weight = int(random() * 5) + 1
+        cv.update(x, weight)
+        for j in range(weight):
+            cv2.update(x)
+        assert cv.num == cv2.num
+        assert cv.mean == pytest.approx(cv2.mean)
+        assert cv.meanSq == pytest.approx(cv2.meanSq)
+
+
+def test_cv_remove():
+    cv = ContinuousValue()
+    prefix = ContinuousValue()
+    nums = [normalvariate(0, 4) for i in range(10)]
+    cv.update_batch(nums)
+    prefix.update_batch(nums[:6])
+    for x in reversed(nums[6:]):
+        cv.remove(x)
+    assert cv.num == prefix.num
+    assert cv.mean == pytest.approx(prefix.mean)
+    assert cv.meanSq == pytest.approx(prefix.meanSq)
+
+    cv.remove(nums[0], 6)
+    assert cv.num == 0
+    assert cv.mean == 0
+    assert cv.meanSq == 0
+
+
+def test_cv_subtract():
+    cv1 = ContinuousValue()
+    cv2 = ContinuousValue()
+    nums = [normalvariate(0, 4) for i in range(20)]
+    cv1.update_batch(nums[:12])
+    cv2.update_batch(nums[12:])
+    cv1.combine(cv2)
+    cv1.subtract(cv2)
+
+    cv3 = ContinuousValue()
+    cv3.update_batch(nums[:12])
+    assert cv1.num == cv3.num
+    assert cv1.mean == pytest.approx(cv3.mean)
+    assert cv1.meanSq == pytest.approx(cv3.meanSq)
+
+    cv1.subtract(cv3)
+    assert cv1.num == 0
+    assert cv1.meanSq == 0
+
+
+def test_cv_decay():
+    cv = ContinuousValue()
+    cv.update_batch([normalvariate(0, 4) for i in range(20)])
+    mean = cv.mean
+    std = cv.biased_std()
+    cv.decay(0.5)
+    assert cv.num == 10
+    assert cv.mean == mean
+    assert cv.biased_std() == pytest.approx(std)
+
+
 def test_cv_unbiased_mean():
     nums = [random() for i in range(10)]
     cv = ContinuousValue()
@@ -2,6 +2,7 @@ from __future__ import print_function, unicode_literals
 from __future__ import absolute_import, division
 
 import random
+import threading
 
 import pytest
 
@@ -70,6 +71,9 @@ def test_mean():
 def test_c4():
     with pytest.raises(ValueError):
         utils.c4(1)
+    assert utils.c4(30) == 1.0
+    assert utils.c4(2.5) > utils.c4(2)
+    assert utils.c4(2.5) < utils.c4(3)
 
 
 def test_cv_std():
@@ -117,3 +121,71 @@ def test_cv_combine():
 
         cv.combine(cv2)
         assert cv.biased_std() - utils.std(values) < 0.00000000001
+
+
+def test_read_write_lock():
+    lock = utils.ReadWriteLock()
+
+    # reentrant reads and writes, and reads while writing
+    lock.acquire_read()
+    lock.acquire_read()
+    with pytest.raises(RuntimeError):
+        lock.acquire_write()
+    lock.release_read()
+    lock.release_read()
+
+    lock.acquire_write()
+    lock.acquire_write()
+    lock.acquire_read()
+    lock.release_read()
+    lock.release_write()
+    lock.release_write()
+
+    # readers do not block each other, but a writer waits for them
+    events = []
+    read = threading.Event()
+    lock.acquire_read()
+
+    def reader():
+        lock.acquire_read()
+        events.append('read')
+        read.set()
+        lock.release_read()
+
+    def writer():
+        lock.acquire_write()
+        events.append('write')
+        lock.release_write()
+
+    t = threading.Thread(target=reader)
+    t.start()
+    assert read.wait(5)
+    t.join()
+
+    t = threading.Thread(target=writer)
+    t.start()
+    t.join(0.1)
+    assert events == ['read']
+    lock.release_read()
+    t.join(5)
+    assert events == ['read', 'write']
+
+    # a read taken under the write lock and released after it is still held
+    # once the write lock is gone, and releasing it lets writers in again
+    events = []
+    lock.acquire_write()
+    lock.acquire_read()
+    lock.release_write()
+
+    t = threading.Thread(target=writer)
+    t.start()
+    t.join(0.1)
+    assert events == []
+    lock.release_read()
+    t.join(5)
+    assert events == ['write']
+
+    t = threading.Thread(target=writer)
+    t.start()
+    t.join(5)
+    assert events == ['write', 'write']
@@ -15,6 +15,8 @@ from concept_formation.preprocessor import SubComponentProcessor
 from concept_formation.preprocessor import Flattener
 from concept_formation.preprocessor import Pipeline
 from concept_formation.preprocessor import NameStandardizer
+from concept_formation.utils import read_locked
+from concept_formation.utils import write_locked
 
 
 class TrestleTree(Cobweb3Tree):
@@ -50,27 +52,26 @@ class TrestleTree(Cobweb3Tree):
         drastically reduces performance, but allows the category structure to
         influcence structure mapping.
     :type structure_map_internally: boolean
+    :param kwargs: the other parameters of the tree (e.g., ``thread_safe``
+        or ``max_nodes``) are passed to :class:`CobwebTree
+        <concept_formation.cobweb.CobwebTree>`, which describes them.
     """
 
-    def __init__(self, scaling=0.5, inner_attr_scaling=True):
+    def __init__(self, scaling=0.5, inner_attr_scaling=True, **kwargs):
         """
         The tree constructor.
         """
         self.gensym_counter = 0
-        self.root = Cobweb3Node()
-        self.root.tree = self
-        self.scaling = scaling
-        self.inner_attr_scaling = inner_attr_scaling
-        self.attr_scales = {}
+        super(TrestleTree, self).__init__(scaling, inner_attr_scaling,
+                                          **kwargs)
 
+    @write_locked
     def clear(self):
         """
         Clear the tree but keep initialization parameters
         """
+        super(TrestleTree, self).clear()
         self.gensym_counter = 0
-        self.root = Cobweb3Node()
-        self.root.tree = self
-        self.attr_scales = {}
 
     def gensym(self):
         """
@@ -129,7 +130,8 @@ class TrestleTree(Cobweb3Tree):
             if isinstance(v, tuple):
                 self._sanity_check_relation(v, instance)
 
-    def ifit(self, instance):
+    @write_locked
+    def ifit(self, instance, weight=1):
         """
         Incrementally fit a new instance into the tree and return its resulting
         concept.
@@ -144,12 +146,79 @@ class TrestleTree(Cobweb3Tree):
 
         :param instance: an instance to be categorized into the tree.
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add (see:
+            :meth:`CobwebTree.ifit
+            <concept_formation.cobweb.CobwebTree.ifit>`)
+        :type weight: a positive number
         :return: A concept describing the instance
         :rtype: Cobweb3Node
 
         .. seealso:: :meth:`TrestleTree.trestle`
         """
-        return self.trestle(instance)
+        self._sanity_check_weight(weight)
+        return self.trestle(instance, weight)
+
+    def _merge_tree_state(self, other):
+        """
+        Combines the tree level state of another tree into this one when it is
+        merged (see: :meth:`CobwebTree.merge_tree
+        <concept_formation.cobweb.CobwebTree.merge_tree>`), keeping the
+        gensym counter ahead of both trees' names.
+        """
+        super(TrestleTree, self)._merge_tree_state(other)
+        self.gensym_counter = max(self.gensym_counter, other.gensym_counter)
+
+    def _bulk_preprocess(self, pairs):
+        """
+        Structure maps the instances given to :meth:`CobwebTree.fit_bulk
+        <concept_formation.cobweb.CobwebTree.fit_bulk>` before they are
+        checked and interned.
+
+        Fitting an instance maps it to the root of the tree, which summarizes
+        the instances fit before it. The tree is empty until all of the
+        instances have been mapped, so each instance is instead mapped to a
+        concept that summarizes the instances mapped before it.
+        """
+        summary = Cobweb3Node()
+        summary.tree = self
+        mapped = []
+        for instance, weight in pairs:
+            self._sanity_check_weight(weight)
+            preprocessing = Pipeline(NameStandardizer(self.gensym),
+                                     Flattener(), SubComponentProcessor(),
+                                     StructureMapper(summary))
+            temp_instance = preprocessing.transform(instance)
+            summary.increment_counts(temp_instance, weight)
+            mapped.append((temp_instance, weight))
+        return super(TrestleTree, self)._bulk_preprocess(mapped)
+
+    @write_locked
+    def remove(self, instance, weight=1):
+        """
+        Removes an instance that was previously fit into the tree.
+
+        This version is modified from the normal :meth:`CobwebTree.remove
+        <concept_formation.cobweb.CobwebTree.remove>` by first structure
+        mapping the instance, in the same way as
+        :meth:`TrestleTree.categorize`. Because the mapping depends on the
+        current root, a relational instance may map differently than when it
+        was fit; in that case the leaf it was fit into should be passed to
+        :meth:`CobwebTree.unfit <concept_formation.cobweb.CobwebTree.unfit>`
+        along with the mapped instance instead.
+
+        :param instance: an instance that was fit into the tree
+        :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to remove
+        :type weight: a positive number
+        :return: the leaf the instance was removed from
+        :rtype: Cobweb3Node
+        :raises ValueError: if no leaf holds the instance
+        """
+        preprocessing = Pipeline(NameStandardizer(self.gensym),
+                                 Flattener(), SubComponentProcessor(),
+                                 StructureMapper(self.root))
+        temp_instance = preprocessing.transform(instance)
+        return super(TrestleTree, self).remove(temp_instance, weight)
 
     def _trestle_categorize(self, instance):
         """
@@ -168,6 +237,36 @@ class TrestleTree(Cobweb3Tree):
         self._sanity_check_instance(temp_instance)
         return self._cobweb_categorize(temp_instance)
 
+    @read_locked
+    def categorize_batch(self, instances):
+        """
+        Sort a collection of instances in the categorization tree and return
+        their resulting concepts.
+
+        This version differs from the normal
+        :meth:`CobwebTree.categorize_batch
+        <concept_formation.cobweb.CobwebTree.categorize_batch>` by structure
+        mapping each instance before the batch is categorized.
+
+        :param instances: a collection of instances to be categorized
+        :type instances: [:ref:`Instance<instance-rep>`,
+            :ref:`Instance<instance-rep>`, ...]
+        :return: the concept describing each instance, in the same order
+        :rtype: [Cobweb3Node, Cobweb3Node, ...]
+
+        .. seealso:: :meth:`TrestleTree.categorize`
+        """
+        preprocessing = Pipeline(NameStandardizer(self.gensym),
+                                 Flattener(), SubComponentProcessor(),
+                                 StructureMapper(self.root))
+        temp_instances = []
+        for instance in instances:
+            temp_instance = preprocessing.transform(instance)
+            self._sanity_check_instance(temp_instance)
+            temp_instances.append(temp_instance)
+        return self._cobweb_categorize_batch(temp_instances)
+
+    @read_locked
     def infer_missing(self, instance, choice_fn="most likely",
                       allow_none=True):
         """
@@ -206,6 +305,7 @@ class TrestleTree(Cobweb3Tree):
         temp_instance = preprocessing.undo_transform(temp_instance)
         return temp_instance
 
+    @read_locked
     def categorize(self, instance):
         """
         Sort an instance in the categorization tree and return its resulting
@@ -232,7 +332,7 @@ class TrestleTree(Cobweb3Tree):
         """
         return self._trestle_categorize(instance)
 
-    def trestle(self, instance):
+    def trestle(self, instance, weight=1):
         """
         The core trestle algorithm used in fitting and categorization.
 
@@ -245,6 +345,8 @@ class TrestleTree(Cobweb3Tree):
 
         :param instance: an instance to be categorized into the tree.
         :type instance: :ref:`Instance<instance-rep>`
+        :param weight: the number of copies of the instance to add
+        :type weight: a positive number
         :return: A concept describing the instance
         :rtype: CobwebNode
         """
@@ -253,4 +355,4 @@ class TrestleTree(Cobweb3Tree):
                                  StructureMapper(self.root))
         temp_instance = preprocessing.transform(instance)
         self._sanity_check_instance(temp_instance)
-        return self.cobweb(temp_instance)
+        return self.cobweb(temp_instance, weight)
@@ -10,7 +10,11 @@ from numbers import Number
 from random import uniform
 from random import random
 from math import sqrt
+from math import exp
+from math import lgamma
 from math import isnan
+from functools import wraps
+import threading
 
 
 # A hashtable of values to use in the c4(n) function to apply corrections to
@@ -49,15 +53,21 @@ def c4(n):
     """
     Returns the correction factor to apply to unbias estimates of standard
     deviation in low sample sizes. This implementation is based on a lookup
-    table for n in [2-29] and returns 1.0 for values >= 30.
+    table for n in [2-29] and returns 1.0 for values >= 30. Sample sizes that
+    are not whole numbers (e.g., decayed or weighted counts) use the gamma
+    function form of the same correction.
 
     >>> c4(3)
     0.886226925452758
     """
     if n <= 1:
         raise ValueError("Cannot apply correction for a sample size of 1.")
+    elif n >= 30:
+        return 1.0
+    elif n in c4n_table:
+        return c4n_table[n]
     else:
-        return c4n_table[n] if n < 30 else 1.0
+        return sqrt(2 / (n - 1)) * exp(lgamma(n / 2) - lgamma((n - 1) / 2))
 
 
 def isNumber(n):
@@ -177,3 +187,141 @@ def most_likely_choice(choices):
 
     updated_choices = [(prob, random(), val) for val, prob in choices]
     return sorted(updated_choices, reverse=True)[0][2]
+
+
+class ReadWriteLock(object):
+    """
+    A lock that lets any number of threads read at the same time, but gives a
+    writing thread exclusive access. Writers are preferred: once a writer is
+    waiting, new readers wait until it has finished, so a steady stream of
+    readers cannot starve it.
+
+    The lock is reentrant. A thread holding the read lock can acquire it
+    again, and a thread holding the write lock can acquire either lock again.
+    A thread holding only the read lock cannot acquire the write lock (this
+    raises a RuntimeError rather than deadlocking). If a thread releases the
+    write lock while still holding read locks it took under it, it keeps
+    reading and other writers wait until those are released too.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        """
+        Acquires the lock for reading, waiting while a writer holds or is
+        waiting for the lock.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth > 0:
+            self._local.depth = depth + 1
+            return
+        if self._writer is threading.current_thread():
+            # The write lock already excludes other threads, so this read is
+            # not counted among the readers unless the write lock is released
+            # first (see: :meth:`ReadWriteLock.release_write`).
+            self._local.counted = False
+            self._local.depth = 1
+            return
+
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.counted = True
+        self._local.depth = 1
+
+    def release_read(self):
+        """
+        Releases a read lock acquired with :meth:`ReadWriteLock.acquire_read`.
+        """
+        self._local.depth -= 1
+        if self._local.depth > 0 or not self._local.counted:
+            return
+
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """
+        Acquires the lock for writing, waiting until no other thread is reading
+        or writing.
+        """
+        me = threading.current_thread()
+        if self._writer is me:
+            self._writer_depth += 1
+            return
+        if getattr(self._local, 'depth', 0) > 0:
+            raise RuntimeError("Cannot acquire the write lock while holding"
+                               " the read lock.")
+
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        """
+        Releases a write lock acquired with
+        :meth:`ReadWriteLock.acquire_write`.
+        """
+        self._writer_depth -= 1
+        if self._writer_depth > 0:
+            return
+
+        with self._cond:
+            self._writer = None
+            if (getattr(self._local, 'depth', 0) > 0 and
+                    not self._local.counted):
+                # Keep holding the reads taken under the write lock.
+                self._readers += 1
+                self._local.counted = True
+            self._cond.notify_all()
+
+
+def read_locked(method):
+    """
+    Decorates a method of a tree that only reads the tree, so that it holds the
+    tree's lock (see: :class:`ReadWriteLock`) for reading while it runs. Trees
+    without a lock are not affected.
+    """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        lock = self.lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+    return locked
+
+
+def write_locked(method):
+    """
+    Decorates a method of a tree that modifies the tree, so that it holds the
+    tree's lock (see: :class:`ReadWriteLock`) for writing while it runs. Trees
+    without a lock are not affected.
+    """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        lock = self.lock
+        if lock is None:
+            return method(self, *args, **kwargs)
+        lock.acquire_write()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_write()
+    return locked